@@ -0,0 +1,136 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+解析逻辑基准测试 - 基于录制的 HTTP 磁带离线回放
+
+先用录制模式跑一次真实签到:
+    CHECKIN_CASSETTE=status/cassettes/sxsy.json.gz CHECKIN_CASSETTE_MODE=record python scripts/sxsy_checkin.py
+再离线回放并计时:
+    python scripts/bench_parsing.py status/cassettes/sxsy.json.gz -n 200
+回放的响应几乎没有延迟，基准测试不记录延迟样本，也不写 status/latency.json。
+"""
+
+import os
+import sys
+import json
+import time
+import logging
+import argparse
+import statistics
+from pathlib import Path
+from typing import Callable, Dict, List
+from urllib.parse import urlsplit
+
+# 必须在导入共用组件之前设置：回放的近零延迟会把真实运行的自适应超时压到下限
+os.environ['CHECKIN_ADAPTIVE_TIMEOUT'] = '0'
+
+from common import timeouts  # noqa: E402
+from common.cassette import Cassette, CassetteAdapter, decode_body  # noqa: E402
+
+log = logging.getLogger(__name__)
+
+
+def timeit(func: Callable[[], object], number: int) -> Dict[str, float]:
+    """重复执行 func，返回单次耗时统计（微秒）。"""
+    samples = []
+    for _ in range(number):
+        start = time.perf_counter()
+        func()
+        samples.append((time.perf_counter() - start) * 1e6)
+    return {
+        'min': min(samples),
+        'median': statistics.median(samples),
+        'max': max(samples),
+    }
+
+
+def replay(session, cassette: Cassette) -> None:
+    """把会话的 http/https 挂到磁带上，并去掉延迟采样钩子"""
+    adapter = CassetteAdapter(cassette)
+    session.mount('https://', adapter)
+    session.mount('http://', adapter)
+    if timeouts.policy.observe in session.hooks['response']:
+        session.hooks['response'].remove(timeouts.policy.observe)
+
+
+def matching(cassette: Cassette, *fragments: str) -> List[Dict]:
+    return [item for item in cassette.interactions if all(f in item['key'] for f in fragments)]
+
+
+def bench_sxsy(cassette: Cassette, number: int) -> Dict[str, Dict]:
+    import sxsy_checkin as sxsy
+
+    results = {}
+    for item in matching(cassette, sxsy.RELEASE_PAGE_URL)[:1]:
+        html = decode_body(item).decode('utf-8', errors='ignore')
+        results['sxsy.extract_domain_from_html'] = timeit(
+            lambda: sxsy.extract_domain_from_html(html, sxsy.RELEASE_PAGE_URL), number)
+
+    for item in matching(cassette, 'operation=qiandao')[:1]:
+        domain = urlsplit(item['key'].split(' ', 1)[1]).hostname
+        checkin = sxsy.SXSYCheckin(domain=domain, cookie='')
+        replay(checkin.session, cassette)
+        results['sxsy.SXSYCheckin.do_checkin'] = timeit(checkin.do_checkin, number)
+
+    return results
+
+
+def bench_yuchen(cassette: Cassette, number: int) -> Dict[str, Dict]:
+    import yuchen_checkin as yuchen
+
+    results = {}
+    for _ in matching(cassette, 'iosyc.com/users?tab=credit')[:1]:
+        client = yuchen.YuChen()
+        replay(client.session, cassette)
+        results['yuchen.YuChen.yu_chen_info'] = timeit(client.yu_chen_info, number)
+    return results
+
+
+def bench_huaxia(cassette: Cassette, number: int) -> Dict[str, Dict]:
+    import huaxia_signin as huaxia
+
+    results = {}
+    for item in matching(cassette, 'huaxiashuyu.com')[:1]:
+        text = decode_body(item).decode('utf-8', errors='ignore')
+        try:
+            data = json.loads(text)
+        except ValueError:
+            continue
+        results['huaxia.is_response_success'] = timeit(
+            lambda: huaxia.is_response_success(data, text), number)
+    return results
+
+
+BENCHES = (bench_sxsy, bench_yuchen, bench_huaxia)
+
+
+def main():
+    parser = argparse.ArgumentParser(description='基于磁带回放的解析基准测试')
+    parser.add_argument('cassettes', nargs='+', type=Path, help='磁带文件路径')
+    parser.add_argument('-n', '--number', type=int, default=100, help='每项重复次数')
+    args = parser.parse_args()
+
+    # 被测函数内部的业务日志会淹没计时结果；回放的响应也不应计入延迟记录
+    logging.disable(logging.CRITICAL)
+    timeouts.policy.enabled = False
+
+    rows = []
+    for path in args.cassettes:
+        cassette = Cassette(path, 'replay')
+        for bench in BENCHES:
+            for name, stats in bench(cassette, args.number).items():
+                rows.append((path.name, name, stats))
+                cassette.rewind()
+
+    logging.disable(logging.NOTSET)
+    if not rows:
+        print("⚠️ 磁带中没有可基准测试的响应")
+        sys.exit(1)
+
+    print(f"{'磁带':<24} {'函数':<36} {'min(µs)':>10} {'median(µs)':>12} {'max(µs)':>10}")
+    for cassette_name, name, stats in rows:
+        print(f"{cassette_name:<24} {name:<36} {stats['min']:>10.1f} {stats['median']:>12.1f} {stats['max']:>10.1f}")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,308 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+常驻签到守护进程（自托管 runner / 本机）
+
+尚香书苑与看雪只能从受信任的出口 IP 访问，通常部署在自托管机器上；原来每个平台由 cron
+单独拉起一个 Python 进程，每次都要重新启动解释器、导入模块、解析 DNS、握手。
+守护进程启动时把各平台模块导入一次，之后按北京时间的计划在同一进程内依次调用各自的 main()，
+省去每次的解释器启动与模块导入；持久化查询、代理评分等模块级状态在多次运行间保留，
+开启 CHECKIN_TLS_RESUME 时 TLS 会话也可跨运行复用（票据仍有效时）。
+连接池不跨运行保留：各脚本在每次运行结束时关闭自己的会话与连接池，下次运行重新建连；
+DNS 缓存只有 CHECKIN_DNS_TTL（默认 5 分钟）有效期，间隔数小时的运行之间同样会重新解析。
+按一次运行计算的状态在每次运行后重置: 重试预算清零，平台模块提供 reset_state() 时一并调用
+（星城的活动缓存重新读取配置与缓存文件）。
+
+    python scripts/checkin_daemon.py                       # 按默认计划运行
+    python scripts/checkin_daemon.py --only kanxue,lkong   # 只调度部分平台
+    python scripts/checkin_daemon.py --run-now sxsy        # 启动后立即执行一次
+
+默认计划与 .github/workflows 中的 cron 一致（北京时间）:
+    xingcheng 01:10  kanxue 02:00  huaxia 03:00  yuchen 03:00  lkong 04:00
+尚香书苑没有定时任务，默认只手动触发，可用 CHECKIN_DAEMON_SCHEDULE 加上计划。
+
+健康检查（仅监听 127.0.0.1）:
+    GET  /health        各平台的计划、上次运行结果与下次运行时间（JSON）
+    POST /run/<平台>     立即排队执行一次
+
+环境变量:
+    CHECKIN_DAEMON_SCHEDULE  覆盖计划，如 "sxsy=05:30,kanxue=02:10"，时间留空表示只手动触发
+    CHECKIN_DAEMON_PORT      健康检查端口，默认 8787，0 表示不开启
+"""
+
+import os
+import sys
+import json
+import time
+import logging
+import argparse
+import importlib
+import threading
+from collections import deque
+from datetime import datetime, timedelta
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from typing import Callable, Deque, Dict, List, Optional
+
+from common.checkpoint import SHANGHAI
+from common.logs import setup_logging
+from common.metrics import registry as metrics
+from common.notify import dispatcher
+from common.retry import stats as retry_stats
+from common.timeouts import policy as timeout_policy
+
+setup_logging()
+log = logging.getLogger(__name__)
+
+TIME_FORMAT = '%Y-%m-%d %H:%M:%S'
+DEFAULT_PORT = 8787
+
+# 平台 -> (模块名, 默认计划 HH:MM（北京时间），None 表示只手动触发)
+PLATFORMS: Dict[str, tuple] = {
+    'xingcheng': ('xingcheng_checkin', '01:10'),
+    'kanxue': ('kanxue_signin', '02:00'),
+    'huaxia': ('huaxia_signin', '03:00'),
+    'yuchen': ('yuchen_checkin', '03:00'),
+    'lkong': ('lkong_punch', '04:00'),
+    'sxsy': ('sxsy_checkin', None),
+}
+
+
+def parse_schedule(value: str) -> Dict[str, Optional[str]]:
+    """解析 "平台=HH:MM,平台=" 形式的计划覆盖"""
+    schedule = {}
+    for item in value.split(','):
+        item = item.strip()
+        if not item:
+            continue
+        name, _, at = item.partition('=')
+        name, at = name.strip(), at.strip()
+        if name not in PLATFORMS:
+            raise ValueError(f"未知平台: {name}")
+        if at:
+            datetime.strptime(at, '%H:%M')
+        schedule[name] = at or None
+    return schedule
+
+
+def next_run(at: str, after: datetime) -> datetime:
+    """at（HH:MM，北京时间）在 after 之后的下一次时刻"""
+    hour, minute = (int(part) for part in at.split(':'))
+    candidate = after.replace(hour=hour, minute=minute, second=0, microsecond=0)
+    if candidate <= after:
+        candidate += timedelta(days=1)
+    return candidate
+
+
+# ==================== 任务 ====================
+class Job:
+    """一个平台：导入一次的模块、计划与最近一次运行结果。"""
+
+    def __init__(self, name: str, module: str, at: Optional[str]):
+        self.name = name
+        self.module_name = module
+        self.at = at
+        self.main: Optional[Callable] = None
+        self.reset_state: Optional[Callable] = None
+        self.next_run: Optional[datetime] = None
+        self.last_start: Optional[datetime] = None
+        self.last_duration: Optional[float] = None
+        self.last_exit: Optional[int] = None
+        self.runs = 0
+
+    def load(self) -> None:
+        module = importlib.import_module(self.module_name)
+        self.main = module.main
+        # 模块可提供 reset_state()，在每次运行后重置自己的模块级状态
+        self.reset_state = getattr(module, 'reset_state', None)
+
+    def schedule(self, now: datetime) -> None:
+        self.next_run = next_run(self.at, now) if self.at else None
+
+    def run(self) -> int:
+        """调用模块的 main()，返回退出码；main() 以 sys.exit 结束，这里接住 SystemExit"""
+        self.last_start = datetime.now(SHANGHAI)
+        start = time.perf_counter()
+        log.info(f"▶️ 开始执行 {self.name}")
+        try:
+            with metrics.run(self.name):
+                self.main()
+            code = 0
+        except SystemExit as e:
+            code = e.code if isinstance(e.code, int) else (0 if e.code is None else 1)
+        except Exception as e:
+            log.error(f"❌ {self.name} 执行异常: {e}", exc_info=True)
+            code = 1
+        finally:
+            # 各脚本依赖进程退出时发送通知、保存延迟记录，常驻时在每次运行后主动处理
+            dispatcher.flush()
+            timeout_policy.save()
+            # 重试预算按一次运行计算，不能跨运行累计
+            retry_stats.log_summary()
+            retry_stats.reset()
+            if self.reset_state:
+                try:
+                    self.reset_state()
+                except Exception as e:
+                    log.warning(f"⚠️ {self.name} 重置模块状态失败: {e}")
+        self.last_duration = time.perf_counter() - start
+        self.last_exit = code
+        self.runs += 1
+        log.info(f"{'✅' if code == 0 else '❌'} {self.name} 执行结束，退出码 {code}，耗时 {self.last_duration:.1f} 秒")
+        return code
+
+    def status(self) -> Dict:
+        def fmt(value: Optional[datetime]) -> Optional[str]:
+            return value.strftime(TIME_FORMAT) if value else None
+        return {
+            'schedule': self.at,
+            'next_run': fmt(self.next_run),
+            'last_start': fmt(self.last_start),
+            'last_duration': round(self.last_duration, 2) if self.last_duration is not None else None,
+            'last_exit': self.last_exit,
+            'runs': self.runs,
+        }
+
+
+class Daemon:
+    """按计划依次执行各平台，同一时间只运行一个平台（各脚本共用 sys.argv 与模块级状态）。"""
+
+    def __init__(self, jobs: List[Job]):
+        self.jobs = {job.name: job for job in jobs}
+        self.started = datetime.now(SHANGHAI)
+        self.running: Optional[str] = None
+        self.manual: Deque[str] = deque()
+        self._wake = threading.Event()
+        self._lock = threading.Lock()
+
+    def trigger(self, name: str) -> bool:
+        """排队手动执行一次，未知平台返回 False"""
+        if name not in self.jobs:
+            return False
+        with self._lock:
+            if name not in self.manual:
+                self.manual.append(name)
+        self._wake.set()
+        return True
+
+    def status(self) -> Dict:
+        with self._lock:
+            queued = list(self.manual)
+        return {
+            'status': 'ok',
+            'started': self.started.strftime(TIME_FORMAT),
+            'running': self.running,
+            'queued': queued,
+            'jobs': {name: job.status() for name, job in self.jobs.items()},
+        }
+
+    def _due(self, now: datetime) -> List[Job]:
+        with self._lock:
+            names = list(self.manual)
+            self.manual.clear()
+        due = [self.jobs[name] for name in names]
+        due += [job for job in self.jobs.values()
+                if job.next_run and job.next_run <= now and job not in due]
+        return due
+
+    def serve_forever(self) -> None:
+        now = datetime.now(SHANGHAI)
+        for job in self.jobs.values():
+            job.schedule(now)
+            log.info(f"🗓️ {job.name}: {('每天 ' + job.at + '，下次 ' + job.next_run.strftime(TIME_FORMAT)) if job.at else '仅手动触发'}")
+
+        while True:
+            self._wake.clear()
+            for job in self._due(datetime.now(SHANGHAI)):
+                self.running = job.name
+                try:
+                    job.run()
+                finally:
+                    self.running = None
+                    # 运行跨过计划时刻（或机器休眠后醒来）只补跑一次，然后排到下一次
+                    job.schedule(datetime.now(SHANGHAI))
+
+            upcoming = [job.next_run for job in self.jobs.values() if job.next_run]
+            delay = (min(upcoming) - datetime.now(SHANGHAI)).total_seconds() if upcoming else 3600
+            # 休眠/时钟调整后不会睡过头：最长一分钟检查一次
+            self._wake.wait(max(0.0, min(delay, 60)))
+
+
+# ==================== 健康检查 ====================
+def start_health_server(daemon: Daemon, port: int) -> ThreadingHTTPServer:
+    class Handler(BaseHTTPRequestHandler):
+        def _reply(self, code: int, body: Dict) -> None:
+            data = json.dumps(body, ensure_ascii=False, indent=2).encode('utf-8')
+            self.send_response(code)
+            self.send_header('Content-Type', 'application/json; charset=utf-8')
+            self.send_header('Content-Length', str(len(data)))
+            self.end_headers()
+            self.wfile.write(data)
+
+        def do_GET(self):
+            if self.path.rstrip('/') in ('', '/health'):
+                self._reply(200, daemon.status())
+            else:
+                self._reply(404, {'error': 'not found'})
+
+        def do_POST(self):
+            prefix = '/run/'
+            if self.path.startswith(prefix) and daemon.trigger(self.path[len(prefix):].strip('/')):
+                self._reply(202, {'queued': self.path[len(prefix):].strip('/')})
+            else:
+                self._reply(404, {'error': 'unknown platform'})
+
+        def log_message(self, format, *args):
+            log.debug(f"健康检查 {self.address_string()} {format % args}")
+
+    server = ThreadingHTTPServer(('127.0.0.1', port), Handler)
+    threading.Thread(target=server.serve_forever, name='health', daemon=True).start()
+    log.info(f"🩺 健康检查: http://127.0.0.1:{server.server_address[1]}/health")
+    return server
+
+
+def main():
+    parser = argparse.ArgumentParser(description='常驻签到守护进程')
+    parser.add_argument('--only', default='', help='只调度这些平台，逗号分隔')
+    parser.add_argument('--run-now', default='', help='启动后立即执行这些平台，逗号分隔')
+    parser.add_argument('--port', type=int, default=int(os.getenv('CHECKIN_DAEMON_PORT', '') or DEFAULT_PORT),
+                        help='健康检查端口，0 表示不开启')
+    args = parser.parse_args()
+    # 各平台脚本会从 sys.argv 读取自己的选项，守护进程的参数不能留给它们
+    del sys.argv[1:]
+
+    schedule = {name: at for name, (_, at) in PLATFORMS.items()}
+    try:
+        schedule.update(parse_schedule(os.getenv('CHECKIN_DAEMON_SCHEDULE', '')))
+    except ValueError as e:
+        log.error(f"❌ CHECKIN_DAEMON_SCHEDULE 格式错误: {e}")
+        sys.exit(1)
+
+    names = [name.strip() for name in args.only.split(',') if name.strip()] or list(PLATFORMS)
+    unknown = [name for name in names if name not in PLATFORMS]
+    if unknown:
+        log.error(f"❌ 未知平台: {', '.join(unknown)}")
+        sys.exit(1)
+
+    jobs = []
+    for name in names:
+        job = Job(name, PLATFORMS[name][0], schedule[name])
+        job.load()
+        jobs.append(job)
+    log.info(f"📦 已加载 {len(jobs)} 个平台模块")
+
+    daemon = Daemon(jobs)
+    for name in (name.strip() for name in args.run_now.split(',')):
+        if name and not daemon.trigger(name):
+            log.warning(f"⚠️ --run-now 中的平台未加载: {name}")
+
+    if args.port:
+        start_health_server(daemon, args.port)
+
+    try:
+        daemon.serve_forever()
+    except KeyboardInterrupt:
+        log.info("👋 守护进程退出")
+
+
+if __name__ == '__main__':
+    main()
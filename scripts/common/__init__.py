@@ -0,0 +1,7 @@
+# -*- coding: utf-8 -*-
+"""
+签到脚本共用组件
+
+各脚本以 `python scripts/xxx.py` 方式运行，scripts 目录会自动加入 sys.path，
+因此可直接 `from common import ...`。
+"""
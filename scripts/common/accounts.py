@@ -0,0 +1,87 @@
+# -*- coding: utf-8 -*-
+"""
+账号相关的共用工具
+
+除环境变量中的 JSON 数组外，账号还可以放在 JSONL 文件（每行一个 JSON 对象，可 gzip 压缩）中，
+按行惰性读取，边读边校验、去重。
+"""
+
+import os
+import gzip
+import json
+import hashlib
+import logging
+from pathlib import Path
+from typing import Callable, Dict, Iterable, Iterator, List, Tuple
+
+log = logging.getLogger(__name__)
+
+
+def fingerprint(identity: str) -> str:
+    """账号指纹：对账号标识（用户名 / Cookie / Token）做 sha256，日志和状态文件中只出现指纹。"""
+    return hashlib.sha256(identity.strip().encode('utf-8')).hexdigest()[:16]
+
+
+def iter_json_lines(path: Path, label: str = '') -> Iterator[Dict]:
+    """逐行读取 JSONL 账号文件（.gz 结尾时按 gzip 解压），空行和 # 开头的行会被忽略。"""
+    opener = gzip.open if path.suffix == '.gz' else open
+    with opener(path, 'rt', encoding='utf-8') as f:
+        for lineno, line in enumerate(f, 1):
+            line = line.strip()
+            if not line or line.startswith('#'):
+                continue
+            try:
+                yield json.loads(line)
+            except json.JSONDecodeError:
+                log.warning(f"⚠️ {label or path.name} 第 {lineno} 行不是合法 JSON，已忽略")
+
+
+def iter_accounts(sources: Iterable[Iterable[Dict]], identity: Callable[[Dict], str],
+                  required: Tuple[str, ...] = (), label: str = '账号') -> Iterator[Dict]:
+    """依次从多个来源惰性产出账号，边读边校验必填字段并按账号指纹去重。
+
+    内存中只保留已见账号的指纹，账号数达到数万时内存与启动耗时基本不变。
+    """
+    seen = set()
+    for source in sources:
+        for account in source:
+            if not isinstance(account, dict):
+                log.warning(f"⚠️ {label}记录格式错误（应为 JSON 对象），已忽略")
+                continue
+
+            missing = [field for field in required if not str(account.get(field) or '').strip()]
+            if missing:
+                log.warning(f"⚠️ {label}记录缺少字段 {', '.join(missing)}，已忽略")
+                continue
+
+            key = fingerprint(identity(account))
+            if key in seen:
+                log.info(f"♻️ {label} {key} 重复配置，已跳过")
+                continue
+            seen.add(key)
+            yield account
+
+
+def env_cookies(single_env: str, list_env: str, label: str = '账号') -> List[str]:
+    """读取单个 Cookie（single_env）与多个 Cookie（list_env，JSON 数组或每行一个），去重后返回。"""
+    def sources() -> Iterator[Dict]:
+        cookie = os.getenv(single_env, '').strip()
+        if cookie:
+            yield {'cookie': cookie}
+
+        cookies_str = os.getenv(list_env, '').strip()
+        if not cookies_str:
+            return
+        try:
+            cookies = json.loads(cookies_str)
+        except json.JSONDecodeError:
+            cookies = cookies_str.splitlines()
+        if not isinstance(cookies, list):
+            log.warning(f"⚠️ {list_env} 格式错误（应为 JSON 数组或每行一个），已忽略")
+            return
+        for item in cookies:
+            yield {'cookie': item.strip()} if isinstance(item, str) else item
+
+    accounts = iter_accounts([sources()], identity=lambda account: str(account.get('cookie', '')),
+                             required=('cookie',), label=label)
+    return [account['cookie'] for account in accounts]
@@ -0,0 +1,44 @@
+# -*- coding: utf-8 -*-
+"""
+签到脚本统一使用的 HTTPAdapter
+"""
+
+import logging
+from typing import Optional
+
+import requests
+from requests.adapters import HTTPAdapter
+
+from common.cloudflare import ChallengeResponseError, CloudflareChallenge
+from common.connection import POOL_CLASSES_BY_SCHEME
+from common.proxies import ProxyPool
+
+log = logging.getLogger(__name__)
+
+
+class CheckinAdapter(HTTPAdapter):
+    """在 HTTPAdapter 基础上:
+        - 使用带计时的连接池，记录每次建连耗时
+        - 把重试层因 Cloudflare 质询放弃时抛出的 RetryError 还原为 CloudflareChallenge
+        - 配置了出口代理池时，每个请求经评分最好的代理发出，代理失败自动切换（见 common.proxies）
+    """
+
+    def __init__(self, *args, proxy_pool: Optional[ProxyPool] = None, **kwargs):
+        self.proxy_pool = proxy_pool
+        super().__init__(*args, **kwargs)
+
+    def init_poolmanager(self, *args, **kwargs):
+        super().init_poolmanager(*args, **kwargs)
+        self.poolmanager.pool_classes_by_scheme = dict(POOL_CLASSES_BY_SCHEME)
+
+    def send(self, request, **kwargs):
+        try:
+            if self.proxy_pool:
+                return self.proxy_pool.send(super().send, request, **kwargs)
+            return super().send(request, **kwargs)
+        except requests.exceptions.RetryError as e:
+            reason = getattr(e.args[0], 'reason', None) if e.args else None
+            if isinstance(reason, ChallengeResponseError):
+                log.warning(f"☁️ Cloudflare 质询: {request.url} ({reason})")
+                raise CloudflareChallenge(str(reason), request=request) from e
+            raise
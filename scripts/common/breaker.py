@@ -0,0 +1,218 @@
+# -*- coding: utf-8 -*-
+"""
+持久化熔断器
+
+看雪、尚香书苑等站点会按出口 IP 信誉直接拦截（Cloudflare 质询或 403）。
+熔断器按「平台 + 出口」记录在 status/circuit_breaker.json 中（配置了平台代理时出口为该组代理）:
+    closed     正常请求，累计被拦截次数
+    open       连续被拦截达到阈值后打开，冷却期内的运行直接跳过，不再发任何请求
+    half_open  冷却期结束后只发一个短超时、不重试的探测请求，通过则关闭，否则重新打开
+
+环境变量:
+    CHECKIN_BREAKER=0                 关闭熔断器
+    CHECKIN_BREAKER_THRESHOLD         连续被拦截多少次后打开，默认 3
+    CHECKIN_BREAKER_COOLDOWN_HOURS    打开后的冷却时长（小时），默认 20
+    CHECKIN_EGRESS                    出口标识，默认按平台代理 / 运行环境推断
+"""
+
+import os
+import json
+import socket
+import logging
+import threading
+from datetime import datetime, timedelta
+from pathlib import Path
+from typing import Dict, Optional
+
+import requests
+
+from common.cli import env_flag
+from common.cloudflare import CloudflareChallenge, challenge_reason
+from common.http import configure_session
+from common.proxies import proxy_egress
+
+log = logging.getLogger(__name__)
+
+BASE_DIR = Path(__file__).resolve().parents[2]
+STATUS_DIR = BASE_DIR / "status"
+BREAKER_FILE = STATUS_DIR / "circuit_breaker.json"
+
+TIME_FORMAT = '%Y-%m-%d %H:%M:%S'
+DEFAULT_THRESHOLD = 3
+DEFAULT_COOLDOWN_HOURS = 20
+PROBE_TIMEOUT = (3, 5)
+
+CLOSED, OPEN, HALF_OPEN = 'closed', 'open', 'half_open'
+
+
+def detect_egress(platform: Optional[str] = None) -> str:
+    """推断出口标识：配置了平台代理时按代理列表区分；否则 GitHub 托管 runner 共用一类机房 IP，自托管/本地按机器区分。"""
+    egress = os.getenv('CHECKIN_EGRESS', '').strip() or proxy_egress(platform)
+    if egress:
+        return egress
+    if os.getenv('RUNNER_ENVIRONMENT') == 'github-hosted':
+        return 'github-hosted'
+    return os.getenv('RUNNER_NAME', '').strip() or socket.gethostname() or 'local'
+
+
+def is_blocked_response(response: requests.Response) -> bool:
+    """403 或 Cloudflare 质询页视为被拦截。"""
+    return response.status_code == 403 or challenge_reason(response) is not None
+
+
+class CircuitBreaker:
+    """按平台 + 出口持久化的熔断器。"""
+
+    def __init__(self, platform: str, egress: Optional[str] = None, path: Path = BREAKER_FILE):
+        self.platform = platform
+        self.egress = egress or detect_egress(platform)
+        self.key = f"{platform}@{self.egress}"
+        self.path = Path(path)
+        self.enabled = env_flag('CHECKIN_BREAKER', default=True)
+        self.threshold = int(os.getenv('CHECKIN_BREAKER_THRESHOLD', '') or DEFAULT_THRESHOLD)
+        self.cooldown = timedelta(hours=float(os.getenv('CHECKIN_BREAKER_COOLDOWN_HOURS', '') or DEFAULT_COOLDOWN_HOURS))
+        self._lock = threading.Lock()
+        self.entry: Dict = self._load().get(self.key, {'state': CLOSED, 'failures': 0})
+
+    # ---------- 持久化 ----------
+    def _load(self) -> Dict:
+        if not self.path.exists():
+            return {}
+        try:
+            with self.path.open('r', encoding='utf-8') as f:
+                return json.load(f)
+        except Exception as e:
+            log.warning(f"读取熔断器状态失败: {e}")
+            return {}
+
+    def save(self) -> None:
+        if not self.enabled:
+            return
+        try:
+            data = self._load()
+            with self._lock:
+                data[self.key] = dict(self.entry)
+            self.path.parent.mkdir(parents=True, exist_ok=True)
+            with self.path.open('w', encoding='utf-8') as f:
+                json.dump(data, f, ensure_ascii=False, indent=2)
+        except Exception as e:
+            log.error(f"保存熔断器状态失败: {e}")
+
+    # ---------- 状态 ----------
+    @property
+    def state(self) -> str:
+        return self.entry.get('state', CLOSED)
+
+    @property
+    def is_open(self) -> bool:
+        return self.enabled and self.state == OPEN
+
+    def _cooldown_left(self) -> timedelta:
+        try:
+            opened_at = datetime.strptime(self.entry.get('opened_at', ''), TIME_FORMAT)
+        except ValueError:
+            return timedelta(0)
+        return max(timedelta(0), opened_at + self.cooldown - datetime.now())
+
+    def _set(self, **fields) -> None:
+        with self._lock:
+            self.entry.update(fields, updated_at=datetime.now().strftime(TIME_FORMAT))
+
+    def record_blocked(self, reason: str) -> None:
+        """记录一次被拦截；达到阈值或处于半开状态时打开熔断器。
+
+        多个账号并发请求时会同时调用，计数与状态切换在同一把锁内完成，避免丢失计数。
+        """
+        if not self.enabled:
+            return
+        now = datetime.now().strftime(TIME_FORMAT)
+        with self._lock:
+            failures = self.entry.get('failures', 0) + 1
+            state = self.entry.get('state', CLOSED)
+            opened = state == HALF_OPEN or (state == CLOSED and failures >= self.threshold)
+            self.entry.update(failures=failures, last_reason=reason, updated_at=now)
+            if opened:
+                self.entry.update(state=OPEN, opened_at=now)
+        if opened:
+            log.warning(f"🔌 {self.key} 熔断器打开: 连续被拦截 {failures} 次 ({reason})，"
+                        f"冷却 {self.cooldown.total_seconds() / 3600:.0f} 小时")
+
+    def record_success(self) -> None:
+        if not self.enabled:
+            return
+        with self._lock:
+            changed = self.entry.get('state', CLOSED) != CLOSED or self.entry.get('failures')
+            self.entry.update(state=CLOSED, failures=0, last_reason='',
+                              updated_at=datetime.now().strftime(TIME_FORMAT))
+        if changed:
+            log.info(f"🔌 {self.key} 熔断器关闭")
+
+    def observe(self, response: requests.Response, *args, **kwargs) -> requests.Response:
+        """requests 响应钩子：按响应内容更新熔断器。
+
+        Cloudflare 质询会由后续钩子抛出 CloudflareChallenge，由调用方捕获后调用 record_blocked，
+        这里不重复计数。
+        """
+        if challenge_reason(response):
+            return response
+        if is_blocked_response(response):
+            self.record_blocked(f"HTTP {response.status_code} {response.url}")
+        elif response.ok:
+            self.record_success()
+        return response
+
+    def attach(self, session: requests.Session) -> requests.Session:
+        if self.enabled:
+            # 必须排在质询钩子之前，否则异常抛出后本钩子不会执行
+            session.hooks['response'].insert(0, self.observe)
+        return session
+
+    # ---------- 准入 ----------
+    def probe(self, url: str, session: Optional[requests.Session] = None) -> bool:
+        """半开状态下的单次探测：短超时、不重试，只看是否仍被拦截。
+
+        未传入 session 时与正式请求走同一出口（平台配置了代理时经代理池发出）。
+        """
+        self._set(state=HALF_OPEN)
+        log.info(f"🔌 {self.key} 熔断器半开，探测: {url}")
+        own = session is None
+        if own:
+            session = configure_session(requests.Session(), platform=self.platform)
+        try:
+            response = session.get(
+                url,
+                timeout=PROBE_TIMEOUT,
+                allow_redirects=False,
+                headers={'User-Agent': 'Mozilla/5.0'}
+            )
+        except CloudflareChallenge as e:
+            self.record_blocked(f"探测仍被质询: {e}")
+            return False
+        except requests.exceptions.RequestException as e:
+            # 连接失败不能说明仍被拦截（可能只是域名失效），交给正常流程判断
+            log.warning(f"🔌 {self.key} 探测请求失败: {type(e).__name__}，保持半开继续运行")
+            return True
+        finally:
+            if own:
+                session.close()
+
+        if is_blocked_response(response):
+            self.record_blocked(f"探测仍被拦截: HTTP {response.status_code}")
+            return False
+        self.record_success()
+        return True
+
+    def allow(self, probe_url: str, session: Optional[requests.Session] = None) -> bool:
+        """本次运行是否应该继续请求该平台；冷却期内直接返回 False。"""
+        if not self.is_open:
+            return True
+
+        left = self._cooldown_left()
+        if left > timedelta(0):
+            log.warning(f"🔌 {self.key} 熔断器打开中（{self.entry.get('last_reason', '')}），"
+                        f"剩余冷却 {left.total_seconds() / 3600:.1f} 小时，跳过本次运行")
+            return False
+
+        allowed = self.probe(probe_url, session)
+        self.save()
+        return allowed
@@ -0,0 +1,231 @@
+# -*- coding: utf-8 -*-
+"""
+HTTP 录制/回放（磁带）
+
+录制模式下把真实响应脱敏后写入磁带文件，回放模式下完全不走网络，
+直接按请求方法 + URL 返回录制的响应，便于对解析逻辑做可重复的基准测试和回归验证。
+
+启用方式（环境变量）:
+    CHECKIN_CASSETTE=status/cassettes/sxsy.json.gz  磁带文件路径（.gz 结尾则 gzip 压缩）
+    CHECKIN_CASSETTE_MODE=record|replay            录制或回放，默认 replay
+"""
+
+import os
+import json
+import gzip
+import base64
+import atexit
+import logging
+import threading
+from datetime import timedelta
+from pathlib import Path
+from typing import Optional, Dict, List, Set
+from urllib.parse import urlsplit, urlunsplit, parse_qsl, urlencode
+
+import requests
+from requests.adapters import HTTPAdapter
+from requests.structures import CaseInsensitiveDict
+from requests.utils import get_encoding_from_headers
+
+from common.adapter import CheckinAdapter
+
+log = logging.getLogger(__name__)
+
+CASSETTE_ENV = 'CHECKIN_CASSETTE'
+CASSETTE_MODE_ENV = 'CHECKIN_CASSETTE_MODE'
+MODES = ('record', 'replay')
+
+REDACTED = '***'
+# 请求/响应头中需要脱敏的字段
+SECRET_HEADERS = {'cookie', 'set-cookie', 'authorization', 'proxy-authorization', 'x-http-token'}
+# URL 参数、表单和 JSON 中需要脱敏的字段
+SECRET_FIELDS = {'password', 'pwd', 'token', 'formhash', 'cookie', 'user_login', 'username', 'sckey'}
+# 回放时无意义的响应头（正文已解压、长度已变化）
+DROP_HEADERS = {'content-encoding', 'transfer-encoding', 'content-length', 'connection', 'keep-alive'}
+
+
+def redact_url(url: str) -> str:
+    """对 URL 查询参数中的敏感字段脱敏，同时作为回放匹配的键。"""
+    parts = urlsplit(url)
+    if not parts.query:
+        return url
+    query = [
+        (key, REDACTED if key.lower() in SECRET_FIELDS else value)
+        for key, value in parse_qsl(parts.query, keep_blank_values=True)
+    ]
+    return urlunsplit(parts._replace(query=urlencode(query, safe='*')))
+
+
+def request_key(method: str, url: str) -> str:
+    return f"{method.upper()} {redact_url(url)}"
+
+
+def _collect_secrets(request: requests.PreparedRequest) -> Set[str]:
+    """收集请求中出现的敏感值，用于从响应正文中抹除。"""
+    secrets = set()
+    for name, value in request.headers.items():
+        if name.lower() not in SECRET_HEADERS:
+            continue
+        if name.lower() == 'cookie':
+            for item in value.split(';'):
+                if '=' in item:
+                    secrets.add(item.split('=', 1)[1].strip())
+        else:
+            secrets.add(value.strip())
+
+    body = request.body
+    if isinstance(body, bytes):
+        body = body.decode('utf-8', errors='ignore')
+    if body:
+        fields: Dict[str, str] = {}
+        try:
+            data = json.loads(body)
+            if isinstance(data, dict):
+                fields = {k: v for k, v in data.items() if isinstance(v, str)}
+        except ValueError:
+            fields = dict(parse_qsl(body, keep_blank_values=True))
+        secrets.update(v for k, v in fields.items() if k.lower() in SECRET_FIELDS)
+
+    # 过短的值替换后会误伤正文
+    return {s for s in secrets if len(s) >= 4}
+
+
+class Cassette:
+    """一盘磁带：按请求键保存有序的响应列表。"""
+
+    def __init__(self, path: Path, mode: str = 'replay'):
+        if mode not in MODES:
+            raise ValueError(f"未知的磁带模式: {mode}")
+        self.path = Path(path)
+        self.mode = mode
+        self.interactions: List[Dict] = []
+        self._cursor: Dict[str, int] = {}
+        self._lock = threading.Lock()
+
+        if mode == 'replay':
+            self.load()
+
+    # ---------- 读写 ----------
+    def load(self) -> None:
+        opener = gzip.open if self.path.suffix == '.gz' else open
+        with opener(self.path, 'rt', encoding='utf-8') as f:
+            data = json.load(f)
+        self.interactions = data.get('interactions', [])
+        log.info(f"📼 已加载磁带: {self.path} ({len(self.interactions)} 条响应)")
+
+    def save(self) -> None:
+        if self.mode != 'record':
+            return
+        self.path.parent.mkdir(parents=True, exist_ok=True)
+        opener = gzip.open if self.path.suffix == '.gz' else open
+        with self._lock:
+            data = {'version': 1, 'interactions': self.interactions}
+            with opener(self.path, 'wt', encoding='utf-8') as f:
+                json.dump(data, f, ensure_ascii=False, separators=(',', ':'))
+        log.info(f"💾 磁带已保存: {self.path} ({len(self.interactions)} 条响应)")
+
+    # ---------- 录制 ----------
+    def record(self, request: requests.PreparedRequest, response: requests.Response) -> None:
+        secrets = _collect_secrets(request)
+        body = response.content or b''
+        try:
+            text = body.decode('utf-8')
+            for secret in secrets:
+                text = text.replace(secret, REDACTED)
+            encoding, stored = 'utf-8', text
+        except UnicodeDecodeError:
+            encoding, stored = 'base64', base64.b64encode(body).decode('ascii')
+
+        headers = {
+            name: (REDACTED if name.lower() in SECRET_HEADERS else value)
+            for name, value in response.headers.items()
+            if name.lower() not in DROP_HEADERS
+        }
+        with self._lock:
+            self.interactions.append({
+                'key': request_key(request.method, request.url),
+                'status': response.status_code,
+                'reason': response.reason,
+                'headers': headers,
+                'body': stored,
+                'encoding': encoding,
+                'elapsed': round(response.elapsed.total_seconds(), 4),
+            })
+
+    # ---------- 回放 ----------
+    def find(self, key: str) -> Optional[Dict]:
+        """按录制顺序返回同一请求键的下一条响应，用完后重复最后一条。"""
+        with self._lock:
+            matches = [item for item in self.interactions if item['key'] == key]
+            if not matches:
+                return None
+            index = self._cursor.get(key, 0)
+            self._cursor[key] = index + 1
+            return matches[min(index, len(matches) - 1)]
+
+    def play(self, request: requests.PreparedRequest, connection: Optional[HTTPAdapter] = None) -> requests.Response:
+        key = request_key(request.method, request.url)
+        item = self.find(key)
+        if item is None:
+            raise requests.exceptions.ConnectionError(f"磁带中没有匹配的请求: {key}", request=request)
+        return build_response(item, request, connection)
+
+    def rewind(self) -> None:
+        with self._lock:
+            self._cursor.clear()
+
+
+def decode_body(item: Dict) -> bytes:
+    if item.get('encoding') == 'base64':
+        return base64.b64decode(item['body'])
+    return item['body'].encode('utf-8')
+
+
+def build_response(item: Dict, request: requests.PreparedRequest,
+                   connection: Optional[HTTPAdapter] = None) -> requests.Response:
+    """把磁带中的一条记录还原为 requests.Response。"""
+    response = requests.Response()
+    response.status_code = item['status']
+    response.reason = item.get('reason', '')
+    response.headers = CaseInsensitiveDict(item.get('headers', {}))
+    response._content = decode_body(item)
+    response.encoding = get_encoding_from_headers(response.headers)
+    response.url = request.url
+    response.request = request
+    response.elapsed = timedelta(seconds=item.get('elapsed', 0))
+    response.connection = connection
+    return response
+
+
+class CassetteAdapter(CheckinAdapter):
+    """录制时透传并记录真实响应，回放时直接从磁带返回。"""
+
+    def __init__(self, cassette: Cassette, **kwargs):
+        self.cassette = cassette
+        super().__init__(**kwargs)
+
+    def send(self, request, **kwargs):
+        if self.cassette.mode == 'replay':
+            return self.cassette.play(request, connection=self)
+        response = super().send(request, **kwargs)
+        self.cassette.record(request, response)
+        return response
+
+
+_cassettes: Dict[str, Cassette] = {}
+
+
+def cassette_from_env() -> Optional[Cassette]:
+    """按环境变量打开磁带；同一路径在进程内只打开一次，录制模式退出时自动保存。"""
+    path = os.getenv(CASSETTE_ENV, '').strip()
+    if not path:
+        return None
+
+    if path not in _cassettes:
+        mode = os.getenv(CASSETTE_MODE_ENV, 'replay').strip().lower() or 'replay'
+        cassette = Cassette(Path(path), mode)
+        if mode == 'record':
+            atexit.register(cassette.save)
+        log.info(f"📼 HTTP 磁带已启用: {mode} -> {path}")
+        _cassettes[path] = cassette
+    return _cassettes[path]
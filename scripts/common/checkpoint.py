@@ -0,0 +1,118 @@
+# -*- coding: utf-8 -*-
+"""
+当日签到断点记录
+
+工作流被重跑或中途被杀掉时，原本所有账号都会从头再处理一遍（看雪的状态查询、雨晨的完整登录、
+尚香书苑的签到页请求）。这里按 平台 + 日期（北京时间）记录当天已确认签到的账号指纹:
+    status/checkpoint/<平台>-<YYYY-MM-DD>.jsonl
+每确认一个账号就追加一行并立即落盘，进程中途退出也不会丢失进度；
+下次运行时已记录的账号直接跳过，不发任何请求，未完成的批次从中断处继续。
+目录不入库（actions/checkout 会清掉它），工作流用 actions/cache 按平台 + 日期在重跑之间保存。
+
+环境变量:
+    CHECKIN_CHECKPOINT=0  关闭断点记录
+"""
+
+import json
+import logging
+import threading
+from datetime import datetime, timedelta, timezone
+from pathlib import Path
+from typing import Dict, Optional
+
+from common.accounts import fingerprint
+from common.cli import env_flag
+
+log = logging.getLogger(__name__)
+
+BASE_DIR = Path(__file__).resolve().parents[2]
+CHECKPOINT_DIR = BASE_DIR / "status" / "checkpoint"
+
+# 各站点按北京时间跨天；固定偏移即可，不依赖系统时区数据
+SHANGHAI = timezone(timedelta(hours=8), 'Asia/Shanghai')
+
+
+def today() -> str:
+    """北京时间的当天日期 YYYY-MM-DD"""
+    return datetime.now(SHANGHAI).strftime('%Y-%m-%d')
+
+
+class Checkpoint:
+    """单个平台当天的已签到账号记录（线程安全）。"""
+
+    def __init__(self, platform: str, day: Optional[str] = None, directory: Path = CHECKPOINT_DIR):
+        self.platform = platform
+        self.day = day or today()
+        self.directory = Path(directory)
+        self.path = self.directory / f"{platform}-{self.day}.jsonl"
+        self.enabled = env_flag('CHECKIN_CHECKPOINT', default=True)
+        self._lock = threading.Lock()
+        self._torn = False
+        self.done: Dict[str, Dict] = self._load() if self.enabled else {}
+        if self.done:
+            log.info(f"📌 {platform} 今日已有 {len(self.done)} 个账号签到完成，将直接跳过")
+
+    def _load(self) -> Dict[str, Dict]:
+        done = {}
+        if not self.path.exists():
+            return done
+        try:
+            with self.path.open('r', encoding='utf-8') as f:
+                for line in f:
+                    # 进程被杀时最后一行可能只写了一半，续写前要先补上换行
+                    self._torn = not line.endswith('\n')
+                    line = line.strip()
+                    if not line:
+                        continue
+                    try:
+                        record = json.loads(line)
+                    except json.JSONDecodeError:
+                        continue
+                    done[record['account']] = record
+        except Exception as e:
+            log.warning(f"读取断点记录失败: {e}")
+        return done
+
+    def _prune(self) -> None:
+        """删除本平台往日的记录文件"""
+        for old in self.directory.glob(f"{self.platform}-*.jsonl"):
+            if old != self.path:
+                try:
+                    old.unlink()
+                except OSError:
+                    pass
+
+    def get(self, identity: str) -> Optional[Dict]:
+        """返回该账号今天的签到记录，未记录时返回 None"""
+        if not self.enabled:
+            return None
+        with self._lock:
+            return self.done.get(fingerprint(identity))
+
+    def is_done(self, identity: str) -> bool:
+        return self.get(identity) is not None
+
+    def mark_done(self, identity: str, message: str = '') -> None:
+        """记录账号今天已签到，立即追加写入文件"""
+        if not self.enabled:
+            return
+        record = {
+            'account': fingerprint(identity),
+            'message': message,
+            'time': datetime.now(SHANGHAI).strftime('%Y-%m-%d %H:%M:%S')
+        }
+        with self._lock:
+            if record['account'] in self.done:
+                return
+            self.done[record['account']] = record
+            try:
+                if not self.path.exists():
+                    self.directory.mkdir(parents=True, exist_ok=True)
+                    self._prune()
+                with self.path.open('a', encoding='utf-8') as f:
+                    if self._torn:
+                        f.write('\n')
+                        self._torn = False
+                    f.write(json.dumps(record, ensure_ascii=False) + '\n')
+            except Exception as e:
+                log.warning(f"写入断点记录失败: {e}")
@@ -0,0 +1,49 @@
+# -*- coding: utf-8 -*-
+"""
+命令行选项辅助
+
+各脚本的 main() 不使用 argparse，这里提供从 sys.argv 取出（并移除）共用选项的小工具，
+同时支持用环境变量设置，方便在 GitHub Actions 中通过 env 开启。
+"""
+
+import os
+import sys
+from typing import List, Optional
+
+TRUTHY = {'1', 'true', 'yes', 'on'}
+
+
+def env_flag(env: str, default: bool = False) -> bool:
+    value = os.getenv(env, '').strip().lower()
+    if not value:
+        return default
+    return value in TRUTHY
+
+
+def pop_flag(name: str, env: Optional[str] = None, argv: Optional[List[str]] = None) -> bool:
+    """取出布尔开关 `--name`；命令行未指定时读取环境变量 env。"""
+    argv = sys.argv if argv is None else argv
+    if name in argv:
+        argv.remove(name)
+        return True
+    return env_flag(env) if env else False
+
+
+def pop_option(name: str, env: Optional[str] = None, default: Optional[str] = None,
+               argv: Optional[List[str]] = None) -> Optional[str]:
+    """取出带值选项 `--name value` 或 `--name=value`；未指定时读取环境变量 env。"""
+    argv = sys.argv if argv is None else argv
+    for index, arg in enumerate(argv):
+        if arg == name and index + 1 < len(argv):
+            value = argv[index + 1]
+            del argv[index:index + 2]
+            return value
+        if arg.startswith(f"{name}="):
+            del argv[index]
+            return arg.split('=', 1)[1]
+
+    if env:
+        value = os.getenv(env, '').strip()
+        if value:
+            return value
+    return default
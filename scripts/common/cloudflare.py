@@ -0,0 +1,73 @@
+# -*- coding: utf-8 -*-
+"""
+Cloudflare 质询页早期识别
+
+Cloudflare 按 IP 信誉弹出 JS 质询（"Just a moment..."）时，脚本原本会把质询页当作正常响应，
+继续查找 formhash、解析 JSON、重试甚至切换域名，白白耗时。这里在 HTTP 层识别质询页:
+    - 响应钩子根据状态码、cf-mitigated / server 响应头和正文开头识别，立即抛出 CloudflareChallenge
+    - 重试层遇到带 cf-mitigated 头的 503 不再重试，由 CheckinAdapter 同样转换为 CloudflareChallenge
+"""
+
+import logging
+from typing import Optional
+
+import requests
+from urllib3.exceptions import ResponseError
+
+log = logging.getLogger(__name__)
+
+CHALLENGE_STATUSES = {403, 429, 503}
+BODY_MARKERS = (
+    b'<title>Just a moment...</title>',
+    b'Just a moment...',
+    b'cf-chl',
+    b'challenge-platform',
+    b'cf_chl_opt',
+    b'Attention Required! | Cloudflare',
+)
+# 质询特征都在页面开头，只检查前若干字节
+PEEK_BYTES = 4096
+
+
+class CloudflareChallenge(requests.exceptions.RequestException):
+    """请求被 Cloudflare 质询拦截，解析、重试和换域名都无意义。"""
+
+
+class ChallengeResponseError(ResponseError):
+    """重试层识别到质询响应时使用的原因，由 CheckinAdapter 转换为 CloudflareChallenge。"""
+
+
+def challenge_from_headers(status: int, headers) -> Optional[str]:
+    """仅凭状态码和响应头判断是否为质询，命中时返回原因。"""
+    mitigated = (headers.get('cf-mitigated') or '').lower()
+    if mitigated == 'challenge':
+        return f"HTTP {status} cf-mitigated: challenge"
+    return None
+
+
+def challenge_reason(response: requests.Response) -> Optional[str]:
+    """判断响应是否为 Cloudflare 质询页，命中时返回原因，否则返回 None。"""
+    reason = challenge_from_headers(response.status_code, response.headers)
+    if reason:
+        return reason
+
+    if response.status_code not in CHALLENGE_STATUSES:
+        return None
+    if not (response.headers.get('server') or '').lower().startswith('cloudflare'):
+        return None
+
+    head = (response.content or b'')[:PEEK_BYTES]
+    for marker in BODY_MARKERS:
+        if marker in head:
+            return f"HTTP {response.status_code} {marker.decode()}"
+    return None
+
+
+def raise_on_challenge(response: requests.Response, *args, **kwargs) -> requests.Response:
+    """requests 响应钩子：识别到质询页时立即抛出 CloudflareChallenge。"""
+    reason = challenge_reason(response)
+    if reason:
+        log.warning(f"☁️ Cloudflare 质询: {response.url} ({reason})")
+        raise CloudflareChallenge(reason, response=response, request=response.request)
+    return response
+
@@ -0,0 +1,73 @@
+# -*- coding: utf-8 -*-
+"""
+带计时的 urllib3 连接
+
+替换连接池的 ConnectionCls，在建立连接（TCP + TLS 握手）时计时并通知监听者，
+供超时策略等按主机统计连接耗时。
+开启 CHECKIN_TLS_RESUME 时 HTTPS 连接共用 SSLContext 并复用 TLS 会话（见 common.tls）。
+"""
+
+import time
+import logging
+from typing import Callable, List
+
+from urllib3.connection import HTTPConnection, HTTPSConnection
+from urllib3.connectionpool import HTTPConnectionPool, HTTPSConnectionPool
+
+from common.tls import store as tls_sessions
+
+log = logging.getLogger(__name__)
+
+# 监听者签名: (scheme, host, 连接耗时秒数)
+ConnectListener = Callable[[str, str, float], None]
+_listeners: List[ConnectListener] = []
+
+
+def add_connect_listener(listener: ConnectListener) -> None:
+    if listener not in _listeners:
+        _listeners.append(listener)
+
+
+def _notify(scheme: str, host: str, seconds: float) -> None:
+    for listener in _listeners:
+        try:
+            listener(scheme, host, seconds)
+        except Exception as e:
+            log.debug(f"连接监听者异常: {e}")
+
+
+class TimedHTTPConnection(HTTPConnection):
+    def connect(self) -> None:
+        start = time.perf_counter()
+        super().connect()
+        _notify('http', self.host, time.perf_counter() - start)
+
+
+class TimedHTTPSConnection(HTTPSConnection):
+    def connect(self) -> None:
+        if tls_sessions.enabled and self.ssl_context is None and not self.cert_file:
+            self.ssl_context = tls_sessions.context_for(self)
+        start = time.perf_counter()
+        super().connect()
+        _notify('https', self.host, time.perf_counter() - start)
+
+    def getresponse(self, *args, **kwargs):
+        response = super().getresponse(*args, **kwargs)
+        if tls_sessions.enabled:
+            # TLS 1.3 的会话票据在握手完成后才随首个响应到达
+            tls_sessions.remember(self.sock)
+        return response
+
+
+class TimedHTTPConnectionPool(HTTPConnectionPool):
+    ConnectionCls = TimedHTTPConnection
+
+
+class TimedHTTPSConnectionPool(HTTPSConnectionPool):
+    ConnectionCls = TimedHTTPSConnection
+
+
+POOL_CLASSES_BY_SCHEME = {
+    'http': TimedHTTPConnectionPool,
+    'https': TimedHTTPSConnectionPool,
+}
@@ -0,0 +1,223 @@
+# -*- coding: utf-8 -*-
+"""
+进程级 DNS 缓存与 Happy Eyeballs 建连
+
+每个 requests 会话（以及不带会话的 requests.get）建立新连接时都会重新解析域名，
+并按系统返回的第一个地址族串行尝试；IPv6 不通的环境要等到连接超时才回退到 IPv4。
+这里替换 urllib3 的 create_connection，所有 HTTP 客户端共用:
+    - 解析结果按 (主机, 端口, 地址族) 缓存 CHECKIN_DNS_TTL 秒，并发解析同一主机只查一次
+    - 按 RFC 8305 交替排列 IPv6 / IPv4 地址，每隔 250ms 追加一个连接尝试，先连上的胜出，其余关闭
+    - 全部地址都连不上时丢弃该主机的缓存，下次重新解析
+
+环境变量:
+    CHECKIN_DNS_CACHE=0   关闭（恢复 urllib3 原始实现）
+    CHECKIN_DNS_TTL       缓存有效期（秒），默认 300
+"""
+
+import os
+import time
+import errno
+import socket
+import logging
+import threading
+import selectors
+from typing import Dict, List, Optional, Tuple
+
+import urllib3.util.connection as urllib3_connection
+from urllib3.exceptions import LocationParseError
+from urllib3.util.timeout import _DEFAULT_TIMEOUT
+
+from common.cli import env_flag
+
+log = logging.getLogger(__name__)
+
+DEFAULT_TTL = 300.0
+# RFC 8305 建议的连接尝试间隔
+ATTEMPT_DELAY = 0.25
+IN_PROGRESS = {0, errno.EINPROGRESS, errno.EWOULDBLOCK, errno.EALREADY}
+
+AddrInfo = Tuple[int, int, int, str, tuple]
+Key = Tuple[str, int, int]
+
+
+def _ttl() -> float:
+    try:
+        return float(os.getenv('CHECKIN_DNS_TTL', '') or DEFAULT_TTL)
+    except ValueError:
+        log.warning(f"⚠️ CHECKIN_DNS_TTL 不是数字，使用默认值 {DEFAULT_TTL}")
+        return DEFAULT_TTL
+
+
+# ==================== 解析缓存 ====================
+class Resolver:
+    """带 TTL 的 getaddrinfo 缓存（线程安全）。"""
+
+    def __init__(self, ttl: Optional[float] = None):
+        self.ttl = _ttl() if ttl is None else ttl
+        self._cache: Dict[Key, Tuple[float, List[AddrInfo]]] = {}
+        self._locks: Dict[Key, threading.Lock] = {}
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+
+    def _key_lock(self, key: Key) -> threading.Lock:
+        with self._lock:
+            return self._locks.setdefault(key, threading.Lock())
+
+    def resolve(self, host: str, port: int, family: int = socket.AF_UNSPEC) -> List[AddrInfo]:
+        key = (host.lower(), port, family)
+        # 同一主机的并发解析排队，第一个查完后其余直接命中缓存
+        with self._key_lock(key):
+            cached = self._cache.get(key)
+            if cached and cached[0] > time.monotonic():
+                self.hits += 1
+                return cached[1]
+
+            start = time.perf_counter()
+            addresses = socket.getaddrinfo(host, port, family, socket.SOCK_STREAM)
+            self.misses += 1
+            log.debug(f"DNS 解析 {host}: {len(addresses)} 个地址，耗时 {(time.perf_counter() - start) * 1000:.0f} ms")
+            if addresses:
+                self._cache[key] = (time.monotonic() + self.ttl, addresses)
+            return addresses
+
+    def forget(self, host: str) -> None:
+        """丢弃某主机的全部缓存记录"""
+        host = host.lower()
+        with self._lock:
+            for key in [key for key in self._cache if key[0] == host]:
+                self._cache.pop(key, None)
+
+    def clear(self) -> None:
+        with self._lock:
+            self._cache.clear()
+
+
+resolver = Resolver()
+
+
+# ==================== Happy Eyeballs ====================
+def interleave(addresses: List[AddrInfo]) -> List[AddrInfo]:
+    """按 RFC 8305 交替排列地址族，首个地址的地址族优先。"""
+    if not addresses:
+        return []
+    first = addresses[0][0]
+    primary = [item for item in addresses if item[0] == first]
+    secondary = [item for item in addresses if item[0] != first]
+    ordered = []
+    for index in range(max(len(primary), len(secondary))):
+        ordered.extend(group[index] for group in (primary, secondary) if index < len(group))
+    return ordered
+
+
+def _start(address: AddrInfo, source_address, socket_options) -> socket.socket:
+    family, socktype, proto, _, sockaddr = address
+    sock = socket.socket(family, socktype, proto)
+    try:
+        for option in socket_options or ():
+            sock.setsockopt(*option)
+        if source_address:
+            sock.bind(source_address)
+        sock.setblocking(False)
+        code = sock.connect_ex(sockaddr)
+        if code not in IN_PROGRESS:
+            raise OSError(code, os.strerror(code))
+    except Exception:
+        sock.close()
+        raise
+    return sock
+
+
+def race(addresses: List[AddrInfo], timeout: Optional[float],
+         source_address=None, socket_options=None) -> socket.socket:
+    """并发尝试连接各地址，返回最先连上的 socket；超时抛出 socket.timeout。"""
+    pending = list(addresses)
+    attempts: Dict[socket.socket, AddrInfo] = {}
+    selector = selectors.DefaultSelector()
+    deadline = None if timeout is None else time.monotonic() + timeout
+    next_start = time.monotonic()
+    error: Optional[BaseException] = None
+    try:
+        while pending or attempts:
+            now = time.monotonic()
+            if pending and now >= next_start:
+                address = pending.pop(0)
+                try:
+                    sock = _start(address, source_address, socket_options)
+                except OSError as e:
+                    # 立即失败（如没有 IPv6 路由）时不必等待间隔，直接尝试下一个
+                    error = e
+                    continue
+                selector.register(sock, selectors.EVENT_WRITE)
+                attempts[sock] = address
+                next_start = now + ATTEMPT_DELAY
+
+            if not attempts:
+                continue
+
+            wait = max(0.0, next_start - now) if pending else None
+            if deadline is not None:
+                remaining = deadline - now
+                if remaining <= 0:
+                    raise socket.timeout('timed out')
+                wait = remaining if wait is None else min(wait, remaining)
+
+            for key, _ in selector.select(wait):
+                sock = key.fileobj
+                selector.unregister(sock)
+                address = attempts.pop(sock)
+                code = sock.getsockopt(socket.SOL_SOCKET, socket.SO_ERROR)
+                if code:
+                    error = OSError(code, os.strerror(code))
+                    sock.close()
+                    next_start = time.monotonic()
+                    continue
+                log.debug(f"Happy Eyeballs 选用 {address[4][0]}")
+                sock.setblocking(True)
+                return sock
+
+        raise error or OSError("getaddrinfo returns an empty list")
+    finally:
+        for sock in attempts:
+            sock.close()
+        selector.close()
+
+
+def create_connection(address: Tuple[str, int], timeout=_DEFAULT_TIMEOUT,
+                      source_address=None, socket_options=None) -> socket.socket:
+    """替换 urllib3.util.connection.create_connection，签名与行为保持一致。"""
+    host, port = address
+    if host.startswith('['):
+        host = host.strip('[]')
+    try:
+        host.encode('idna')
+    except UnicodeError:
+        raise LocationParseError(f"'{host}', label empty or too long") from None
+
+    if timeout is _DEFAULT_TIMEOUT:
+        timeout = socket.getdefaulttimeout()
+
+    addresses = interleave(resolver.resolve(host, port, urllib3_connection.allowed_gai_family()))
+    try:
+        sock = race(addresses, timeout, source_address, socket_options)
+    except OSError:
+        # 缓存的地址可能已经失效，下次重新解析
+        resolver.forget(host)
+        raise
+    sock.settimeout(timeout)
+    return sock
+
+
+# ==================== 安装 ====================
+_original = urllib3_connection.create_connection
+
+
+def install() -> None:
+    """替换 urllib3 的建连函数，重复调用无副作用；CHECKIN_DNS_CACHE=0 时不做替换。"""
+    if not env_flag('CHECKIN_DNS_CACHE', default=True):
+        return
+    urllib3_connection.create_connection = create_connection
+
+
+def uninstall() -> None:
+    urllib3_connection.create_connection = _original
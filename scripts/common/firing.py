@@ -0,0 +1,130 @@
+# -*- coding: utf-8 -*-
+"""
+定点发射：提前准备，到点发出签到请求
+
+部分平台的奖励先到先得，而脚本要先经过解释器启动、导入、DNS、TLS 握手和登录才发出签到请求。
+指定目标时刻后，脚本在目标前 lead 秒开始准备（登录、抓取 formhash、预热连接），
+准备完成后各账号在目标时刻同时发出最后一个签到请求，并记录实际发送时刻与目标的偏差。
+定点发射时所有账号同时准备（并发至少为账号数），时间窗口（--window）不再生效。
+
+命令行 / 环境变量:
+    --fire-at / CHECKIN_FIRE_AT       目标时刻，北京时间 "HH:MM" 或 "HH:MM:SS"
+    --fire-lead / CHECKIN_FIRE_LEAD   提前准备的秒数，默认 30
+目标已经过去时立即执行；目标在 12 小时以内的明天（如 23:59 启动、00:00 发射）按明天计算。
+"""
+
+import time
+import logging
+import threading
+from datetime import datetime, timedelta
+from typing import List, Optional
+
+from common.checkpoint import SHANGHAI
+from common.cli import pop_option
+
+log = logging.getLogger(__name__)
+
+FIRE_AT_ENV = 'CHECKIN_FIRE_AT'
+FIRE_LEAD_ENV = 'CHECKIN_FIRE_LEAD'
+DEFAULT_LEAD = 30.0
+# 距目标不足这么多秒时改为忙等，避免 sleep 的调度误差
+SPIN_SECONDS = 0.02
+
+
+def parse_fire_at(value: str, now: Optional[datetime] = None) -> float:
+    """解析目标时刻（北京时间），返回时间戳"""
+    now = now or datetime.now(SHANGHAI)
+    for pattern in ('%H:%M:%S', '%H:%M'):
+        try:
+            moment = datetime.strptime(value.strip(), pattern).time()
+            break
+        except ValueError:
+            continue
+    else:
+        raise ValueError(f"目标时刻格式应为 HH:MM 或 HH:MM:SS，实际为: {value}")
+
+    target = now.replace(hour=moment.hour, minute=moment.minute, second=moment.second, microsecond=0)
+    if target - now > timedelta(hours=12):
+        target -= timedelta(days=1)
+    elif now - target >= timedelta(hours=12):
+        target += timedelta(days=1)
+    return target.timestamp()
+
+
+def _sleep_until(moment: float) -> None:
+    while True:
+        remaining = moment - time.time()
+        if remaining <= 0:
+            return
+        if remaining > SPIN_SECONDS:
+            time.sleep(remaining - SPIN_SECONDS)
+
+
+class FireAt:
+    """目标时刻与各账号的发送偏差（线程安全）。"""
+
+    def __init__(self, target: float, lead: float = DEFAULT_LEAD):
+        self.target = target
+        self.lead = max(0.0, lead)
+        self.drifts: List[float] = []
+        self._lock = threading.Lock()
+
+    @property
+    def target_text(self) -> str:
+        return datetime.fromtimestamp(self.target, SHANGHAI).strftime('%H:%M:%S.%f')[:-3]
+
+    def workers(self, count: int, concurrency: int) -> int:
+        """所有账号都要在目标前准备好，并发至少为账号数"""
+        if count > concurrency:
+            log.info(f"🎯 定点发射: 并发从 {concurrency} 提高到账号数 {count}，所有账号同时准备")
+        return max(count, concurrency)
+
+    def wait_prepare(self) -> None:
+        """等到目标前 lead 秒再开始准备，避免登录态和预热连接放置过久"""
+        delay = self.target - self.lead - time.time()
+        if self.target <= time.time():
+            log.warning(f"⚠️ 目标时刻 {self.target_text} 已经过去，立即执行")
+        elif delay > 0:
+            log.info(f"🎯 目标时刻 {self.target_text}，{delay:.1f} 秒后开始准备（提前 {self.lead:.0f} 秒）")
+            time.sleep(delay)
+        else:
+            log.info(f"🎯 目标时刻 {self.target_text}，距目标 {self.target - time.time():.1f} 秒，立即开始准备")
+
+    def fire(self, label: str = '') -> float:
+        """准备完成后调用：等到目标时刻返回，记录并返回偏差（秒，正数表示晚于目标）"""
+        prefix = f"[{label}] " if label else ''
+        remaining = self.target - time.time()
+        if remaining > 0:
+            log.info(f"{prefix}⏳ 准备完成，{remaining:.2f} 秒后发出签到请求")
+            _sleep_until(self.target)
+        drift = time.time() - self.target
+        with self._lock:
+            self.drifts.append(drift)
+        if remaining < 0:
+            log.warning(f"{prefix}⚠️ 签到请求晚于目标 {drift * 1000:.1f} ms 发出（准备超过了提前量或启动时已过目标）")
+        else:
+            log.info(f"{prefix}🎯 签到请求发出，偏差 {drift * 1000:+.1f} ms")
+        return drift
+
+    def report(self) -> None:
+        with self._lock:
+            drifts = sorted(self.drifts)
+        if not drifts:
+            return
+        log.info(f"🎯 定点发射 {len(drifts)} 次，目标 {self.target_text}，"
+                 f"偏差 最小 {drifts[0] * 1000:+.1f} ms / 中位 {drifts[len(drifts) // 2] * 1000:+.1f} ms / "
+                 f"最大 {drifts[-1] * 1000:+.1f} ms")
+
+
+def fire_at_from_cli() -> Optional[FireAt]:
+    """从 --fire-at / CHECKIN_FIRE_AT 与 --fire-lead / CHECKIN_FIRE_LEAD 读取，未配置返回 None"""
+    value = pop_option('--fire-at', FIRE_AT_ENV)
+    lead_text = pop_option('--fire-lead', FIRE_LEAD_ENV)
+    if not value:
+        return None
+    try:
+        lead = float(lead_text) if lead_text else DEFAULT_LEAD
+    except ValueError:
+        log.warning(f"⚠️ {FIRE_LEAD_ENV} 不是数字，使用默认值 {DEFAULT_LEAD}")
+        lead = DEFAULT_LEAD
+    return FireAt(parse_fire_at(value), lead)
@@ -0,0 +1,164 @@
+# -*- coding: utf-8 -*-
+"""
+签到脚本共用的 HTTP 会话配置
+
+所有脚本创建 requests.Session 后都应调用 configure_session，
+以便录制/回放、Cloudflare 质询识别、延迟采样等横切功能在一处统一挂载。
+导入本模块即启用进程级 DNS 缓存与 Happy Eyeballs 建连（见 common.dns），不经过会话的请求同样生效。
+"""
+
+import time
+import threading
+from typing import Dict, List, Optional, Tuple, Union
+from urllib.parse import urlsplit
+
+import requests
+from requests.adapters import HTTPAdapter
+from urllib3.util.retry import Retry
+
+from common.adapter import CheckinAdapter
+from common.cassette import CassetteAdapter, cassette_from_env
+from common.cloudflare import raise_on_challenge
+from common.dns import install as install_dns, resolver
+from common.metrics import registry as metrics
+from common.proxies import proxy_pool_for
+from common.timeouts import policy as timeout_policy
+
+install_dns()
+
+
+def build_adapter(retries: Optional[Union[Retry, int]] = None, platform: Optional[str] = None,
+                  **kwargs) -> HTTPAdapter:
+    """创建 HTTPAdapter；设置了 CHECKIN_CASSETTE 时改用录制/回放适配器。
+
+    传入 platform 且配置了 <平台>_PROXIES / CHECKIN_PROXIES 时，请求经该平台的出口代理池发出。
+    """
+    if retries is None:
+        retries = 0
+
+    cassette = cassette_from_env()
+    if cassette:
+        return CassetteAdapter(cassette, max_retries=retries, **kwargs)
+    return CheckinAdapter(max_retries=retries, proxy_pool=proxy_pool_for(platform), **kwargs)
+
+
+def configure_session(session: requests.Session,
+                      retries: Optional[Union[Retry, int]] = None,
+                      adapter: Optional[HTTPAdapter] = None,
+                      platform: Optional[str] = None,
+                      **kwargs) -> requests.Session:
+    """为 session 的 http/https 挂载统一的适配器并安装响应钩子，返回同一个 session。
+
+    多账号共用连接池时传入同一个 adapter（由 build_adapter 创建），各 session 仍保留独立的 Cookie。
+    """
+    if adapter is None:
+        adapter = build_adapter(retries, platform=platform, **kwargs)
+    session.mount("https://", adapter)
+    session.mount("http://", adapter)
+
+    for hook in (timeout_policy.observe, metrics.observe_response, raise_on_challenge):
+        if hook not in session.hooks['response']:
+            session.hooks['response'].append(hook)
+    return session
+
+
+class SessionPool:
+    """一次运行共用的连接池。
+
+    account() 为每个账号返回一个只持有自己 Cookie 与请求头的轻量会话，连接（含 TLS 会话）在账号间复用；
+    运行结束时 close() 清空各账号的 Cookie 并关闭连接池，也可用作 with 语句。
+    """
+
+    def __init__(self, retries: Optional[Union[Retry, int]] = None, platform: Optional[str] = None, **kwargs):
+        self.adapter = build_adapter(retries, platform=platform, **kwargs)
+        self._sessions: List[requests.Session] = []
+        self._lock = threading.Lock()
+
+    def account(self) -> requests.Session:
+        session = configure_session(requests.Session(), adapter=self.adapter)
+        with self._lock:
+            self._sessions.append(session)
+        return session
+
+    def release(self, session: requests.Session) -> None:
+        """账号处理完毕：丢弃其 Cookie，连接留在池中给后续账号。
+
+        不能调用 session.close()，那会关闭共用的 adapter。
+        """
+        session.cookies.clear()
+        with self._lock:
+            if session in self._sessions:
+                self._sessions.remove(session)
+
+    def close(self) -> None:
+        with self._lock:
+            sessions, self._sessions = self._sessions, []
+        for session in sessions:
+            session.cookies.clear()
+        self.adapter.close()
+
+    def __enter__(self) -> 'SessionPool':
+        return self
+
+    def __exit__(self, *exc) -> None:
+        self.close()
+
+
+def prewarm(session: requests.Session, url: str,
+            timeout: Tuple[float, float] = (5, 10), connections: int = 1,
+            verify: Optional[Union[bool, str]] = None) -> Optional[Dict[str, object]]:
+    """预先建立到 url 所在主机的连接（DNS + TCP + TLS 握手）并放回 session 的连接池，后续请求直接复用。
+
+    connections 为需要备好的连接数（多个账号同时发请求时），池中已连通的空闲连接直接计入；
+    请求时单独传了 verify 的，这里要传相同的值，否则会预热到另一个连接池。
+    返回 {'dns': 秒, 'connect': 首个新连接的秒数, 'tls': 协议版本, 'opened': 新建连接数}；
+    使用录制/回放适配器时不建立连接，返回 None。连接失败时抛出异常。
+    """
+    adapter = session.get_adapter(url)
+    if isinstance(adapter, CassetteAdapter):
+        return None
+
+    # 与真实请求取同一个连接池：代理、证书校验等设置要与 session.request 的合并结果一致
+    settings = session.merge_environment_settings(url, {}, None, verify, None)
+    if getattr(adapter, 'proxy_pool', None):
+        # 经代理池发出的请求会走评分最好的代理
+        settings['proxies'] = adapter.proxy_pool.candidates()[0].mapping
+    request = session.prepare_request(requests.Request('GET', url))
+    if hasattr(adapter, 'get_connection_with_tls_context'):
+        pool = adapter.get_connection_with_tls_context(
+            request, settings['verify'], settings['proxies'], settings['cert'])
+    else:
+        pool = adapter.get_connection(url, settings['proxies'])
+
+    parts = urlsplit(url)
+    port = parts.port or (443 if parts.scheme == 'https' else 80)
+    timings: Dict[str, object] = {'connect': 0.0, 'tls': None, 'opened': 0}
+
+    start = time.perf_counter()
+    resolver.resolve(parts.hostname, port)
+    timings['dns'] = time.perf_counter() - start
+
+    # 先全部取出再放回，否则会反复拿到同一个空闲连接
+    conns = []
+    try:
+        for _ in range(max(1, connections)):
+            conn = pool._get_conn(timeout=timeout[0])
+            conns.append(conn)
+            if getattr(conn, 'is_connected', False):
+                continue
+            conn.timeout = timeout[0]
+            start = time.perf_counter()
+            conn.connect()
+            if not timings['opened']:
+                timings['connect'] = time.perf_counter() - start
+                sock = getattr(conn, 'sock', None)
+                timings['tls'] = sock.version() if hasattr(sock, 'version') else None
+            timings['opened'] += 1
+            conn.timeout = timeout[1]
+    except Exception:
+        conns[-1].close()
+        raise
+    finally:
+        for conn in conns:
+            pool._put_conn(conn)
+    return timings
@@ -0,0 +1,17 @@
+# -*- coding: utf-8 -*-
+"""
+脚本日志配置
+
+各脚本与共用组件（common/*）都通过 logging 输出；只用 print 的脚本也要调用，
+否则共用组件的日志不会显示。统一输出到 stdout，与 print 的日志按顺序交织。
+"""
+
+import sys
+import logging
+
+LOG_FORMAT = '%(asctime)s - %(levelname)s - %(message)s'
+
+
+def setup_logging(level: int = logging.INFO) -> None:
+    """配置根 logger；已经配置过（如被守护进程导入）时不重复添加 handler"""
+    logging.basicConfig(level=level, format=LOG_FORMAT, handlers=[logging.StreamHandler(sys.stdout)])
@@ -0,0 +1,230 @@
+# -*- coding: utf-8 -*-
+"""
+Prometheus textfile 指标导出
+
+设置 CHECKIN_METRICS_DIR（node_exporter 的 --collector.textfile.directory）后，
+每个平台运行结束时写出 <目录>/checkin_<平台>.prom（先写临时文件再原子替换），内容包括:
+    checkin_run_duration_seconds             本次运行耗时
+    checkin_run_success                      本次运行是否成功（退出码为 0）
+    checkin_last_run_timestamp_seconds       本次运行结束时间
+    checkin_results{result}                  登记的成功 / 失败签到结果数
+    checkin_request_duration_seconds{host,endpoint}  请求耗时直方图（发出请求到收到响应头）
+    checkin_requests_total{host,endpoint,code}       请求数
+    checkin_bytes_total{host,direction}      请求体 / 响应体字节数
+    checkin_retries_total{host}              重试次数
+    checkin_ocr_duration_seconds             OCR 识别耗时直方图
+未设置时不做任何记录。不依赖 prometheus_client。
+"""
+
+import os
+import time
+import logging
+import threading
+from collections import defaultdict
+from contextlib import contextmanager
+from pathlib import Path
+from typing import Dict, Iterator, List, Optional, Tuple
+from urllib.parse import urlsplit
+
+import requests
+
+from common.retry import stats as retry_stats
+
+log = logging.getLogger(__name__)
+
+METRICS_DIR_ENV = 'CHECKIN_METRICS_DIR'
+BUCKETS = (0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0)
+OCR_BUCKETS = (0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+# 每个主机最多记录这么多个不同的 endpoint，其余归为 other，避免标签基数失控
+MAX_ENDPOINTS = 50
+
+Labels = Tuple[Tuple[str, str], ...]
+
+
+def platform_from_script(path: str) -> str:
+    """脚本文件名 -> 平台名，如 kanxue_signin.py -> kanxue"""
+    stem = Path(path).stem
+    for suffix in ('_checkin', '_signin', '_punch'):
+        if stem.endswith(suffix):
+            return stem[:-len(suffix)]
+    return stem or 'checkin'
+
+
+def _escape(value: str) -> str:
+    return str(value).replace('\\', '\\\\').replace('\n', '\\n').replace('"', '\\"')
+
+
+def _format_labels(labels: Labels) -> str:
+    if not labels:
+        return ''
+    return '{' + ','.join(f'{key}="{_escape(value)}"' for key, value in labels) + '}'
+
+
+def _format_value(value: float) -> str:
+    if value == float('inf'):
+        return '+Inf'
+    return repr(float(value)) if not float(value).is_integer() else str(int(value))
+
+
+class Histogram:
+    def __init__(self, buckets: Tuple[float, ...]):
+        self.buckets = buckets
+        self.counts = [0] * len(buckets)
+        self.count = 0
+        self.sum = 0.0
+
+    def observe(self, value: float) -> None:
+        self.count += 1
+        self.sum += value
+        for index, bound in enumerate(self.buckets):
+            if value <= bound:
+                self.counts[index] += 1
+
+
+class Registry:
+    """一次平台运行的指标（线程安全）。"""
+
+    def __init__(self):
+        self.platform: Optional[str] = None
+        self._lock = threading.Lock()
+        self._reset()
+
+    def _reset(self) -> None:
+        self.counters: Dict[str, Dict[Labels, float]] = defaultdict(lambda: defaultdict(float))
+        self.histograms: Dict[str, Dict[Labels, Histogram]] = defaultdict(dict)
+        self.endpoints: Dict[str, set] = defaultdict(set)
+        self.gauges: Dict[str, float] = {}
+
+    @property
+    def enabled(self) -> bool:
+        return self.platform is not None
+
+    # ---------- 记录 ----------
+    def inc(self, name: str, amount: float = 1.0, **labels: str) -> None:
+        if not self.enabled:
+            return
+        with self._lock:
+            self.counters[name][tuple(sorted(labels.items()))] += amount
+
+    def observe(self, name: str, value: float, buckets: Tuple[float, ...] = BUCKETS, **labels: str) -> None:
+        if not self.enabled:
+            return
+        key = tuple(sorted(labels.items()))
+        with self._lock:
+            histogram = self.histograms[name].get(key)
+            if histogram is None:
+                histogram = self.histograms[name][key] = Histogram(buckets)
+            histogram.observe(value)
+
+    def _endpoint(self, host: str, path: str) -> str:
+        with self._lock:
+            seen = self.endpoints[host]
+            if path in seen or len(seen) < MAX_ENDPOINTS:
+                seen.add(path)
+                return path
+        return 'other'
+
+    def observe_response(self, response: requests.Response, *args, **kwargs) -> requests.Response:
+        """requests 响应钩子：记录请求耗时、状态码与收发字节数"""
+        if not self.enabled:
+            return response
+        parts = urlsplit(response.url)
+        host = parts.hostname or ''
+        endpoint = self._endpoint(host, parts.path or '/')
+        self.observe('checkin_request_duration_seconds', response.elapsed.total_seconds(),
+                     host=host, endpoint=endpoint)
+        self.inc('checkin_requests_total', host=host, endpoint=endpoint, code=str(response.status_code))
+        body = response.request.body if response.request is not None else None
+        if body:
+            self.inc('checkin_bytes_total', len(body), host=host, direction='sent')
+        self.inc('checkin_bytes_total', len(response.content or b''), host=host, direction='received')
+        return response
+
+    def record_result(self, success: bool) -> None:
+        """登记一条签到结果（平台或账号）"""
+        self.inc('checkin_results', result='success' if success else 'failure')
+
+    @contextmanager
+    def timer(self, name: str, buckets: Tuple[float, ...] = BUCKETS) -> Iterator[None]:
+        start = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.observe(name, time.perf_counter() - start, buckets)
+
+    # ---------- 运行 ----------
+    @contextmanager
+    def run(self, platform: str) -> Iterator[None]:
+        """包裹一次平台运行；main() 以 sys.exit 结束时按退出码判断成败，异常原样抛出"""
+        directory = os.getenv(METRICS_DIR_ENV, '').strip()
+        if not directory:
+            yield
+            return
+
+        with self._lock:
+            self._reset()
+            self.platform = platform
+        retries_before = {host: entry['retries'] for host, entry in retry_stats.summary().items()}
+        start = time.perf_counter()
+        success = False
+        try:
+            yield
+            success = True
+        except SystemExit as e:
+            success = e.code in (0, None)
+            raise
+        finally:
+            for host, entry in retry_stats.summary().items():
+                retries = entry['retries'] - retries_before.get(host, 0)
+                if retries:
+                    self.inc('checkin_retries_total', retries, host=host)
+            self.gauges['checkin_run_duration_seconds'] = time.perf_counter() - start
+            self.gauges['checkin_run_success'] = 1 if success else 0
+            self.gauges['checkin_last_run_timestamp_seconds'] = time.time()
+            self.write(Path(directory))
+            with self._lock:
+                self.platform = None
+
+    # ---------- 输出 ----------
+    def render(self) -> str:
+        platform = (('platform', self.platform),)
+        lines: List[str] = []
+        with self._lock:
+            for name, value in self.gauges.items():
+                lines += [f"# TYPE {name} gauge", f"{name}{_format_labels(platform)} {_format_value(value)}"]
+            # 未出现的结果也输出 0，便于告警规则直接比较
+            results = self.counters.get('checkin_results', {})
+            lines.append("# TYPE checkin_results gauge")
+            for result in ('success', 'failure'):
+                value = results.get((('result', result),), 0)
+                lines.append(f"checkin_results{_format_labels(platform + (('result', result),))} {_format_value(value)}")
+            for name, series in self.counters.items():
+                if name == 'checkin_results':
+                    continue
+                lines.append(f"# TYPE {name} counter")
+                for labels, value in series.items():
+                    lines.append(f"{name}{_format_labels(platform + labels)} {_format_value(value)}")
+            for name, series in self.histograms.items():
+                lines.append(f"# TYPE {name} histogram")
+                for labels, histogram in series.items():
+                    for bound, count in zip(histogram.buckets + (float('inf'),), histogram.counts + [histogram.count]):
+                        bucket = platform + labels + (('le', _format_value(bound)),)
+                        lines.append(f"{name}_bucket{_format_labels(bucket)} {count}")
+                    lines.append(f"{name}_sum{_format_labels(platform + labels)} {_format_value(round(histogram.sum, 6))}")
+                    lines.append(f"{name}_count{_format_labels(platform + labels)} {histogram.count}")
+        return '\n'.join(lines) + '\n'
+
+    def write(self, directory: Path) -> None:
+        path = directory / f"checkin_{self.platform}.prom"
+        try:
+            directory.mkdir(parents=True, exist_ok=True)
+            # node_exporter 可能随时读取，先写临时文件再原子替换
+            temp = path.with_name(f".{path.name}.{os.getpid()}.tmp")
+            temp.write_text(self.render(), encoding='utf-8')
+            os.replace(temp, path)
+            log.info(f"📊 指标已写入: {path}")
+        except Exception as e:
+            log.warning(f"写入指标文件失败: {e}")
+
+
+registry = Registry()
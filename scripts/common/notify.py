@@ -0,0 +1,231 @@
+# -*- coding: utf-8 -*-
+"""
+通知汇总与发送
+
+各脚本签到结束后调用 report() 登记结果，不再在签到流程中逐个同步推送。
+进程退出时（或由调用方主动 flush()）把本次登记的全部结果合成一条摘要，
+对每个已配置的渠道并行发送，共用一个带连接池的会话。
+发送失败的消息写入 status/notify_outbox.json，下次发送时与新摘要一并重试，
+超过重试次数或保留时长后丢弃。发件箱只在本机 / 自托管 runner 与常驻守护进程中跨运行保留
+（已加入 .gitignore，工作流不会提交）；GitHub 托管 runner 每次都是全新环境，失败的消息不会重试。
+
+各脚本由 run_entry 在 main() 结束后主动 flush()；atexit 只作兜底，此时解释器已不能再启动线程，改为逐个发送。
+
+环境变量:
+    SCKEY                  Server酱 SendKey
+    PUSHPLUS_TOKEN         PushPlus Token
+    CHECKIN_NOTIFY_OUTBOX  发件箱路径，默认 status/notify_outbox.json
+"""
+
+import os
+import json
+import atexit
+import logging
+import threading
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime, timedelta
+from pathlib import Path
+from typing import Callable, Dict, List
+
+import requests
+
+from common.http import configure_session
+from common.metrics import registry as metrics
+from common.timeouts import timeout_for
+
+log = logging.getLogger(__name__)
+
+BASE_DIR = Path(__file__).resolve().parents[2]
+OUTBOX_FILE = Path(os.getenv('CHECKIN_NOTIFY_OUTBOX', '') or BASE_DIR / "status" / "notify_outbox.json")
+
+TIME_FORMAT = '%Y-%m-%d %H:%M:%S'
+MAX_ATTEMPTS = 5
+MAX_AGE = timedelta(days=3)
+SEND_TIMEOUT = (5, 10)
+
+
+# ==================== 渠道 ====================
+def send_server_chan(session: requests.Session, key: str, title: str, content: str) -> None:
+    """Server酱推送，失败时抛出异常"""
+    url = f"https://sctapi.ftqq.com/{key}.send"
+    response = session.post(url, data={"title": title, "desp": content}, timeout=timeout_for(url, SEND_TIMEOUT))
+    response.raise_for_status()
+    code = response.json().get('code')
+    if code != 0:
+        raise RuntimeError(f"Server酱返回 code={code}")
+
+
+def send_pushplus(session: requests.Session, token: str, title: str, content: str) -> None:
+    """PushPlus推送，失败时抛出异常"""
+    url = "http://www.pushplus.plus/send"
+    response = session.post(url, json={
+        "token": token,
+        "title": title,
+        "content": content,
+        "template": "markdown"
+    }, timeout=timeout_for(url, SEND_TIMEOUT))
+    response.raise_for_status()
+    code = response.json().get('code')
+    if code != 200:
+        raise RuntimeError(f"PushPlus返回 code={code}")
+
+
+# 渠道名 -> (凭据环境变量, 发送函数)
+CHANNELS: Dict[str, tuple] = {
+    'serverchan': ('SCKEY', send_server_chan),
+    'pushplus': ('PUSHPLUS_TOKEN', send_pushplus),
+}
+
+
+def configured_channels() -> Dict[str, str]:
+    """已配置凭据的渠道: 渠道名 -> 凭据"""
+    channels = {}
+    for name, (env, _) in CHANNELS.items():
+        value = os.getenv(env, '').strip()
+        if value:
+            channels[name] = value
+    return channels
+
+
+# ==================== 汇总发送 ====================
+class Dispatcher:
+    """收集各平台结果，按渠道并行发送摘要并维护失败发件箱。"""
+
+    def __init__(self, outbox_path: Path = OUTBOX_FILE):
+        self.outbox_path = Path(outbox_path)
+        self.entries: List[Dict] = []
+        self._lock = threading.Lock()
+        self._registered = False
+
+    def report(self, platform: str, success: bool, message: str) -> None:
+        """登记一个平台（或账号）的签到结果，进程退出时统一发送"""
+        metrics.record_result(success)
+        with self._lock:
+            self.entries.append({
+                'platform': platform,
+                'success': success,
+                'message': message,
+                'time': datetime.now().strftime(TIME_FORMAT)
+            })
+            if not self._registered:
+                self._registered = True
+                atexit.register(self.flush)
+
+    def digest(self, entries: List[Dict]) -> Dict[str, str]:
+        """把多条结果合成一条摘要"""
+        success = sum(1 for entry in entries if entry['success'])
+        failed = len(entries) - success
+        platforms = '、'.join(dict.fromkeys(entry['platform'] for entry in entries))
+        title = f"{'✅' if not failed else '❌'} 签到汇总: {platforms}（成功 {success}，失败 {failed}）"
+        lines = ["### 签到汇总", ""]
+        for entry in entries:
+            mark = '✅' if entry['success'] else '❌'
+            lines.append(f"- {mark} **{entry['platform']}** {entry['message']} ({entry['time']})")
+        return {'title': title, 'content': '\n'.join(lines)}
+
+    # ---------- 发件箱 ----------
+    def _load_outbox(self) -> List[Dict]:
+        if not self.outbox_path.exists():
+            return []
+        try:
+            with self.outbox_path.open('r', encoding='utf-8') as f:
+                return json.load(f).get('messages', [])
+        except Exception as e:
+            log.warning(f"读取通知发件箱失败: {e}")
+            return []
+
+    def _save_outbox(self, messages: List[Dict]) -> None:
+        try:
+            if not messages:
+                if self.outbox_path.exists():
+                    self.outbox_path.unlink()
+                return
+            self.outbox_path.parent.mkdir(parents=True, exist_ok=True)
+            with self.outbox_path.open('w', encoding='utf-8') as f:
+                json.dump({
+                    'messages': messages,
+                    'update_time': datetime.now().strftime(TIME_FORMAT)
+                }, f, ensure_ascii=False, indent=2)
+        except Exception as e:
+            log.warning(f"保存通知发件箱失败: {e}")
+
+    @staticmethod
+    def _expired(message: Dict) -> bool:
+        if message.get('attempts', 0) >= MAX_ATTEMPTS:
+            return True
+        try:
+            created = datetime.strptime(message['created'], TIME_FORMAT)
+        except (KeyError, ValueError):
+            return True
+        return datetime.now() - created > MAX_AGE
+
+    # ---------- 发送 ----------
+    def flush(self) -> None:
+        """发送本次摘要与发件箱中待重试的消息，失败的写回发件箱"""
+        with self._lock:
+            entries, self.entries = self.entries, []
+            if self._registered:
+                # 已主动发送，退出时不再重试刚写回发件箱的消息
+                self._registered = False
+                atexit.unregister(self.flush)
+
+        channels = configured_channels()
+        pending = [message for message in self._load_outbox() if not self._expired(message)]
+        if entries and channels:
+            digest = self.digest(entries)
+            created = datetime.now().strftime(TIME_FORMAT)
+            for name in channels:
+                pending.append({'channel': name, 'created': created, 'attempts': 0, **digest})
+
+        # 当前进程没有该渠道凭据的消息留在发件箱，等配置了凭据的运行再发
+        failed = [message for message in pending if message['channel'] not in channels]
+        pending = [message for message in pending if message['channel'] in channels]
+        if not pending:
+            self._save_outbox(failed)
+            return
+
+        session = configure_session(requests.Session())
+        try:
+            sent = self._send_all(session, channels, pending)
+        finally:
+            session.close()
+        for message, ok in zip(pending, sent):
+            if not ok:
+                message['attempts'] = message.get('attempts', 0) + 1
+                failed.append(message)
+
+        retry = sum(1 for message in failed if message['channel'] in channels)
+        if retry:
+            log.warning(f"📮 {retry} 条通知发送失败，已存入发件箱，下次运行时重试")
+        self._save_outbox(failed)
+
+    def _send_all(self, session: requests.Session, channels: Dict[str, str], pending: List[Dict]) -> List[bool]:
+        """并行发送，返回各消息是否成功"""
+        try:
+            with ThreadPoolExecutor(max_workers=len(pending), thread_name_prefix='notify') as pool:
+                return list(pool.map(lambda message: self._send(session, channels, message), pending))
+        except RuntimeError:
+            # 由 atexit 调用时解释器正在退出，不能再启动线程，改为逐个发送
+            return [self._send(session, channels, message) for message in pending]
+
+    @staticmethod
+    def _send(session: requests.Session, channels: Dict[str, str], message: Dict) -> bool:
+        name = message['channel']
+        send: Callable = CHANNELS[name][1]
+        try:
+            send(session, channels[name], message['title'], message['content'])
+            log.info(f"📨 {name} 通知发送成功")
+            return True
+        except Exception as e:
+            # 请求异常的描述里带有含 SendKey 的 URL，只输出异常类型
+            detail = str(e) if isinstance(e, RuntimeError) else type(e).__name__
+            log.warning(f"📨 {name} 通知发送失败: {detail}")
+            return False
+
+
+dispatcher = Dispatcher()
+
+
+def report(platform: str, success: bool, message: str) -> None:
+    """登记签到结果，进程退出时汇总为一条通知并行发往所有已配置渠道"""
+    dispatcher.report(platform, success, message)
@@ -0,0 +1,134 @@
+# -*- coding: utf-8 -*-
+"""
+脚本入口性能分析
+
+任一脚本加 `--profile` 参数或设置 CHECKIN_PROFILE=1 后，main() 会在 cProfile 与
+tracemalloc 下运行，结束时在运行目录中写出:
+    cpu.prof       cProfile 原始数据（主线程与运行期间启动的线程合并），可用 snakeviz / pstats 查看
+    cpu_top.txt    按累计耗时排序的前 N 个函数
+    alloc_top.txt  按分配位置统计的前 N 项内存占用及峰值
+
+环境变量:
+    CHECKIN_PROFILE_DIR  输出根目录，默认仓库下的 profiles/
+    CHECKIN_PROFILE_TOP  报告条数，默认 30
+"""
+
+import os
+import sys
+import pstats
+import cProfile
+import logging
+import threading
+import tracemalloc
+from datetime import datetime
+from pathlib import Path
+from typing import Callable, List, Optional
+
+from common.cli import pop_flag
+from common.metrics import platform_from_script, registry as metrics
+from common.notify import dispatcher
+
+log = logging.getLogger(__name__)
+
+BASE_DIR = Path(__file__).resolve().parents[2]
+PROFILE_ENV = 'CHECKIN_PROFILE'
+PROFILE_DIR = Path(os.getenv('CHECKIN_PROFILE_DIR', '') or BASE_DIR / 'profiles')
+PROFILE_TOP = int(os.getenv('CHECKIN_PROFILE_TOP', '30') or 30)
+TRACE_FRAMES = 10
+
+
+class ThreadProfiles:
+    """cProfile 只记录调用 enable() 的线程；为运行期间启动的每个线程（调度器的账号任务等）各建一个 profiler。"""
+
+    def __init__(self):
+        self.profilers: List[cProfile.Profile] = []
+        self._lock = threading.Lock()
+
+    def _hook(self, frame, event, arg) -> None:
+        # 新线程执行 run() 前调用一次；profiler.enable() 随即替换掉本线程的这个钩子
+        profiler = cProfile.Profile()
+        with self._lock:
+            self.profilers.append(profiler)
+        profiler.enable()
+
+    def start(self) -> None:
+        threading.setprofile(self._hook)
+
+    def stop(self) -> None:
+        threading.setprofile(None)
+
+    def merged(self, main: cProfile.Profile) -> pstats.Stats:
+        """主线程与各线程的统计合并为一份"""
+        stats = pstats.Stats(main)
+        with self._lock:
+            profilers = list(self.profilers)
+        for profiler in profilers:
+            profiler.create_stats()
+            if profiler.stats:
+                stats.add(profiler)
+        return stats
+
+
+def write_reports(run_dir: Path, stats: pstats.Stats, snapshot: tracemalloc.Snapshot,
+                  peak: int, top: int = PROFILE_TOP) -> None:
+    run_dir.mkdir(parents=True, exist_ok=True)
+    stats.dump_stats(str(run_dir / 'cpu.prof'))
+
+    with (run_dir / 'cpu_top.txt').open('w', encoding='utf-8') as f:
+        stats.stream = f
+        stats.sort_stats(pstats.SortKey.CUMULATIVE).print_stats(top)
+
+    snapshot = snapshot.filter_traces((
+        tracemalloc.Filter(False, tracemalloc.__file__),
+        tracemalloc.Filter(False, '<frozen importlib._bootstrap>'),
+        tracemalloc.Filter(False, '<frozen importlib._bootstrap_external>'),
+    ))
+    with (run_dir / 'alloc_top.txt').open('w', encoding='utf-8') as f:
+        f.write(f"峰值内存: {peak / 1024:.1f} KiB\n\n")
+        f.write(f"按代码行统计前 {top} 项:\n")
+        for stat in snapshot.statistics('lineno')[:top]:
+            f.write(f"{stat}\n")
+        f.write(f"\n按调用栈统计前 {min(top, 10)} 项:\n")
+        for stat in snapshot.statistics('traceback')[:min(top, 10)]:
+            f.write(f"\n{stat}\n")
+            for line in stat.traceback.format():
+                f.write(f"{line}\n")
+
+
+def run_entry(main: Callable[[], object], name: Optional[str] = None):
+    """脚本入口包装：未开启性能分析时直接调用 main()。
+
+    main() 内部常以 sys.exit 结束，这里在 finally 中写出报告后再原样抛出 SystemExit。
+    设置了 CHECKIN_METRICS_DIR 时同时写出本次运行的 Prometheus 指标。
+    main() 结束后（解释器退出前）发送登记的通知，atexit 阶段已不能再启动发送线程。
+    """
+    name = name or Path(sys.argv[0]).stem or 'checkin'
+    try:
+        with metrics.run(platform_from_script(name)):
+            if not pop_flag('--profile', PROFILE_ENV):
+                return main()
+            return _profiled(main, name)
+    finally:
+        dispatcher.flush()
+
+
+def _profiled(main: Callable[[], object], name: str):
+    run_dir = PROFILE_DIR / f"{name}-{datetime.now().strftime('%Y%m%d-%H%M%S')}"
+    profiler = cProfile.Profile()
+    threads = ThreadProfiles()
+    tracemalloc.start(TRACE_FRAMES)
+    threads.start()
+    profiler.enable()
+    try:
+        return main()
+    finally:
+        profiler.disable()
+        threads.stop()
+        snapshot = tracemalloc.take_snapshot()
+        _, peak = tracemalloc.get_traced_memory()
+        tracemalloc.stop()
+        try:
+            write_reports(run_dir, threads.merged(profiler), snapshot, peak)
+            log.info(f"📈 性能分析报告已写入: {run_dir}")
+        except Exception as e:
+            log.warning(f"写入性能分析报告失败: {e}")
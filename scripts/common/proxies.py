@@ -0,0 +1,229 @@
+# -*- coding: utf-8 -*-
+"""
+按延迟评分的出口代理池
+
+部分平台会拦截数据中心出口 IP（尚香书苑、看雪等）。为平台配置一组出口代理后:
+    - 每个请求选用近期延迟最低、成功率最高的代理
+    - 代理本身连不上（ProxyError / 建连超时 / 建连失败）时换下一个代理重发，请求尚未到达目标站点，不会重复签到
+    - 后台线程定期检查各代理，连续失败的代理暂时下线，恢复后自动回到候选列表
+评分 = 平均延迟 / 成功率，延迟与成功率都按指数滑动平均更新，真实请求与健康检查都会计入。
+
+环境变量:
+    <平台>_PROXIES               该平台的代理列表，逗号或换行分隔，如 KANXUE_PROXIES="http://a:8080,http://b:3128"
+    CHECKIN_PROXIES              未单独配置的平台共用的代理列表
+    CHECKIN_PROXY_CHECK_URL      健康检查经代理访问的地址；未设置时只检查能否连上代理本身
+    CHECKIN_PROXY_CHECK_INTERVAL 健康检查间隔（秒），默认 60，0 表示只在启动时检查一次
+socks5:// 代理需要额外安装 requests[socks]。
+"""
+
+import os
+import time
+import socket
+import hashlib
+import logging
+import threading
+from concurrent.futures import ThreadPoolExecutor
+from typing import Dict, List, Optional
+from urllib.parse import urlsplit
+
+import requests
+from urllib3.exceptions import NewConnectionError
+
+log = logging.getLogger(__name__)
+
+DEFAULT_CHECK_INTERVAL = 60.0
+CHECK_TIMEOUT = 5.0
+# 指数滑动平均的权重
+ALPHA = 0.3
+# 连续失败达到此次数后暂时下线
+MAX_FAILURES = 3
+
+
+def mask_proxy(url: str) -> str:
+    """隐藏代理地址中的用户名密码"""
+    parts = urlsplit(url)
+    if parts.username or parts.password:
+        return f"{parts.scheme}://***@{parts.hostname}:{parts.port}"
+    return url
+
+
+def is_proxy_failure(error: Exception) -> bool:
+    """请求是否在到达目标站点之前失败（可以安全地换代理重发）"""
+    if isinstance(error, (requests.exceptions.ProxyError, requests.exceptions.ConnectTimeout)):
+        return True
+    if isinstance(error, requests.exceptions.ConnectionError) and error.args:
+        reason = getattr(error.args[0], 'reason', error.args[0])
+        return isinstance(reason, NewConnectionError)
+    return False
+
+
+class Proxy:
+    """单个代理的评分状态。"""
+
+    def __init__(self, url: str):
+        self.url = url
+        self.latency: Optional[float] = None
+        self.success = 1.0
+        self.failures = 0
+        self.requests = 0
+
+    @property
+    def healthy(self) -> bool:
+        return self.failures < MAX_FAILURES
+
+    @property
+    def score(self) -> float:
+        """越小越好；尚未测得延迟的代理排在已测得的之后"""
+        latency = self.latency if self.latency is not None else CHECK_TIMEOUT
+        return latency / max(self.success, 0.05)
+
+    def record(self, ok: bool, seconds: Optional[float] = None) -> None:
+        self.requests += 1
+        self.success = (1 - ALPHA) * self.success + ALPHA * (1.0 if ok else 0.0)
+        if ok:
+            self.failures = 0
+            if seconds is not None:
+                self.latency = seconds if self.latency is None else (1 - ALPHA) * self.latency + ALPHA * seconds
+        else:
+            self.failures += 1
+
+    @property
+    def mapping(self) -> Dict[str, str]:
+        return {'http': self.url, 'https': self.url}
+
+
+class ProxyPool:
+    """一个平台的代理池（线程安全）。"""
+
+    def __init__(self, name: str, urls: List[str], check_url: Optional[str] = None,
+                 interval: float = DEFAULT_CHECK_INTERVAL):
+        self.name = name
+        self.proxies = [Proxy(url) for url in dict.fromkeys(urls)]
+        self.check_url = check_url
+        self.interval = interval
+        self._lock = threading.Lock()
+        self._stop = threading.Event()
+        self._thread: Optional[threading.Thread] = None
+
+    # ---------- 选择 ----------
+    def candidates(self) -> List[Proxy]:
+        """按评分排序的候选代理，健康的在前；全部下线时仍按评分返回全部，交给请求去验证"""
+        with self._lock:
+            ranked = sorted(self.proxies, key=lambda proxy: proxy.score)
+        healthy = [proxy for proxy in ranked if proxy.healthy]
+        return healthy + [proxy for proxy in ranked if not proxy.healthy]
+
+    def record(self, proxy: Proxy, ok: bool, seconds: Optional[float] = None) -> None:
+        with self._lock:
+            was_healthy = proxy.healthy
+            proxy.record(ok, seconds)
+            changed = was_healthy != proxy.healthy
+        if changed:
+            state = '恢复' if proxy.healthy else f'连续失败 {MAX_FAILURES} 次，暂时下线'
+            log.warning(f"🛰️ {self.name} 代理 {mask_proxy(proxy.url)} {state}")
+
+    # ---------- 健康检查 ----------
+    def _check(self, proxy: Proxy) -> None:
+        start = time.perf_counter()
+        try:
+            if self.check_url:
+                response = requests.head(self.check_url, proxies=proxy.mapping,
+                                         timeout=CHECK_TIMEOUT, allow_redirects=False)
+                ok = response.status_code < 500
+            else:
+                parts = urlsplit(proxy.url)
+                with socket.create_connection((parts.hostname, parts.port or 80), timeout=CHECK_TIMEOUT):
+                    ok = True
+        except Exception as e:
+            log.debug(f"代理 {mask_proxy(proxy.url)} 检查失败: {type(e).__name__}")
+            ok = False
+        self.record(proxy, ok, time.perf_counter() - start if ok else None)
+
+    def check_all(self) -> None:
+        """并行检查全部代理"""
+        with ThreadPoolExecutor(max_workers=len(self.proxies), thread_name_prefix='proxy-check') as pool:
+            list(pool.map(self._check, self.proxies))
+        best = self.candidates()[0]
+        log.info(f"🛰️ {self.name} 代理检查完成: {sum(proxy.healthy for proxy in self.proxies)}/{len(self.proxies)} 可用，"
+                 f"首选 {mask_proxy(best.url)}"
+                 + (f"（{best.latency * 1000:.0f} ms）" if best.latency is not None else ''))
+
+    def start(self) -> 'ProxyPool':
+        """先同步检查一次，再在后台定期检查"""
+        self.check_all()
+        if self.interval > 0 and self._thread is None:
+            self._thread = threading.Thread(target=self._loop, name=f'proxy-{self.name}', daemon=True)
+            self._thread.start()
+        return self
+
+    def _loop(self) -> None:
+        while not self._stop.wait(self.interval):
+            self.check_all()
+
+    def stop(self) -> None:
+        self._stop.set()
+
+    # ---------- 发送 ----------
+    def send(self, send, request, **kwargs) -> requests.Response:
+        """依次经候选代理调用 send(request, proxies=...)，代理失败时换下一个"""
+        error: Optional[Exception] = None
+        for proxy in self.candidates():
+            kwargs['proxies'] = proxy.mapping
+            start = time.perf_counter()
+            try:
+                response = send(request, **kwargs)
+            except Exception as e:
+                if not is_proxy_failure(e):
+                    raise
+                self.record(proxy, False)
+                log.warning(f"🛰️ {self.name} 代理 {mask_proxy(proxy.url)} 不可用（{type(e).__name__}），切换下一个")
+                error = e
+                continue
+            self.record(proxy, True, time.perf_counter() - start)
+            return response
+        raise error
+
+
+_pools: Dict[str, Optional[ProxyPool]] = {}
+_pools_lock = threading.Lock()
+
+
+def _interval() -> float:
+    try:
+        return float(os.getenv('CHECKIN_PROXY_CHECK_INTERVAL', '') or DEFAULT_CHECK_INTERVAL)
+    except ValueError:
+        log.warning(f"⚠️ CHECKIN_PROXY_CHECK_INTERVAL 不是数字，使用默认值 {DEFAULT_CHECK_INTERVAL}")
+        return DEFAULT_CHECK_INTERVAL
+
+
+def proxy_urls(platform: Optional[str]) -> List[str]:
+    """平台配置的代理列表（<平台>_PROXIES 优先，其次 CHECKIN_PROXIES）"""
+    if not platform:
+        return []
+    value = os.getenv(f'{platform.upper()}_PROXIES', '') or os.getenv('CHECKIN_PROXIES', '')
+    return [item.strip() for item in value.replace('\n', ',').split(',') if item.strip()]
+
+
+def proxy_egress(platform: Optional[str]) -> Optional[str]:
+    """平台经代理出口时的标识（代理列表的摘要，不含地址与凭据），未配置代理时返回 None"""
+    urls = proxy_urls(platform)
+    if not urls:
+        return None
+    digest = hashlib.sha1(','.join(sorted(set(urls))).encode()).hexdigest()[:8]
+    return f"proxy-{digest}"
+
+
+def proxy_pool_for(platform: Optional[str]) -> Optional[ProxyPool]:
+    """返回平台的代理池（同一平台共用一个并只检查一次），未配置代理时返回 None"""
+    if not platform:
+        return None
+    with _pools_lock:
+        if platform not in _pools:
+            urls = proxy_urls(platform)
+            if urls:
+                pool = ProxyPool(platform, urls, os.getenv('CHECKIN_PROXY_CHECK_URL', '').strip() or None, _interval())
+                log.info(f"🛰️ {platform} 已配置 {len(urls)} 个出口代理")
+                _pools[platform] = pool.start()
+            else:
+                _pools[platform] = None
+        return _pools[platform]
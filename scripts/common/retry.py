@@ -0,0 +1,125 @@
+# -*- coding: utf-8 -*-
+"""
+重试统计与按主机的重试预算
+
+urllib3 的 Retry 会在退避中静默 sleep，主机宕机时多个账号的重试还会叠加。
+BudgetedRetry 在每次重试时打印日志、累计退避耗时，并限制每个主机在一次运行中的
+重试总次数，预算耗尽后立即放弃，避免一个坏主机拖垮整个任务的超时时间。
+
+环境变量:
+    CHECKIN_RETRY_BUDGET  每个主机每次运行允许的重试次数，默认 6
+"""
+
+import os
+import time
+import atexit
+import logging
+import threading
+from typing import Dict
+
+from urllib3.exceptions import MaxRetryError, ResponseError
+from urllib3.util.retry import Retry
+
+from common.cloudflare import ChallengeResponseError, challenge_from_headers
+
+log = logging.getLogger(__name__)
+
+RETRY_BUDGET_ENV = 'CHECKIN_RETRY_BUDGET'
+DEFAULT_RETRY_BUDGET = 6
+
+
+class RetryStats:
+    """进程内按主机汇总的重试次数、退避耗时与预算。"""
+
+    def __init__(self, budget: int = DEFAULT_RETRY_BUDGET):
+        self.budget = budget
+        self.hosts: Dict[str, Dict] = {}
+        self._lock = threading.Lock()
+        self._reported = False
+
+    def _host(self, host: str) -> Dict:
+        return self.hosts.setdefault(host, {'retries': 0, 'backoff': 0.0, 'denied': 0})
+
+    def try_consume(self, host: str) -> bool:
+        """占用一次重试预算，预算耗尽返回 False。"""
+        with self._lock:
+            if not self._reported:
+                self._reported = True
+                atexit.register(self.log_summary)
+            entry = self._host(host)
+            if entry['retries'] >= self.budget:
+                entry['denied'] += 1
+                return False
+            entry['retries'] += 1
+            return True
+
+    def add_backoff(self, host: str, seconds: float) -> None:
+        with self._lock:
+            self._host(host)['backoff'] += seconds
+
+    def reset(self) -> None:
+        """清空各主机的计数，开始新一次运行（常驻进程每次运行后调用）"""
+        with self._lock:
+            self.hosts.clear()
+
+    def summary(self) -> Dict[str, Dict]:
+        with self._lock:
+            return {host: dict(entry) for host, entry in self.hosts.items()}
+
+    def total_retries(self) -> int:
+        return sum(entry['retries'] for entry in self.summary().values())
+
+    def log_summary(self) -> None:
+        for host, entry in self.summary().items():
+            log.info(
+                f"🔁 重试统计 {host}: 重试 {entry['retries']}/{self.budget} 次, "
+                f"退避 {entry['backoff']:.2f} 秒, 因预算耗尽放弃 {entry['denied']} 次"
+            )
+
+
+def _budget_from_env() -> int:
+    try:
+        return max(0, int(os.getenv(RETRY_BUDGET_ENV, '') or DEFAULT_RETRY_BUDGET))
+    except ValueError:
+        log.warning(f"⚠️ {RETRY_BUDGET_ENV} 格式错误，使用默认值 {DEFAULT_RETRY_BUDGET}")
+        return DEFAULT_RETRY_BUDGET
+
+
+stats = RetryStats(_budget_from_env())
+
+
+class BudgetedRetry(Retry):
+    """记录每次重试与退避耗时、并受按主机预算约束的 Retry。"""
+
+    host: str = ''
+
+    def increment(self, method=None, url=None, response=None, error=None, _pool=None, _stacktrace=None):
+        # Cloudflare 质询重试多少次都一样，直接放弃
+        if response is not None:
+            challenge = challenge_from_headers(response.status, response.headers)
+            if challenge:
+                raise MaxRetryError(_pool, url, ChallengeResponseError(challenge))
+
+        new_retry = super().increment(method, url, response, error, _pool, _stacktrace)
+
+        host = getattr(_pool, 'host', '') or 'unknown'
+        if response is not None and response.status:
+            cause = f"HTTP {response.status}"
+        else:
+            cause = type(error).__name__ if error else 'unknown'
+        if not stats.try_consume(host):
+            log.warning(f"⛔ {host} 重试预算已耗尽({stats.budget} 次)，放弃重试: {method} {url} ({cause})")
+            reason = error or ResponseError(ResponseError.SPECIFIC_ERROR.format(status_code=getattr(response, 'status', None)))
+            raise MaxRetryError(_pool, url, reason) from reason
+
+        new_retry.host = host
+        log.warning(f"🔁 {host} 第 {len(new_retry.history)} 次重试: {method} {url} ({cause})")
+        return new_retry
+
+    def sleep(self, response=None) -> None:
+        start = time.monotonic()
+        super().sleep(response)
+        elapsed = time.monotonic() - start
+        if elapsed >= 0.01:
+            stats.add_backoff(self.host or 'unknown', elapsed)
+            log.info(f"⏳ {self.host or 'unknown'} 重试退避 {elapsed:.2f} 秒")
@@ -0,0 +1,76 @@
+# -*- coding: utf-8 -*-
+"""
+多账号签到的运行循环
+
+尚香书苑、雨晨等多账号脚本共用的流程:
+    1. pending_accounts 跳过断点记录中今天已签到的账号，其余按顺序交给调度器
+    2. run_accounts 按时间窗口铺开各账号的启动时刻，在并发上限内并行执行；
+       所有账号共用一个连接池（每个账号一个只持有自己 Cookie 的会话），结束时统一关闭；
+       定点发射时忽略时间窗口，所有账号同时启动准备，在目标时刻一起发出签到请求
+    3. report_results 按账号顺序整理结果并登记通知（断点跳过的账号不重复通知）
+"""
+
+import logging
+from typing import Callable, Dict, Iterable, Iterator, List, Optional, Tuple, Union
+
+import requests
+from urllib3.util.retry import Retry
+
+from common.checkpoint import Checkpoint
+from common.firing import FireAt
+from common.http import SessionPool
+from common.notify import report
+from common.scheduler import Scheduler, Window, concurrency_from_env
+
+log = logging.getLogger(__name__)
+
+CHECKPOINT_MESSAGE = '今日已签到（断点记录）'
+
+Task = Tuple[int, Dict]
+
+
+def pending_accounts(accounts: Iterable[Dict], checkpoint: Checkpoint,
+                     identity: Callable[[Dict], str], mask: Callable[[Dict], str],
+                     results: Dict[int, Dict]) -> Iterator[Task]:
+    """逐个产出 (序号, 账号配置)；今天已确认签到的账号直接记入 results，不发任何请求"""
+    for i, account in enumerate(accounts, 1):
+        if checkpoint.is_done(identity(account)):
+            masked = mask(account)
+            log.info(f"📌 账号 {i} ({masked}) {CHECKPOINT_MESSAGE}，跳过")
+            results[i] = {'account': masked, 'success': True, 'message': CHECKPOINT_MESSAGE}
+            continue
+        yield i, account
+
+
+def run_accounts(tasks: Iterable[Task], check_in: Callable[[Task, requests.Session], None],
+                 platform: str, retries: Optional[Union[Retry, int]] = None,
+                 window: Optional[Window] = None, fire: Optional[FireAt] = None) -> None:
+    """在共用连接池上按计划执行 check_in(task, session)"""
+    if fire:
+        if window:
+            log.warning("⚠️ 定点发射时忽略时间窗口（--window / CHECKIN_WINDOW）")
+        tasks = list(tasks)
+        scheduler = Scheduler(concurrency=fire.workers(len(tasks), concurrency_from_env()), gap=(0, 0))
+        fire.wait_prepare()
+    else:
+        scheduler = Scheduler(window)
+    with SessionPool(retries=retries, platform=platform, pool_maxsize=scheduler.concurrency) as pool:
+        def run(task: Task) -> None:
+            session = pool.account()
+            try:
+                check_in(task, session)
+            finally:
+                pool.release(session)
+
+        scheduler.run(tasks, run)
+    if fire:
+        fire.report()
+
+
+def report_results(name: str, results: Dict[int, Dict]) -> List[Dict]:
+    """按账号顺序返回结果列表，并登记通知"""
+    ordered = [results[i] for i in sorted(results)]
+    for item in ordered:
+        if item['message'] != CHECKPOINT_MESSAGE:
+            report(name, item['success'], f"{item['account']} {item['message']}")
+    return ordered
@@ -0,0 +1,192 @@
+# -*- coding: utf-8 -*-
+"""
+时间窗口调度器
+
+原来的多账号循环在账号之间 sleep_random(5, 10)，总耗时随账号数线性增长且大半是空等。
+调度器按时间窗口安排各账号的启动时刻，并在并发上限内并行执行:
+    - 指定窗口时，把账号的启动时刻均匀铺满窗口，并在各自的时间片内加入随机抖动
+    - 未指定窗口时，相邻两次启动至少间隔 gap 秒（同样带抖动），间隔与执行互相重叠
+    - 同时执行的账号数不超过并发上限，有账号结束前后续账号顺延启动
+一次运行只签到一个平台，上限对整次运行生效（即对该平台的站点生效）。
+开始执行前会按并发与单账号预计耗时估算计划能否在窗口内完成并输出报告。
+
+命令行 / 环境变量:
+    --window / CHECKIN_WINDOW         时间窗口，"01:10-01:40"（北京时间）或时长 "30m" / "1h" / "600"（秒）
+    CHECKIN_CONCURRENCY               同时执行的账号数上限，默认 1
+    CHECKIN_TASK_SECONDS              单个账号预计耗时（秒），用于计划评估，默认 30
+"""
+
+import os
+import math
+import time
+import random
+import logging
+import threading
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime, timedelta
+from typing import Callable, Iterable, List, Optional, Tuple
+
+from common.checkpoint import SHANGHAI
+from common.cli import pop_option
+
+log = logging.getLogger(__name__)
+
+WINDOW_ENV = 'CHECKIN_WINDOW'
+DEFAULT_TASK_SECONDS = 30.0
+# 抖动只占时间片的一部分，保证启动顺序与账号顺序一致
+JITTER_RATIO = 0.8
+
+Window = Tuple[float, float]
+
+
+def parse_window(value: str, now: Optional[datetime] = None) -> Window:
+    """解析时间窗口，返回 (开始, 结束) 的时间戳。
+
+    "HH:MM-HH:MM" 按北京时间解释（结束早于开始视为跨天，已处于窗口内则从现在开始，窗口已过则立即执行）；
+    其余按从现在起的时长解释，支持 s / m / h 后缀。
+    """
+    now = now or datetime.now(SHANGHAI)
+    value = value.strip()
+    if '-' in value and ':' in value:
+        try:
+            start_text, end_text = (part.strip() for part in value.split('-', 1))
+            start_time = datetime.strptime(start_text, '%H:%M').time()
+            end_time = datetime.strptime(end_text, '%H:%M').time()
+        except ValueError:
+            raise ValueError(f"时间窗口格式应为 HH:MM-HH:MM，实际为: {value}")
+        start = now.replace(hour=start_time.hour, minute=start_time.minute, second=0, microsecond=0)
+        end = now.replace(hour=end_time.hour, minute=end_time.minute, second=0, microsecond=0)
+        if end <= start:
+            end += timedelta(days=1)
+        if start - timedelta(days=1) <= now < end - timedelta(days=1):
+            # 跨天窗口从昨天开始、现在仍在窗口内
+            start -= timedelta(days=1)
+            end -= timedelta(days=1)
+        if end <= now or start - now > timedelta(hours=12):
+            # 定时任务晚到时不应等到下一个周期
+            log.warning(f"⚠️ 时间窗口 {value} 今天已经结束，立即执行")
+            return now.timestamp(), now.timestamp()
+        return max(start, now).timestamp(), end.timestamp()
+
+    units = {'s': 1, 'm': 60, 'h': 3600}
+    try:
+        if value[-1:].lower() in units:
+            seconds = float(value[:-1]) * units[value[-1].lower()]
+        else:
+            seconds = float(value)
+    except ValueError:
+        raise ValueError(f"无法解析时间窗口: {value}")
+    if seconds < 0:
+        raise ValueError(f"时间窗口不能为负: {value}")
+    start = now.timestamp()
+    return start, start + seconds
+
+
+def window_from_cli() -> Optional[Window]:
+    """从 --window 参数或 CHECKIN_WINDOW 读取时间窗口，未配置返回 None。"""
+    value = pop_option('--window', WINDOW_ENV)
+    return parse_window(value) if value else None
+
+
+def _env_number(env: str, default: float) -> float:
+    try:
+        return float(os.getenv(env, '') or default)
+    except ValueError:
+        log.warning(f"⚠️ {env} 不是数字，使用默认值 {default}")
+        return default
+
+
+def concurrency_from_env() -> int:
+    """CHECKIN_CONCURRENCY，默认 1"""
+    return max(1, int(_env_number('CHECKIN_CONCURRENCY', 1)))
+
+
+class Scheduler:
+    """按时间窗口与并发上限调度账号任务。"""
+
+    def __init__(self, window: Optional[Window] = None, concurrency: Optional[int] = None,
+                 gap: Tuple[float, float] = (5, 10), task_seconds: Optional[float] = None):
+        self.window = window
+        self.concurrency = max(1, int(concurrency or concurrency_from_env()))
+        self.gap = gap
+        self.task_seconds = task_seconds or _env_number('CHECKIN_TASK_SECONDS', DEFAULT_TASK_SECONDS)
+        self._slots = threading.Semaphore(self.concurrency)
+
+    # ---------- 计划 ----------
+    def plan(self, count: int) -> List[float]:
+        """返回 count 个账号的启动时间戳：均匀分布在窗口内，每个时间片内随机抖动。"""
+        if not self.window or count == 0:
+            return []
+        start, end = self.window
+        slot = (end - start) / count
+        return [start + index * slot + random.uniform(0, slot * JITTER_RATIO) for index in range(count)]
+
+    def report(self, count: Optional[int] = None) -> bool:
+        """输出计划评估，返回计划能否在窗口内完成。"""
+        if not self.window:
+            log.info(f"🗓️ 调度计划: 未指定窗口，启动间隔 {self.gap[0]}-{self.gap[1]} 秒，"
+                     f"并发 {self.concurrency}")
+            return True
+
+        needed = math.ceil(count / self.concurrency) * self.task_seconds
+        start, end = self.window
+        span = end - start
+        begin = datetime.fromtimestamp(start, SHANGHAI).strftime('%H:%M:%S')
+        finish = datetime.fromtimestamp(end, SHANGHAI).strftime('%H:%M:%S')
+        # 最后一个账号在窗口末尾启动，还需要一个账号的耗时才能完成
+        fits = needed <= span + self.task_seconds
+        log.info(f"🗓️ 调度计划: {count} 个账号，窗口 {begin}-{finish}（{span:.0f} 秒），并发 {self.concurrency}，"
+                 f"单账号预计 {self.task_seconds:.0f} 秒，至少需要 {needed:.0f} 秒")
+        if fits:
+            log.info("🗓️ 计划可以在窗口内完成")
+        else:
+            log.warning(f"⚠️ 计划超出窗口约 {needed - span - self.task_seconds:.0f} 秒，"
+                        f"可扩大窗口或提高 CHECKIN_CONCURRENCY，超出的账号将顺延执行")
+        return fits
+
+    # ---------- 执行 ----------
+    def run(self, items: Iterable, func: Callable) -> List:
+        """按计划执行 func(item)，返回与 items 顺序一致的结果列表。
+
+        func 抛出的异常会原样放入结果列表，由调用方决定如何记录。
+        指定窗口时需要账号总数来规划，items 会先被完整读入；否则按顺序惰性读取。
+        """
+        if self.window:
+            items = list(items)
+            starts = iter(self.plan(len(items)))
+            self.report(len(items))
+        else:
+            starts = None
+            self.report()
+
+        futures = []
+        last_start = None
+        with ThreadPoolExecutor(max_workers=self.concurrency * 4, thread_name_prefix='checkin') as pool:
+            for item in items:
+                if starts is not None:
+                    at = next(starts)
+                elif last_start is None:
+                    at = time.time()
+                else:
+                    at = last_start + random.uniform(*self.gap)
+
+                delay = at - time.time()
+                if delay > 0:
+                    log.debug(f"等待 {delay:.2f} 秒后启动下一个账号...")
+                    time.sleep(delay)
+
+                # 并发已满时在这里等待，启动时刻随之顺延
+                self._slots.acquire()
+                last_start = time.time()
+                futures.append(pool.submit(self._call, func, item, self._slots))
+
+        return [future.result() for future in futures]
+
+    @staticmethod
+    def _call(func: Callable, item, slot: threading.Semaphore):
+        try:
+            return func(item)
+        except Exception as e:
+            return e
+        finally:
+            slot.release()
@@ -0,0 +1,84 @@
+# -*- coding: utf-8 -*-
+"""
+多 runner 并行的账号分片
+
+`--shard i/n`（或环境变量 CHECKIN_SHARD=i/n，i 从 1 开始）时，只处理账号标识哈希后落在第 i 片的账号。
+哈希只取决于账号本身，与账号顺序、数量无关，增删账号不会让其余账号换片。
+每个分片把结果写入 results/<平台>-shard-<i>of<n>.json，由 merge_shards.py 合并为总结果与退出码。
+"""
+
+import os
+import json
+import logging
+from datetime import datetime
+from pathlib import Path
+from typing import Callable, Dict, Iterable, Iterator, List, Optional, Tuple
+
+from common.accounts import fingerprint
+from common.cli import pop_option
+
+log = logging.getLogger(__name__)
+
+BASE_DIR = Path(__file__).resolve().parents[2]
+SHARD_ENV = 'CHECKIN_SHARD'
+RESULTS_DIR = Path(os.getenv('CHECKIN_RESULTS_DIR', '') or BASE_DIR / 'results')
+
+Shard = Tuple[int, int]
+
+
+def parse_shard(value: str) -> Shard:
+    """解析 "i/n"，要求 1 <= i <= n。"""
+    try:
+        index, total = (int(part) for part in value.strip().split('/', 1))
+    except ValueError:
+        raise ValueError(f"分片格式应为 i/n，实际为: {value}")
+    if total < 1 or not 1 <= index <= total:
+        raise ValueError(f"分片编号超出范围: {value}")
+    return index, total
+
+
+def shard_from_cli() -> Optional[Shard]:
+    """从 --shard 参数或 CHECKIN_SHARD 读取分片，未配置返回 None。"""
+    value = pop_option('--shard', SHARD_ENV)
+    if not value:
+        return None
+    shard = parse_shard(value)
+    log.info(f"🧩 分片模式: 第 {shard[0]}/{shard[1]} 片")
+    return shard
+
+
+def shard_of(identity: str, total: int) -> int:
+    """账号所属分片（从 1 开始）。"""
+    return int(fingerprint(identity), 16) % total + 1
+
+
+def select_shard(accounts: Iterable[Dict], shard: Optional[Shard],
+                 identity: Callable[[Dict], str]) -> Iterator[Dict]:
+    """过滤出属于当前分片的账号；未分片时原样返回。"""
+    for account in accounts:
+        if shard is None or shard_of(identity(account), shard[1]) == shard[0]:
+            yield account
+
+
+def result_path(platform: str, shard: Shard, results_dir: Path = RESULTS_DIR) -> Path:
+    return results_dir / f"{platform}-shard-{shard[0]}of{shard[1]}.json"
+
+
+def write_shard_result(platform: str, shard: Shard, results: List[Dict],
+                       extra: Optional[Dict] = None) -> Path:
+    """写出本分片的结果，results 中每项至少包含 account / success / message。"""
+    path = result_path(platform, shard)
+    data = {
+        'platform': platform,
+        'shard': list(shard),
+        'success': sum(1 for item in results if item.get('success')),
+        'fail': sum(1 for item in results if not item.get('success')),
+        'results': results,
+        'finish_time': datetime.now().strftime('%Y-%m-%d %H:%M:%S'),
+    }
+    data.update(extra or {})
+    path.parent.mkdir(parents=True, exist_ok=True)
+    with path.open('w', encoding='utf-8') as f:
+        json.dump(data, f, ensure_ascii=False, indent=2)
+    log.info(f"💾 分片结果已写入: {path}")
+    return path
@@ -0,0 +1,137 @@
+# -*- coding: utf-8 -*-
+"""
+按主机自适应的连接/读取超时
+
+每次建连耗时（TCP + TLS）与响应耗时按主机记录在 status/latency.json 中（每项保留最近若干次），
+超时按近期高分位数乘以系数计算，并限制在上下限之间:
+    连接超时 = clamp(p95(建连耗时) × 4, 2s, 15s)
+    读取超时 = clamp(p95(响应耗时) × 4, 5s, 60s)
+样本不足时使用调用处给出的默认值（即原来的固定超时）。
+该文件只在本机 / 自托管 runner 上跨运行保留，不提交到仓库。
+健康主机挂起时能更快失败，慢主机也不会被过早掐断。
+
+环境变量:
+    CHECKIN_ADAPTIVE_TIMEOUT=0  关闭自适应，始终使用默认值
+"""
+
+import json
+import atexit
+import logging
+import threading
+from datetime import datetime
+from pathlib import Path
+from typing import Dict, List, Tuple
+from urllib.parse import urlsplit
+
+import requests
+
+from common.cli import env_flag
+from common.connection import add_connect_listener
+
+log = logging.getLogger(__name__)
+
+BASE_DIR = Path(__file__).resolve().parents[2]
+LATENCY_FILE = BASE_DIR / "status" / "latency.json"
+
+MAX_SAMPLES = 50
+MIN_SAMPLES = 5
+PERCENTILE = 0.95
+FACTOR = 4.0
+CONNECT_BOUNDS = (2.0, 15.0)
+READ_BOUNDS = (5.0, 60.0)
+
+Timeout = Tuple[float, float]
+
+
+def percentile(samples: List[float], q: float) -> float:
+    ordered = sorted(samples)
+    index = min(len(ordered) - 1, max(0, int(round(q * (len(ordered) - 1)))))
+    return ordered[index]
+
+
+def clamp(value: float, bounds: Tuple[float, float]) -> float:
+    low, high = bounds
+    return max(low, min(high, value))
+
+
+class TimeoutPolicy:
+    """按主机的延迟样本与超时计算。"""
+
+    def __init__(self, path: Path = LATENCY_FILE):
+        self.path = Path(path)
+        self.enabled = env_flag('CHECKIN_ADAPTIVE_TIMEOUT', default=True)
+        self.hosts: Dict[str, Dict[str, List[float]]] = self._load()
+        self._dirty = False
+        self._lock = threading.Lock()
+
+    def _load(self) -> Dict:
+        if not self.path.exists():
+            return {}
+        try:
+            with self.path.open('r', encoding='utf-8') as f:
+                return json.load(f).get('hosts', {})
+        except Exception as e:
+            log.warning(f"读取延迟记录失败: {e}")
+            return {}
+
+    def save(self) -> None:
+        if not self._dirty:
+            return
+        try:
+            with self._lock:
+                data = {
+                    'hosts': self.hosts,
+                    'update_time': datetime.now().strftime('%Y-%m-%d %H:%M:%S')
+                }
+                self.path.parent.mkdir(parents=True, exist_ok=True)
+                with self.path.open('w', encoding='utf-8') as f:
+                    json.dump(data, f, ensure_ascii=False, indent=2)
+                self._dirty = False
+        except Exception as e:
+            log.warning(f"保存延迟记录失败: {e}")
+
+    # ---------- 采样 ----------
+    def add_sample(self, host: str, kind: str, seconds: float) -> None:
+        if not self.enabled or not host:
+            return
+        with self._lock:
+            if not self._dirty:
+                self._dirty = True
+                atexit.register(self.save)
+            samples = self.hosts.setdefault(host, {}).setdefault(kind, [])
+            samples.append(round(seconds, 4))
+            del samples[:-MAX_SAMPLES]
+
+    def on_connect(self, scheme: str, host: str, seconds: float) -> None:
+        self.add_sample(host, 'connect', seconds)
+
+    def observe(self, response: requests.Response, *args, **kwargs) -> requests.Response:
+        """requests 响应钩子：记录响应耗时（发出请求到收到响应头）。"""
+        self.add_sample(urlsplit(response.url).hostname or '', 'read', response.elapsed.total_seconds())
+        return response
+
+    # ---------- 计算 ----------
+    def _derive(self, host: str, kind: str, default: float, bounds: Tuple[float, float]) -> float:
+        with self._lock:
+            samples = list(self.hosts.get(host, {}).get(kind, []))
+        if len(samples) < MIN_SAMPLES:
+            return default
+        return round(clamp(percentile(samples, PERCENTILE) * FACTOR, bounds), 2)
+
+    def timeout(self, url: str, default: Timeout) -> Timeout:
+        """返回 (连接超时, 读取超时)。"""
+        if not self.enabled:
+            return default
+        host = urlsplit(url).hostname or ''
+        connect = self._derive(host, 'connect', default[0], CONNECT_BOUNDS)
+        read = self._derive(host, 'read', default[1], READ_BOUNDS)
+        return connect, read
+
+
+policy = TimeoutPolicy()
+add_connect_listener(policy.on_connect)
+
+
+def timeout_for(url: str, default: Timeout) -> Timeout:
+    """按主机近期延迟给出 (连接超时, 读取超时)，样本不足时返回 default。"""
+    return policy.timeout(url, default)
@@ -0,0 +1,167 @@
+# -*- coding: utf-8 -*-
+"""
+TLS 会话复用
+
+urllib3 在未指定 ssl_context 时为每个 HTTPS 连接新建 SSLContext 并重新加载根证书，
+同一主机的第二个连接也只能做完整握手（会话只能在同一个 SSLContext 内复用）。开启后:
+    - 按证书校验参数共用 SSLContext
+    - 新连接握手前带上同一主机上一次的会话（TLS 1.3 为会话票据），服务器接受时省去完整握手
+    - 按主机累计完整握手与复用握手的次数和耗时，写入 status/tls_sessions.json，
+      并估算复用节省的时间，便于评估高延迟线路上的收益
+
+Python 标准库的 ssl 模块不能序列化 SSLSession，会话票据无法写入文件跨进程复用，
+每个新进程的第一次握手仍是完整握手，所以只适用于常驻守护进程（checkin_daemon.py）的多次运行；
+工作流中单独启动的脚本开启后没有收益。status/tls_sessions.json 只保存统计数据，不保存任何票据。
+
+环境变量:
+    CHECKIN_TLS_RESUME=1  开启（默认关闭，只在守护进程中使用）
+"""
+
+import ssl
+import json
+import time
+import atexit
+import logging
+import threading
+from datetime import datetime
+from pathlib import Path
+from typing import Dict, Tuple
+
+from urllib3.util.ssl_ import create_urllib3_context, resolve_cert_reqs, resolve_ssl_version
+
+from common.cli import env_flag
+
+log = logging.getLogger(__name__)
+
+BASE_DIR = Path(__file__).resolve().parents[2]
+STATS_FILE = BASE_DIR / "status" / "tls_sessions.json"
+
+
+class ResumingSSLSocket(ssl.SSLSocket):
+    """握手前取出同一主机上次的会话，握手后记录耗时与是否复用。"""
+
+    def do_handshake(self, block=False):
+        store.before_handshake(self)
+        start = time.perf_counter()
+        super().do_handshake(block)
+        store.after_handshake(self, time.perf_counter() - start)
+
+
+class SessionStore:
+    """共用的 SSLContext、各主机最近的 TLS 会话与握手统计（线程安全）。"""
+
+    def __init__(self, path: Path = STATS_FILE):
+        self.path = Path(path)
+        self.enabled = env_flag('CHECKIN_TLS_RESUME', default=False)
+        self._contexts: Dict[tuple, ssl.SSLContext] = {}
+        # (id(context), 主机) -> 会话；context 由 _contexts 持有，id 在进程内不会被复用
+        self._sessions: Dict[Tuple[int, str], ssl.SSLSession] = {}
+        self.hosts: Dict[str, Dict] = {}
+        self._lock = threading.Lock()
+        self._dirty = False
+
+    # ---------- 上下文 ----------
+    def context_for(self, conn) -> ssl.SSLContext:
+        """按 urllib3 HTTPSConnection 的校验参数返回共用的 SSLContext"""
+        key = (conn.cert_reqs, conn.ca_certs, conn.ca_cert_dir, conn.ca_cert_data,
+               conn.ssl_version, conn.ssl_minimum_version, conn.ssl_maximum_version)
+        with self._lock:
+            context = self._contexts.get(key)
+            if context is None:
+                context = create_urllib3_context(
+                    ssl_version=resolve_ssl_version(conn.ssl_version),
+                    ssl_minimum_version=conn.ssl_minimum_version,
+                    ssl_maximum_version=conn.ssl_maximum_version,
+                    cert_reqs=resolve_cert_reqs(conn.cert_reqs),
+                )
+                # urllib3 只为自建的上下文加载系统根证书，传入上下文时需要自己加载
+                if not (conn.ca_certs or conn.ca_cert_dir or conn.ca_cert_data):
+                    context.load_default_certs()
+                context.sslsocket_class = ResumingSSLSocket
+                self._contexts[key] = context
+            return context
+
+    # ---------- 会话 ----------
+    def before_handshake(self, sock: ssl.SSLSocket) -> None:
+        if sock.session is not None or not sock.server_hostname:
+            return
+        with self._lock:
+            session = self._sessions.get((id(sock.context), sock.server_hostname))
+        if session is not None:
+            try:
+                sock.session = session
+            except (ValueError, ssl.SSLError) as e:
+                log.debug(f"TLS 会话不可用 {sock.server_hostname}: {e}")
+
+    def remember(self, sock) -> None:
+        """保存连接当前的会话；TLS 1.3 的票据在握手之后才到达，收到响应后还会再调用一次"""
+        if not isinstance(sock, ssl.SSLSocket) or not sock.server_hostname:
+            return
+        try:
+            session = sock.session
+            version = sock.version()
+        except (ValueError, OSError):
+            return
+        if session is None or (version == 'TLSv1.3' and not session.has_ticket):
+            return
+        with self._lock:
+            self._sessions[(id(sock.context), sock.server_hostname)] = session
+
+    # ---------- 统计 ----------
+    def after_handshake(self, sock: ssl.SSLSocket, seconds: float) -> None:
+        self.remember(sock)
+        host = sock.server_hostname or 'unknown'
+        kind = 'resumed' if sock.session_reused else 'full'
+        with self._lock:
+            if not self._dirty:
+                self._dirty = True
+                self.hosts.update(self._load())
+                atexit.register(self.save)
+            entry = self.hosts.setdefault(host, {'full': 0, 'full_seconds': 0.0,
+                                                 'resumed': 0, 'resumed_seconds': 0.0})
+            entry[kind] += 1
+            entry[f'{kind}_seconds'] = round(entry[f'{kind}_seconds'] + seconds, 4)
+        log.debug(f"🔐 {host} TLS 握手 {seconds * 1000:.0f} ms（{'复用会话' if kind == 'resumed' else '完整握手'}）")
+
+    @staticmethod
+    def saved_seconds(entry: Dict) -> float:
+        """按平均耗时估算复用握手节省的总时间"""
+        if not entry['full'] or not entry['resumed']:
+            return 0.0
+        full = entry['full_seconds'] / entry['full']
+        resumed = entry['resumed_seconds'] / entry['resumed']
+        return max(0.0, full - resumed) * entry['resumed']
+
+    def _load(self) -> Dict[str, Dict]:
+        if not self.path.exists():
+            return {}
+        try:
+            with self.path.open('r', encoding='utf-8') as f:
+                hosts = json.load(f).get('hosts', {})
+            for entry in hosts.values():
+                entry.pop('saved_seconds', None)
+            return hosts
+        except Exception as e:
+            log.warning(f"读取 TLS 会话统计失败: {e}")
+            return {}
+
+    def save(self) -> None:
+        with self._lock:
+            hosts = {host: dict(entry, saved_seconds=round(self.saved_seconds(entry), 4))
+                     for host, entry in self.hosts.items()}
+        for host, entry in hosts.items():
+            if entry['resumed']:
+                log.info(f"🔐 TLS 会话复用 {host}: 完整握手 {entry['full']} 次，复用 {entry['resumed']} 次，"
+                         f"累计节省约 {entry['saved_seconds'] * 1000:.0f} ms")
+        try:
+            self.path.parent.mkdir(parents=True, exist_ok=True)
+            with self.path.open('w', encoding='utf-8') as f:
+                json.dump({
+                    'hosts': hosts,
+                    'update_time': datetime.now().strftime('%Y-%m-%d %H:%M:%S')
+                }, f, ensure_ascii=False, indent=2)
+        except Exception as e:
+            log.warning(f"保存 TLS 会话统计失败: {e}")
+
+
+store = SessionStore()
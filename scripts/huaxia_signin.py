@@ -7,12 +7,19 @@
 import os
 import sys
 import time
-import socket
 import json
 from datetime import datetime
+from urllib.parse import urlsplit
 import requests
-from requests.adapters import HTTPAdapter
-from urllib3.util.retry import Retry
+
+from common.http import configure_session, prewarm
+from common.logs import setup_logging
+from common.notify import report
+from common.retry import BudgetedRetry
+from common.timeouts import timeout_for
+from common.profiling import run_entry
+
+setup_logging()
 
 # ========== 配置区 ==========
 class Config:
@@ -34,15 +41,13 @@ class Config:
 # ========== 创建会话 ==========
 def create_session():
     session = requests.Session()
-    retry_strategy = Retry(
+    retry_strategy = BudgetedRetry(
         total=3,
         backoff_factor=1,
         status_forcelist=[429, 500, 502, 503, 504],
         allowed_methods=["HEAD", "GET", "POST"]
     )
-    adapter = HTTPAdapter(max_retries=retry_strategy)
-    session.mount("http://", adapter)
-    session.mount("https://", adapter)
+    configure_session(session, retries=retry_strategy, platform='huaxia')
 
     if Config.PROXY:
         session.proxies = {'http': Config.PROXY, 'https': Config.PROXY}
@@ -53,13 +58,17 @@ def create_session():
 session = create_session()
 
 # ========== 工具函数 ==========
-def notify(title: str, content: str):
+def notify(title: str, content: str, success: bool = False, digest: bool = True):
     timestamp = datetime.now().strftime('%Y-%m-%d %H:%M:%S')
     message = f"[{timestamp}] {title}\n{content}"
     print('\n' + '=' * 50)
     print(message)
     print('=' * 50 + '\n')
 
+    # 登记到通知汇总，进程退出时统一推送
+    if digest:
+        report('花夏数娱', success, f"{title} {content}")
+
     # GitHub Actions 支持
     if Config.IS_GITHUB_ACTIONS:
         summary_file = os.getenv('GITHUB_STEP_SUMMARY')
@@ -83,27 +92,24 @@ def mask_mapping_values(data: dict) -> dict:
     return {key: "***" for key in data}
 
 def check_network():
+    """预热连接：在会话连接池中建立并 TLS 握手一个真实的连接，登录和签到直接复用，检测不再额外建连"""
+    host = urlsplit(Config.LOGIN_URL).hostname
+    print(f"🔍 预热连接: {host}")
     try:
-        host = 'www.huaxiashuyu.com'
-        print(f"🔍 DNS解析: {host}")
-        ip = socket.gethostbyname(host)
-        print(f"✅ 解析成功: {ip}")
-
-        sock = socket.socket(socket.AF_INET, socket.SOCK_STREAM)
-        sock.settimeout(5)
-        result = sock.connect_ex((host, 443))
-        sock.close()
-
-        if result == 0:
-            print(f"✅ TCP连接成功\n")
-            return True
-        else:
-            print(f"❌ TCP连接失败\n")
-            return False
+        timings = prewarm(session, Config.LOGIN_URL,
+                          timeout=timeout_for(Config.LOGIN_URL, (Config.CONNECT_TIMEOUT, Config.READ_TIMEOUT)))
     except Exception as e:
-        print(f"❌ 网络检测失败: {e}\n")
+        print(f"❌ 连接失败: {type(e).__name__}: {e}\n")
         return False
 
+    if timings is None:
+        print("ℹ️ 回放模式，跳过连接预热\n")
+        return True
+
+    print(f"✅ DNS解析: {timings['dns'] * 1000:.0f} ms")
+    print(f"✅ TCP+TLS握手: {timings['connect'] * 1000:.0f} ms ({timings['tls'] or '无TLS'})\n")
+    return True
+
 # ========== 智能响应判断 ==========
 def is_response_success(response_data: dict, response_text: str = '') -> bool:
     if not isinstance(response_data, dict):
@@ -155,7 +161,7 @@ def login() -> str:
             Config.LOGIN_URL,
             data=login_data,
             headers=headers,
-            timeout=(Config.CONNECT_TIMEOUT, Config.READ_TIMEOUT),
+            timeout=timeout_for(Config.LOGIN_URL, (Config.CONNECT_TIMEOUT, Config.READ_TIMEOUT)),
             verify=True
         )
 
@@ -178,7 +184,7 @@ def login() -> str:
 
         if is_response_success(result, response.text):
             msg = result.get('msg', '登录成功')
-            notify('🎉 登录成功', msg)
+            notify('🎉 登录成功', msg, success=True, digest=False)
 
             cookies = response.cookies.get_dict()
             if cookies:
@@ -226,7 +232,7 @@ def sign_in(cookie: str):
             Config.LOGIN_URL,
             data=data,
             headers=headers,
-            timeout=(Config.CONNECT_TIMEOUT, Config.READ_TIMEOUT),
+            timeout=timeout_for(Config.LOGIN_URL, (Config.CONNECT_TIMEOUT, Config.READ_TIMEOUT)),
             verify=True
         )
 
@@ -247,11 +253,11 @@ def sign_in(cookie: str):
 
         if is_response_success(result, response.text):
             msg = result.get('msg', '签到成功')
-            notify('✅ 签到成功', msg)
+            notify('✅ 签到成功', msg, success=True)
         else:
             msg = result.get('msg', '签到失败')
             if '已签' in msg or '重复' in msg:
-                notify('ℹ️ 今日已签到', msg)
+                notify('ℹ️ 今日已签到', msg, success=True)
             else:
                 notify('⚠️ 签到异常', msg)
 
@@ -288,4 +294,4 @@ def main():
         sys.exit(1)
 
 if __name__ == '__main__':
-    main()
+    run_entry(main)
@@ -3,6 +3,14 @@
 """
 看雪论坛自动签到脚本 
 支持 GitHub Actions 
+
+多账号：KANXUE_COOKIES 设置为 JSON 数组或每行一个 Cookie。各账号使用独立的会话（Cookie 互不影响），
+共用一个到 bbs.kanxue.com 的 keep-alive 连接池并发签到，最后输出结果表。
+
+默认直接发送签到请求（签到接口本身会返回"已签到"），只有返回结果无法判断时才查询签到状态；
+设置 KANXUE_OPTIMISTIC=0 恢复为先查询状态再签到。
+
+定点发射（--fire-at / CHECKIN_FIRE_AT）时提前预热连接池，各账号在目标时刻同时发出签到请求。
 """
 
 import json
@@ -10,17 +18,48 @@ import requests
 import urllib3
 from datetime import datetime
 import os
-import time
+
+from common.accounts import env_cookies
+from common.breaker import CircuitBreaker
+from common.checkpoint import Checkpoint
+from common.cli import env_flag
+from common.cloudflare import CloudflareChallenge
+from common.firing import fire_at_from_cli
+from common.http import build_adapter, configure_session, prewarm
+from common.logs import setup_logging
+from common.notify import report
+from common.scheduler import Scheduler
+from common.timeouts import timeout_for
+from common.profiling import run_entry
 
 urllib3.disable_warnings(urllib3.exceptions.InsecureRequestWarning)
 
+SIGNIN_URL = 'https://bbs.kanxue.com/user-signin.htm'
+
+# 签到接口对已签到账号返回的提示
+SIGNED_MARKERS = ('已签到', '已经签到', '签过', '重复签到')
+
+setup_logging()
+
 
 class KanxueSignIn:
-    def __init__(self, cookie):
-        self.session = requests.Session()
+    def __init__(self, cookie, breaker=None, adapter=None, label='', fire=None):
+        # 多账号时传入共用的 adapter：连接池共享，Cookie 仍在各自的 session 中
+        self.session = configure_session(requests.Session(), adapter=adapter, platform='kanxue')
         self.session.verify = False
+        self.label = f"[{label}] " if label else ''
+        self.optimistic = env_flag('KANXUE_OPTIMISTIC', default=True)
+        # 最近一次签到响应是否无法判断结果（需要再查询签到状态确认）
+        self.ambiguous = False
+        # 定点发射：签到请求等到目标时刻再发出
+        self.fire = fire
+
+        # 被拦截（403 / Cloudflare 质询）的响应计入熔断器
+        self.breaker = breaker
+        if breaker:
+            breaker.attach(self.session)
         
-        # 禁用代理（重要：避免 GitHub Actions 环境问题）
+        # 禁用环境变量中的代理（重要：避免 GitHub Actions 环境问题）；配置了 KANXUE_PROXIES 时由代理池指定出口
         self.session.trust_env = False
         self.session.proxies = {'http': None, 'https': None}
 
@@ -50,18 +89,22 @@ class KanxueSignIn:
     def _log(self, message, level="INFO"):
         """格式化日志输出"""
         timestamp = datetime.now().strftime('%Y-%m-%d %H:%M:%S')
-        print(f"[{timestamp}] [{level}] {message}")
+        print(f"[{timestamp}] [{level}] {self.label}{message}")
+
+    def warm(self, connections=1):
+        """预热共用连接池：提前完成 DNS 解析与 TLS 握手"""
+        timings = prewarm(self.session, SIGNIN_URL, connections=connections)
+        if timings:
+            self._log(f"连接预热完成: 新建 {timings['opened']} 个连接，"
+                      f"DNS {timings['dns'] * 1000:.0f} ms，TCP+TLS {timings['connect'] * 1000:.0f} ms")
 
     def check_signin_status(self):
         """检查今日签到状态"""
         try:
             url = 'https://bbs.kanxue.com/user-is_signin.htm'
             self._log("正在检查签到状态...")
-            
-            # 添加延时，避免触发反爬虫
-            time.sleep(1)
-            
-            response = self.session.get(url, timeout=15)
+
+            response = self.session.get(url, timeout=timeout_for(url, (5, 15)))
             
             if response.status_code == 200:
                 result = response.json()
@@ -79,22 +122,27 @@ class KanxueSignIn:
             else:
                 self._log(f"状态检查失败，HTTP {response.status_code}", "WARNING")
                 return 'error'
-                
+
+        except CloudflareChallenge as e:
+            self._log(f"被 Cloudflare 质询拦截: {e}", "ERROR")
+            if self.breaker:
+                self.breaker.record_blocked(f"Cloudflare 质询: {e}")
+            return 'blocked'
         except Exception as e:
             self._log(f"检查签到状态异常: {e}", "ERROR")
             return 'error'
 
     def sign_in(self):
-        """执行签到操作"""
+        """执行签到操作，已签到的响应视为成功；结果无法判断时置 self.ambiguous"""
+        self.ambiguous = False
         try:
-            url = 'https://bbs.kanxue.com/user-signin.htm'
+            url = SIGNIN_URL
+            if self.fire:
+                self.fire.fire(self.label.strip('[] '))
             self._log("正在执行签到...")
-            
-            # 添加延时
-            time.sleep(2)
-            
+
             # 直接 POST 空参数（看雪论坛不需要 csrf_token）
-            response = self.session.post(url, data={}, timeout=15)
+            response = self.session.post(url, data={}, timeout=timeout_for(url, (5, 15)))
             
             if response.status_code == 200:
                 try:
@@ -110,7 +158,10 @@ class KanxueSignIn:
                             return True, f"签到成功！获得 {message} 雪币"
                         else:
                             return True, f"签到成功！{message}"
+                    elif any(marker in str(message) for marker in SIGNED_MARKERS):
+                        return True, "今日已签到"
                     else:
+                        self.ambiguous = True
                         return False, f"签到失败: {message}"
                         
                 except json.JSONDecodeError:
@@ -118,22 +169,46 @@ class KanxueSignIn:
                     # 如果不是 JSON 但包含成功标识
                     if '成功' in response.text or 'success' in response.text.lower():
                         return True, "签到成功（非标准响应）"
+                    self.ambiguous = True
                     return False, "返回内容解析失败"
             elif response.status_code == 403:
                 return False, "触发反爬虫限制 (403)，请稍后重试"
             else:
+                self.ambiguous = True
                 return False, f"请求失败，状态码: {response.status_code}"
                 
+        except CloudflareChallenge as e:
+            self._log(f"被 Cloudflare 质询拦截: {e}", "ERROR")
+            if self.breaker:
+                self.breaker.record_blocked(f"Cloudflare 质询: {e}")
+            return False, "被 Cloudflare 质询拦截，当前出口 IP 不受信任"
+        except requests.exceptions.Timeout as e:
+            # 请求可能已在服务端生效，需要查询状态确认
+            self._log(f"签到请求超时: {e}", "WARNING")
+            self.ambiguous = True
+            return False, "签到请求超时"
         except Exception as e:
             self._log(f"签到请求异常: {e}", "ERROR")
             return False, f"签到异常: {e}"
 
+    def run_optimistic(self):
+        """直接签到，只在响应无法判断时查询签到状态"""
+        success, message = self.sign_in()
+        if not success and self.ambiguous:
+            self._log(f"签到结果无法判断（{message}），查询签到状态确认...", "WARNING")
+            if self.check_signin_status() == 'signed':
+                success, message = True, "今日已签到"
+
+        if success:
+            self._log(f"✓ {message}", "SUCCESS")
+        else:
+            self._log(f"✗ {message}", "ERROR")
+        return success, message
+
     def run(self):
         """主流程"""
-        print("\n" + "="*60)
-        print("  看雪论坛自动签到")
-        print(f"  运行时间: {datetime.now().strftime('%Y-%m-%d %H:%M:%S')}")
-        print("="*60 + "\n")
+        if self.optimistic:
+            return self.run_optimistic()
 
         # 检查签到状态
         status = self.check_signin_status()
@@ -141,6 +216,9 @@ class KanxueSignIn:
         if status == 'signed':
             self._log("✓ 今日已签到，无需重复操作", "SUCCESS")
             return True, "今日已签到"
+        elif status == 'blocked':
+            # 质询页不会因为换个接口就消失，直接结束
+            return False, "被 Cloudflare 质询拦截，当前出口 IP 不受信任"
         elif status == 'error':
             self._log("状态检查失败，尝试直接签到...", "WARNING")
         else:
@@ -157,44 +235,116 @@ class KanxueSignIn:
             return False, message
 
 
+def concurrency():
+    """并发签到的账号数，默认 4"""
+    try:
+        return max(1, int(os.getenv('KANXUE_CONCURRENCY', '') or 4))
+    except ValueError:
+        return 4
+
+
+def mask_cookie(cookie):
+    """对Cookie进行脱敏处理"""
+    if len(cookie) <= 20:
+        return "***"
+    return f"{cookie[:10]}...{cookie[-10:]}"
+
+
 def main():
     """主函数"""
-    # 优先从环境变量读取 Cookie（用于 GitHub Actions）
-    cookie = os.getenv('KANXUE_COOKIE', '')
-
-    # 清理 Cookie 字符串
-    cookie = ' '.join(cookie.split())
+    # 优先从环境变量读取 Cookie（用于 GitHub Actions），清理 Cookie 字符串中的多余空白
+    cookies = [' '.join(cookie.split()) for cookie in env_cookies('KANXUE_COOKIE', 'KANXUE_COOKIES', label='看雪账号')]
+    fire = fire_at_from_cli()
 
-    if not cookie:
+    if not cookies:
         print("❌ 错误: 请配置 KANXUE_COOKIE 环境变量或在脚本中填入 Cookie\n")
         print("获取方法:")
         print("1. 浏览器登录 https://bbs.kanxue.com/")
         print("2. F12 打开开发者工具 → Network")
         print("3. 刷新页面，找到任意请求")
         print("4. 复制 Request Headers 中的 Cookie 值\n")
+        print("多账号: 设置 KANXUE_COOKIES（JSON 数组或每行一个 Cookie）\n")
         exit(1)
 
-    try:
-        signer = KanxueSignIn(cookie)
-        success, message = signer.run()
+    print("\n" + "="*60)
+    print("  看雪论坛自动签到")
+    print(f"  运行时间: {datetime.now().strftime('%Y-%m-%d %H:%M:%S')}")
+    print(f"  账号数量: {len(cookies)}")
+    print("="*60 + "\n")
 
-        print("\n" + "="*60)
-        if success:
-            print(f"  ✅ {message}")
+    # 今天已确认签到（重跑）的账号不发任何请求
+    checkpoint = Checkpoint('kanxue')
+    results = {}
+    pending = []
+    for index, cookie in enumerate(cookies):
+        record = checkpoint.get(cookie)
+        if record:
+            print(f"✅ {mask_cookie(cookie)} 今日已签到（断点记录 {record.get('time', '')}），跳过")
+            results[index] = (True, '今日已签到（断点记录）')
         else:
-            print(f"  ❌ {message}")
-            print("  提示: 请检查 Cookie 是否正确或已过期")
-        print("="*60 + "\n")
+            pending.append(index)
 
-        exit(0 if success else 1)
+    breaker = CircuitBreaker('kanxue')
+    if pending:
+        # 出口被拦截且仍在冷却期内时直接跳过，不再耗费超时
+        if not breaker.allow('https://bbs.kanxue.com/'):
+            print("❌ 看雪论坛在当前出口处于熔断状态，跳过本次签到")
+            report('看雪论坛', False, '熔断跳过')
+            exit(1)
 
-    except KeyboardInterrupt:
-        print("\n\n⚠️  用户中断执行")
-        exit(1)
-    except Exception as e:
-        print(f"\n❌ 程序异常: {e}\n")
-        exit(1)
+        # 所有账号共用一个 adapter（同一个连接池）
+        workers = min(concurrency(), len(pending))
+        if fire:
+            workers = fire.workers(len(pending), workers)
+        adapter = build_adapter(pool_maxsize=workers, platform='kanxue')
+
+        if fire:
+            # 定点发射：到提前量时预热好每个并发账号的连接，签到请求在目标时刻一起发出
+            fire.wait_prepare()
+            try:
+                KanxueSignIn('', adapter=adapter).warm(workers)
+            except Exception as e:
+                print(f"⚠️ 连接预热失败: {type(e).__name__}: {e}")
+
+        def sign(index):
+            cookie = cookies[index]
+            if breaker.is_open:
+                results[index] = (False, '熔断跳过')
+                return
+            try:
+                label = mask_cookie(cookie) if len(cookies) > 1 else ''
+                success, message = KanxueSignIn(cookie, breaker=breaker, adapter=adapter, label=label, fire=fire).run()
+            except Exception as e:
+                success, message = False, f"程序异常: {e}"
+            if success:
+                checkpoint.mark_done(cookie, message)
+            results[index] = (success, message)
+
+        try:
+            Scheduler(concurrency=workers, gap=(0, 0)).run(pending, sign)
+        except KeyboardInterrupt:
+            print("\n\n⚠️  用户中断执行")
+            exit(1)
+        finally:
+            adapter.close()
+            breaker.save()
+        if fire:
+            fire.report()
+
+    # 结果表
+    print("\n" + "="*60)
+    for index, cookie in enumerate(cookies):
+        success, message = results[index]
+        print(f"  {'✅' if success else '❌'} {mask_cookie(cookie):<24} {message}")
+        if index in pending:
+            report('看雪论坛', success, f"{mask_cookie(cookie)} {message}" if len(cookies) > 1 else message)
+    failed = [index for index in results if not results[index][0]]
+    if failed:
+        print("  提示: 请检查 Cookie 是否正确或已过期")
+    print("="*60 + "\n")
+
+    exit(0 if not failed else 1)
 
 
 if __name__ == '__main__':
-    main()
+    run_entry(main)
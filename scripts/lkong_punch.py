@@ -2,51 +2,238 @@
 # -*- coding: utf-8 -*-
 """
 龙空论坛自动签到脚本 - GitHub Actions版本
+
+多账号：LKONG_COOKIES 设置为 JSON 数组或每行一个 Cookie，所有账号的 DoPunch 请求
+共用一个 keep-alive 连接池并发发出，最后输出每个账号的连签统计。
+
+GraphQL 请求默认使用自动持久化查询（APQ）：发送过的查询记录在 status/lkong_apq.json，
+之后只发送查询文本的 sha256，服务端提示 PersistedQueryNotFound 或未执行查询时再带上完整查询重发。
+设置 LKONG_PERSISTED_QUERY=0 可关闭。
 """
 
 import requests
 import json
+import atexit
+import hashlib
 import os
 import sys
+import threading
+from concurrent.futures import ThreadPoolExecutor
 from datetime import datetime
+from http.cookiejar import DefaultCookiePolicy
+from pathlib import Path
 import urllib3
 
+from common.accounts import env_cookies
+from common.cli import env_flag
+from common.firing import fire_at_from_cli
+from common.http import configure_session, prewarm
+from common.logs import setup_logging
+from common.notify import report
+from common.timeouts import timeout_for
+from common.profiling import run_entry
+
 # 禁用SSL警告
 urllib3.disable_warnings(urllib3.exceptions.InsecureRequestWarning)
 
-def lkong_punch():
-    """龙空论坛签到主函数"""
-
-    # 从环境变量中读取Cookie（GitHub Secrets）
-    cookie = os.environ.get('LKONG_COOKIE')
+setup_logging()
 
-    if not cookie:
-        error_msg = "❌ 错误: 未找到LKONG_COOKIE环境变量"
-        print(error_msg)
-        print("请在GitHub Secrets中设置LKONG_COOKIE")
-        return False
+API_URL = "https://api.lkong.com/api"
+BASE_DIR = Path(__file__).resolve().parents[1]
+APQ_CACHE_FILE = BASE_DIR / "status" / "lkong_apq.json"  # 已注册 / 已被服务端接受的持久化查询
+DEFAULT_REQUEST_BODY = {
+    "operationName": "DoPunch",
+    "variables": {},
+    "query": "mutation DoPunch { punch { uid punchday isPunch punchhighestday punchallday __typename } }"
+}
 
-    url = "https://api.lkong.com/api"
 
-    # 从环境变量读取请求体（可选，提供默认值）
+def load_request_body():
+    """从环境变量读取请求体（可选，提供默认值）"""
     request_body_str = os.environ.get('LKONG_REQUEST_BODY')
 
     if request_body_str:
         try:
-            request_body = json.loads(request_body_str)
+            return json.loads(request_body_str)
         except json.JSONDecodeError:
             print("⚠️ LKONG_REQUEST_BODY格式错误，使用默认请求体")
-            request_body = {
-                "operationName": "DoPunch",
-                "variables": {},
-                "query": "mutation DoPunch { punch { uid punchday isPunch punchhighestday punchallday __typename } }"
-            }
-    else:
-        request_body = {
-            "operationName": "DoPunch",
-            "variables": {},
-            "query": "mutation DoPunch { punch { uid punchday isPunch punchhighestday punchallday __typename } }"
-        }
+    return dict(DEFAULT_REQUEST_BODY)
+
+
+def concurrency(count):
+    """并发签到的账号数，默认所有账号同时发出（上限 64）"""
+    try:
+        return max(1, int(os.environ.get('LKONG_CONCURRENCY', '') or min(count, 64)))
+    except ValueError:
+        return min(count, 64)
+
+
+def create_session(pool_size):
+    """签到用会话：所有账号共用一个 keep-alive 连接池；Cookie 由请求头逐个账号传入，不落入共享的 Cookie 罐"""
+    session = configure_session(requests.Session(), platform='lkong', pool_maxsize=pool_size)
+    session.cookies.set_policy(DefaultCookiePolicy(allowed_domains=[]))
+    return session
+
+
+class PersistedQueries:
+    """GraphQL 自动持久化查询（APQ）：优先只发送查询哈希，未注册时回退为完整查询
+
+    哈希的两个阶段:
+        registered  已带完整查询与哈希发送过一次（服务端若支持 APQ 会据此注册）
+        accepted    只发哈希的请求成功执行过，确认服务端支持
+    不支持 APQ 的服务端同样会正常执行带完整查询的请求，所以只有只发哈希成功后才算 accepted。
+    """
+
+    NOT_FOUND = 'PersistedQueryNotFound'
+    NOT_SUPPORTED = 'PersistedQueryNotSupported'
+
+    def __init__(self, path=APQ_CACHE_FILE):
+        self.path = Path(path)
+        self.enabled = env_flag('LKONG_PERSISTED_QUERY', default=True)
+        self.supported = True
+        self.registered = set()
+        self.accepted = set()
+        self._dirty = False
+        self._lock = threading.Lock()
+        self._load()
+
+    def _load(self):
+        if not self.path.exists():
+            return
+        try:
+            with self.path.open('r', encoding='utf-8') as f:
+                data = json.load(f)
+            self.supported = data.get('supported', True)
+            if 'registered' in data:
+                self.registered = set(data['registered'])
+                self.accepted = set(data.get('accepted', []))
+            else:
+                # 旧格式的 accepted 只说明完整查询成功过，需要重新确认
+                self.registered = set(data.get('accepted', []))
+        except Exception as e:
+            print(f"⚠️ 读取持久化查询缓存失败: {e}")
+
+    def save(self):
+        with self._lock:
+            if not self._dirty:
+                return
+            try:
+                self.path.parent.mkdir(parents=True, exist_ok=True)
+                with self.path.open('w', encoding='utf-8') as f:
+                    json.dump({
+                        'supported': self.supported,
+                        'registered': sorted(self.registered),
+                        'accepted': sorted(self.accepted),
+                        'update_time': datetime.now().strftime('%Y-%m-%d %H:%M:%S')
+                    }, f, ensure_ascii=False, indent=2)
+                self._dirty = False
+            except Exception as e:
+                print(f"⚠️ 保存持久化查询缓存失败: {e}")
+
+    def _mark(self, digest=None, stage=None, **changes):
+        """把 digest 移到 stage（'registered' / 'accepted' / None 表示遗忘），并更新 supported"""
+        with self._lock:
+            before = (self.supported, digest in self.registered, digest in self.accepted)
+            if digest is not None:
+                self.registered.discard(digest)
+                self.accepted.discard(digest)
+                if stage:
+                    getattr(self, stage).add(digest)
+            if 'supported' in changes:
+                self.supported = changes['supported']
+            if (self.supported, digest in self.registered, digest in self.accepted) == before:
+                return
+            if not self._dirty:
+                self._dirty = True
+                atexit.register(self.save)
+
+    @staticmethod
+    def query_hash(query):
+        return hashlib.sha256(query.encode('utf-8')).hexdigest()
+
+    @staticmethod
+    def _error_codes(response):
+        """返回响应中 GraphQL 错误的 message / extensions.code 集合"""
+        try:
+            errors = response.json().get('errors') or []
+        except (ValueError, AttributeError):
+            return set()
+        codes = set()
+        for error in errors:
+            if isinstance(error, dict):
+                codes.add(error.get('message'))
+                codes.add((error.get('extensions') or {}).get('code'))
+        return codes
+
+    @staticmethod
+    def _executed(response):
+        """服务端是否执行了查询：GraphQL 规范中，执行前就失败的请求（校验错误等）响应里没有 data"""
+        if response.status_code != 200:
+            return False
+        try:
+            return 'data' in response.json()
+        except (ValueError, AttributeError, TypeError):
+            return False
+
+    def post(self, session, request_body, **kwargs):
+        """发送 GraphQL 请求，按需使用持久化查询，返回最终的响应"""
+        query = request_body.get('query')
+        if not self.enabled or not self.supported or not query:
+            return session.post(API_URL, json=request_body, **kwargs)
+
+        digest = self.query_hash(query)
+        extensions = {**request_body.get('extensions', {}),
+                      'persistedQuery': {'version': 1, 'sha256Hash': digest}}
+        hashed_body = {key: value for key, value in request_body.items() if key != 'query'}
+        hashed_body['extensions'] = extensions
+        full_body = {**request_body, 'extensions': extensions}
+
+        with self._lock:
+            accepted = digest in self.accepted
+            known = accepted or digest in self.registered
+        if not known:
+            # 还没发送过这个查询：直接带完整查询与哈希发送，顺便完成注册，不多花一次往返
+            response = session.post(API_URL, json=full_body, **kwargs)
+            codes = self._error_codes(response)
+            if self.NOT_SUPPORTED in codes or 'PERSISTED_QUERY_NOT_SUPPORTED' in codes:
+                self._mark(supported=False)
+                return session.post(API_URL, json=request_body, **kwargs)
+            if self._executed(response):
+                self._mark(digest, 'registered')
+            return response
+
+        response = session.post(API_URL, json=hashed_body, **kwargs)
+        codes = self._error_codes(response)
+        if self.NOT_FOUND in codes or 'PERSISTED_QUERY_NOT_FOUND' in codes:
+            # 服务端的哈希缓存已失效：带上完整查询重发，服务端据此重新注册
+            self._mark(digest, 'registered')
+            return session.post(API_URL, json=full_body, **kwargs)
+        if self.NOT_SUPPORTED in codes or 'PERSISTED_QUERY_NOT_SUPPORTED' in codes:
+            print("⚠️ 服务端不支持持久化查询，之后改为发送完整查询")
+            self._mark(digest, supported=False)
+            return session.post(API_URL, json=request_body, **kwargs)
+        if not self._executed(response):
+            # 查询没有执行（如 "Must provide query string" 或 HTTP 400），签到尚未发生，可以安全地带完整查询重发
+            if accepted:
+                print("⚠️ 服务端不再接受查询哈希，带完整查询重发并重新注册")
+                self._mark(digest, 'registered')
+                return session.post(API_URL, json=full_body, **kwargs)
+            print("⚠️ 服务端忽略了持久化查询，之后改为发送完整查询")
+            self._mark(digest, supported=False)
+            return session.post(API_URL, json=request_body, **kwargs)
+
+        # 其他结果（包括“今天已签到”等业务错误）说明服务端已经执行了查询，签到是 mutation，不能重发
+        self._mark(digest, 'accepted')
+        return response
+
+
+persisted_queries = PersistedQueries()
+
+
+def lkong_punch(cookie, session, request_body, label='', fire=None):
+    """龙空论坛单个账号签到，返回结果字典"""
+    prefix = f"[{label}] " if label else ''
+    result = {'account': label, 'success': False, 'message': ''}
 
     headers = {
         "Cookie": cookie,
@@ -60,23 +247,20 @@ def lkong_punch():
         "Sec-Fetch-Dest": "empty"
     }
 
-    print("=" * 60)
-    print(f"🚀 龙空论坛自动签到 - {datetime.now().strftime('%Y-%m-%d %H:%M:%S')}")
-    print("=" * 60)
-    print(f"📡 目标地址: {url}")
-    print("📦 Cookie: 已配置")
-
     try:
-        response = requests.post(
-            url,
-            json=request_body,
+        if fire:
+            # 定点发射：连接已预热，等到目标时刻再发出 DoPunch
+            fire.fire(label)
+        response = persisted_queries.post(
+            session,
+            request_body,
             headers=headers,
-            timeout=30,
+            timeout=timeout_for(API_URL, (10, 30)),
             verify=False,
             allow_redirects=True
         )
 
-        print(f"📊 HTTP状态码: {response.status_code}")
+        print(f"{prefix}📊 HTTP状态码: {response.status_code}")
 
         if response.status_code == 200:
             try:
@@ -88,71 +272,116 @@ def lkong_punch():
                     punch_data = data["data"]["punch"]
 
                     is_punch = punch_data.get("isPunch", False)
-                    punch_day = punch_data.get("punchday", 0)
-                    highest_day = punch_data.get("punchhighestday", 0)
-                    all_day = punch_data.get("punchallday", 0)
+                    result.update({
+                        'punchday': punch_data.get("punchday", 0),
+                        'punchhighestday': punch_data.get("punchhighestday", 0),
+                        'punchallday': punch_data.get("punchallday", 0),
+                    })
 
                     if is_punch:
-                        success_msg = f"签到成功！已连签{punch_day}天"
-                        print(f"🎉 {success_msg}")
-                        print(f"📅 连续签到: {punch_day} 天")
-                        print(f"🏆 最高连签: {highest_day} 天")
-                        print(f"📊 总签到数: {all_day} 天")
-
-                        return True
+                        result['message'] = f"签到成功！已连签{result['punchday']}天"
+                        print(f"{prefix}🎉 {result['message']}")
                     else:
                         # isPunch为false可能表示今天已经签到过了
-                        msg = f"签到状态未知 (isPunch=false), 连签{punch_day}天"
-                        print(f"⚠️ {msg}")
-                        # 也记录为成功，因为可能已经签到过了
-                        return True
+                        result['message'] = f"签到状态未知 (isPunch=false), 连签{result['punchday']}天"
+                        print(f"{prefix}⚠️ {result['message']}")
+                    # 也记录为成功，因为可能已经签到过了
+                    result['success'] = True
+                    return result
 
                 elif data.get("errors"):
                     # GraphQL错误
-                    error_msg = f"GraphQL错误，数量: {len(data['errors'])}"
-                    print(f"❌ {error_msg}")
-                    return False
+                    result['message'] = f"GraphQL错误，数量: {len(data['errors'])}"
                 else:
-                    error_msg = f"响应格式异常，字段: {list(data.keys())}"
-                    print(f"❌ {error_msg}")
-                    return False
+                    result['message'] = f"响应格式异常，字段: {list(data.keys())}"
 
             except json.JSONDecodeError as e:
-                error_msg = f"JSON解析失败，响应长度: {len(response.text)}"
-                print(f"❌ {error_msg}")
-                return False
+                result['message'] = f"JSON解析失败，响应长度: {len(response.text)}"
         else:
-            error_msg = f"HTTP {response.status_code}，响应长度: {len(response.text)}"
-            print(f"❌ {error_msg}")
-            return False
+            result['message'] = f"HTTP {response.status_code}，响应长度: {len(response.text)}"
 
     except requests.exceptions.Timeout:
-        error_msg = "请求超时"
-        print(f"❌ {error_msg}")
-        return False
+        result['message'] = "请求超时"
 
     except requests.exceptions.ConnectionError as e:
-        error_msg = f"网络连接失败: {str(e)[:100]}"
-        print(f"❌ {error_msg}")
-        return False
+        result['message'] = f"网络连接失败: {str(e)[:100]}"
 
     except Exception as e:
-        error_msg = f"未知错误: {type(e).__name__} - {str(e)[:100]}"
-        print(f"❌ {error_msg}")
-        return False
+        result['message'] = f"未知错误: {type(e).__name__} - {str(e)[:100]}"
+
+    print(f"{prefix}❌ {result['message']}")
+    return result
+
+
+def mask_cookie(cookie):
+    """对Cookie进行脱敏处理"""
+    if len(cookie) <= 20:
+        return "***"
+    return f"{cookie[:10]}...{cookie[-10:]}"
+
 
 def main():
     """主函数"""
-    # 执行签到
-    success = lkong_punch()
+    # 从环境变量中读取Cookie（GitHub Secrets）
+    cookies = env_cookies('LKONG_COOKIE', 'LKONG_COOKIES', label='龙空账号')
+
+    if not cookies:
+        print("❌ 错误: 未找到LKONG_COOKIE环境变量")
+        print("请在GitHub Secrets中设置LKONG_COOKIE（多账号可用LKONG_COOKIES，JSON数组或每行一个）")
+        sys.exit(1)
+
+    request_body = load_request_body()
+    workers = min(concurrency(len(cookies)), len(cookies))
+    fire = fire_at_from_cli()
+    if fire:
+        workers = fire.workers(len(cookies), workers)
+
+    print("=" * 60)
+    print(f"🚀 龙空论坛自动签到 - {datetime.now().strftime('%Y-%m-%d %H:%M:%S')}")
+    print("=" * 60)
+    print(f"📡 目标地址: {API_URL}")
+    print(f"📦 Cookie: 已配置 {len(cookies)} 个账号，并发 {workers}")
+
+    # 执行签到：所有账号共用一个连接池，DoPunch 请求同时发出
+    session = create_session(workers)
+    try:
+        if fire:
+            # 定点发射：到提前量时为每个并发账号预热一个连接
+            fire.wait_prepare()
+            try:
+                timings = prewarm(session, API_URL, connections=workers, verify=False)
+                if timings:
+                    print(f"🔥 连接预热完成: 新建 {timings['opened']} 个连接，TCP+TLS {timings['connect'] * 1000:.0f} ms")
+            except Exception as e:
+                print(f"⚠️ 连接预热失败: {type(e).__name__}: {e}")
+        with ThreadPoolExecutor(max_workers=workers, thread_name_prefix='lkong') as pool:
+            labels = [mask_cookie(cookie) if len(cookies) > 1 else '' for cookie in cookies]
+            results = list(pool.map(
+                lambda args: lkong_punch(args[0], session, request_body, args[1], fire),
+                zip(cookies, labels)
+            ))
+    finally:
+        session.close()
+    if fire:
+        fire.report()
+
+    success_count = sum(1 for item in results if item['success'])
+
+    print("=" * 60)
+    print(f"{'账号':<24} {'结果':<4} {'连签':>6} {'最高连签':>8} {'总签到':>6}")
+    for cookie, item in zip(cookies, results):
+        mark = '✅' if item['success'] else '❌'
+        print(f"{mask_cookie(cookie):<24} {mark:<4} {item.get('punchday', '-'):>6} "
+              f"{item.get('punchhighestday', '-'):>8} {item.get('punchallday', '-'):>6}")
+        report('龙空论坛', item['success'], f"{mask_cookie(cookie)} {item['message']}" if len(cookies) > 1 else item['message'])
 
     print("=" * 60)
-    if success:
+    if success_count == len(results):
         print("✅ 签到任务完成")
         sys.exit(0)
     else:
-        print("❌ 签到任务失败")
+        print(f"❌ 签到任务失败（成功 {success_count}/{len(results)}）")
         sys.exit(1)  # 退出码1表示失败
 
 if __name__ == "__main__":
-    main()
+    run_entry(main)
@@ -0,0 +1,74 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+合并分片签到结果
+
+各分片以 `--shard i/n` 运行后会写出 results/<平台>-shard-<i>of<n>.json，
+本脚本汇总同一平台全部分片的结果，打印总结并给出统一退出码:
+    python scripts/merge_shards.py sxsy
+    python scripts/merge_shards.py yuchen --dir downloaded-artifacts
+缺少任一分片、任一账号失败或没有成功账号时退出码为 1。
+"""
+
+import sys
+import json
+import logging
+import argparse
+from pathlib import Path
+
+from common.logs import setup_logging
+from common.sharding import RESULTS_DIR
+
+setup_logging()
+log = logging.getLogger(__name__)
+
+
+def main():
+    parser = argparse.ArgumentParser(description='合并分片签到结果')
+    parser.add_argument('platform', help='平台名，如 sxsy / yuchen')
+    parser.add_argument('--dir', type=Path, default=RESULTS_DIR, help='分片结果所在目录（会递归查找）')
+    args = parser.parse_args()
+
+    files = sorted(args.dir.rglob(f"{args.platform}-shard-*of*.json"))
+    if not files:
+        log.error(f"❌ 未找到 {args.platform} 的分片结果: {args.dir}")
+        sys.exit(1)
+
+    shards = {}
+    totals = set()
+    for path in files:
+        with path.open('r', encoding='utf-8') as f:
+            data = json.load(f)
+        index, total = data['shard']
+        shards[index] = data
+        totals.add(total)
+
+    if len(totals) != 1:
+        log.error(f"❌ 分片总数不一致: {sorted(totals)}")
+        sys.exit(1)
+    total = totals.pop()
+    missing = [i for i in range(1, total + 1) if i not in shards]
+
+    success_count = sum(data['success'] for data in shards.values())
+    fail_count = sum(data['fail'] for data in shards.values())
+
+    log.info(f"{'='*60}")
+    log.info(f"📊 {args.platform} 分片结果汇总 ({len(shards)}/{total} 片)")
+    for index in sorted(shards):
+        data = shards[index]
+        log.info(f"   - 第 {index} 片: 成功 {data['success']}，失败 {data['fail']} ({data.get('finish_time', '')})")
+        for item in data['results']:
+            if not item.get('success'):
+                log.error(f"     ❌ {item.get('account', 'unknown')}: {item.get('message', '')}")
+    if missing:
+        log.error(f"   - 缺少分片: {missing}")
+    log.info(f"   - 合计成功: {success_count} 个账号")
+    log.info(f"   - 合计失败: {fail_count} 个账号")
+    log.info(f"{'='*60}")
+
+    all_success = (not missing and fail_count == 0 and success_count > 0)
+    sys.exit(0 if all_success else 1)
+
+
+if __name__ == '__main__':
+    main()
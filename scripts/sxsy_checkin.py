@@ -12,18 +12,33 @@ import json
 import random
 import logging
 import re
+import threading
 import warnings
+from itertools import chain
 import requests
 import urllib3
 from datetime import datetime
 from pathlib import Path
 from bs4 import BeautifulSoup, XMLParsedAsHTMLWarning
-from typing import Optional, Dict, List
-from requests.adapters import HTTPAdapter
-from urllib3.util.retry import Retry
+from typing import Optional, Dict, Iterator
 from io import BytesIO
 from urllib.parse import urljoin, unquote, urlparse
 
+from common.accounts import iter_accounts, iter_json_lines
+from common.breaker import CircuitBreaker
+from common.checkpoint import Checkpoint
+from common.firing import FireAt, fire_at_from_cli
+from common.cloudflare import CloudflareChallenge
+from common.http import configure_session
+from common.logs import setup_logging
+from common.metrics import OCR_BUCKETS, registry as metrics
+from common.retry import BudgetedRetry
+from common.runner import pending_accounts, report_results, run_accounts
+from common.scheduler import window_from_cli
+from common.sharding import select_shard, shard_from_cli, write_shard_result
+from common.timeouts import timeout_for
+from common.profiling import run_entry
+
 # 尝试导入OCR相关库（可选）
 try:
     from PIL import Image
@@ -45,13 +60,7 @@ STATUS_DIR = BASE_DIR / "status"
 LOCAL_RELEASE_DIR = BASE_DIR / "gt"
 
 # ==================== 日志配置 ====================
-logging.basicConfig(
-    level=logging.INFO,
-    format='%(asctime)s - %(levelname)s - %(message)s',
-    handlers=[
-        logging.StreamHandler(sys.stdout)
-    ]
-)
+setup_logging()
 log = logging.getLogger(__name__)
 
 # ==================== 配置常量 ====================
@@ -142,7 +151,8 @@ def extract_domain_from_image_bytes(image_bytes: bytes, source: str) -> Optional
 
         config = '--psm 7 -c tessedit_char_whitelist=sxsySXSY0123456789.comCOM'
         for variant in variants:
-            text = pytesseract.image_to_string(variant, lang='eng', config=config)
+            with metrics.timer('checkin_ocr_duration_seconds', OCR_BUCKETS):
+                text = pytesseract.image_to_string(variant, lang='eng', config=config)
             log.debug(f"OCR识别结果({source}): {text}")
             domain = domain_from_text(text, f"图片OCR({source})")
             if domain:
@@ -160,7 +170,7 @@ def extract_domain_from_image_url(img_url: str, session: requests.Session) -> Op
     """下载线上图片并识别域名。"""
     try:
         log.info(f"🖼️ 尝试从线上图片提取域名: {img_url}")
-        response = session.get(img_url, timeout=20, verify=False)
+        response = session.get(img_url, timeout=timeout_for(img_url, (10, 20)), verify=False)
         response.raise_for_status()
         return extract_domain_from_image_bytes(response.content, img_url)
     except Exception as e:
@@ -277,12 +287,12 @@ def fetch_latest_domain_from_release_page() -> Optional[str]:
     log.info(f"🔍 正在从发布页获取最新域名: {RELEASE_PAGE_URL}")
 
     try:
-        session = requests.Session()
+        session = configure_session(requests.Session())
         session.verify = False
 
         response = session.get(
             RELEASE_PAGE_URL,
-            timeout=30,
+            timeout=timeout_for(RELEASE_PAGE_URL, (10, 30)),
             headers={
                 'User-Agent': 'Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36'
             }
@@ -331,7 +341,7 @@ def test_domain_availability(domain: str) -> bool:
         url = f"https://{domain}"
         response = requests.get(
             url,
-            timeout=10,
+            timeout=timeout_for(url, (5, 10)),
             verify=False,
             allow_redirects=True,
             headers={'User-Agent': 'Mozilla/5.0'}
@@ -360,6 +370,11 @@ def mask_cookie(cookie: str) -> str:
         return "***"
     return f"{cookie[:10]}...{cookie[-10:]}"
 
+def cookie_identity(account: Dict[str, str]) -> str:
+    """账号标识：规范化空白后的 Cookie，用于去重和分片"""
+    cookie = account.get('cookie', '')
+    return '; '.join(part.strip() for part in cookie.split(';') if part.strip())
+
 def solve_arithmetic(text: str) -> Optional[str]:
     """解析并计算算术验证题"""
     match = re.search(r'(-?\d+)\s*([+\-xX*/])\s*(-?\d+)\s*=', text)
@@ -393,43 +408,77 @@ class Config:
     """从环境变量读取配置"""
 
     @staticmethod
-    def get_accounts() -> List[Dict[str, str]]:
-        """从环境变量读取账号配置（支持多账号）"""
-        accounts = []
-
+    def _env_accounts() -> Iterator[Dict[str, str]]:
+        """方式1 + 方式2: 环境变量中的单账号与 JSON 数组"""
         # 方式1: 单账号配置（使用Cookie）
         cookie = os.getenv('SXSY_COOKIE', '').strip()
         if cookie:
-            accounts.append({
+            log.info(f"✅ 从环境变量读取到 1 个账号")
+            yield {
                 'cookie': cookie,
                 'user_agent': os.getenv('USER_AGENT',
                     'Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36 (KHTML, like Gecko) Chrome/140.0.0.0 Safari/537.36')
-            })
-            log.info(f"✅ 从环境变量读取到 1 个账号")
+            }
 
         # 方式2: 多账号配置（使用JSON格式）
         accounts_json = os.getenv('SXSY_ACCOUNTS', '').strip()
         if accounts_json:
             try:
                 multi_accounts = json.loads(accounts_json)
-                accounts.extend(multi_accounts)
-                log.info(f"✅ 从SXSY_ACCOUNTS读取到 {len(multi_accounts)} 个账号")
             except json.JSONDecodeError:
                 log.warning("⚠️ SXSY_ACCOUNTS格式错误，已忽略")
+                return
+            if not isinstance(multi_accounts, list):
+                log.warning("⚠️ SXSY_ACCOUNTS应为JSON数组，已忽略")
+                return
+            log.info(f"✅ 从SXSY_ACCOUNTS读取到 {len(multi_accounts)} 个账号")
+            yield from multi_accounts
 
-        if not accounts:
-            log.error("❌ 未检测到任何账号配置！")
-            log.info("配置方式1: 设置 SXSY_COOKIE")
-            log.info("配置方式2: 设置 SXSY_ACCOUNTS (JSON数组)")
+    @staticmethod
+    def _file_accounts() -> Iterator[Dict[str, str]]:
+        """方式3: SXSY_ACCOUNTS_FILE 指向的 JSONL 文件（可 gzip 压缩），按行惰性读取"""
+        path = os.getenv('SXSY_ACCOUNTS_FILE', '').strip()
+        if not path:
+            return
+        if not Path(path).exists():
+            log.warning(f"⚠️ 账号文件不存在，已忽略: {path}")
+            return
+        log.info(f"✅ 从账号文件读取账号: {path}")
+        yield from iter_json_lines(Path(path), 'SXSY_ACCOUNTS_FILE')
 
-        return accounts
+    @staticmethod
+    def iter_accounts() -> Iterator[Dict[str, str]]:
+        """惰性产出全部账号，边读边校验，同一 Cookie 只保留第一次出现的配置"""
+        return iter_accounts(
+            (Config._env_accounts(), Config._file_accounts()),
+            identity=cookie_identity,
+            required=('cookie',),
+            label='账号'
+        )
+
+    @staticmethod
+    def log_usage() -> None:
+        log.error("❌ 未检测到任何账号配置！")
+        log.info("配置方式1: 设置 SXSY_COOKIE")
+        log.info("配置方式2: 设置 SXSY_ACCOUNTS (JSON数组)")
+        log.info("配置方式3: 设置 SXSY_ACCOUNTS_FILE (JSONL 文件路径，支持 .gz)")
+
+
+def retry_strategy() -> BudgetedRetry:
+    """签到请求的重试策略"""
+    return BudgetedRetry(
+        total=3,
+        backoff_factor=1,
+        status_forcelist=[429, 500, 502, 503, 504]
+    )
 
 
 # ==================== 主业务类 ====================
 class SXSYCheckin:
     """尚香书苑签到类"""
 
-    def __init__(self, domain: str = None, **kwargs):
+    def __init__(self, domain: str = None, breaker: Optional[CircuitBreaker] = None,
+                 session: Optional[requests.Session] = None, fire: Optional[FireAt] = None, **kwargs):
         self.domain: str = (domain or DEFAULT_DOMAIN).strip().lower()
         self.base_url: str = f"https://{self.domain}"
         self.cookie: str = kwargs.get('cookie', '')
@@ -442,20 +491,18 @@ class SXSYCheckin:
         self.formhash = ""
         self.math_verify = ""
         self.domain_changed = False
+        self.blocked = False
 
-        # 创建session并配置
-        self.session = requests.session()
+        # 多账号时由 main 传入共用连接池上的会话（只持有本账号的 Cookie），单独使用时自建
+        self.session = session or configure_session(requests.Session(), retries=retry_strategy(), platform='sxsy')
         self.session.verify = False
+        # 定点发射：取到 formhash 后等到目标时刻再发签到请求
+        self.fire = fire
 
-        # 配置重试策略
-        retry_strategy = Retry(
-            total=3,
-            backoff_factor=1,
-            status_forcelist=[429, 500, 502, 503, 504]
-        )
-        adapter = HTTPAdapter(max_retries=retry_strategy)
-        self.session.mount("https://", adapter)
-        self.session.mount("http://", adapter)
+        # 被拦截（403 / Cloudflare 质询）的响应计入熔断器
+        self.breaker = breaker
+        if self.breaker:
+            self.breaker.attach(self.session)
 
         # 设置Cookie
         if self.cookie:
@@ -503,7 +550,7 @@ class SXSYCheckin:
             response = self.session.get(
                 url=url,
                 headers=self.headers(),
-                timeout=30,
+                timeout=timeout_for(url, (10, 30)),
                 verify=False,
                 allow_redirects=True
             )
@@ -541,6 +588,13 @@ class SXSYCheckin:
 
             return True
 
+        except CloudflareChallenge as e:
+            self.blocked = True
+            self.signin_message = f"被 Cloudflare 质询拦截: {e}"
+            log.error(f"❌ 签到页被 Cloudflare 质询拦截，当前出口 IP 不受信任: {e}")
+            if self.breaker:
+                self.breaker.record_blocked(f"Cloudflare 质询: {e}")
+            return False
         except requests.exceptions.RequestException as e:
             self.signin_message = f"访问签到页面失败: {e}"
             log.error(f"访问签到页面失败: {e}")
@@ -575,7 +629,7 @@ class SXSYCheckin:
                 url=url,
                 params=params,
                 headers=self.headers(),
-                timeout=30,
+                timeout=timeout_for(url, (10, 30)),
                 verify=False
             )
             response.raise_for_status()
@@ -620,6 +674,13 @@ class SXSYCheckin:
                     self.signin_message = "签到响应异常"
                     log.warning(f"⚠️ 签到响应异常，响应长度: {len(response_text)}")
 
+        except CloudflareChallenge as e:
+            self.blocked = True
+            self.signin_success = False
+            self.signin_message = f"被 Cloudflare 质询拦截: {e}"
+            log.error(f"❌ 签到请求被 Cloudflare 质询拦截: {e}")
+            if self.breaker:
+                self.breaker.record_blocked(f"Cloudflare 质询: {e}")
         except Exception as e:
             self.signin_success = False
             self.signin_message = f"签到请求失败: {type(e).__name__}"
@@ -640,11 +701,16 @@ class SXSYCheckin:
 
         # 第一次尝试：使用当前域名
         if self.get_sign_page():
-            sleep_random(2, 4)
+            if self.fire:
+                self.fire.fire(mask_cookie(self.cookie))
+            else:
+                sleep_random(2, 4)
             self.do_checkin()
 
-        # 如果第一次失败，尝试更新域名后重试
-        if not self.signin_success:
+        # 如果第一次失败，尝试更新域名后重试（出口 IP 被拦截时换域名也无济于事）
+        if not self.signin_success and (self.blocked or (self.breaker and self.breaker.is_open)):
+            log.warning("🔌 当前出口已被拦截，跳过域名刷新重试")
+        elif not self.signin_success:
             log.warning("⚠️ 签到失败，尝试获取最新域名后重试")
             new_domain = refresh_domain_after_failure(self.domain)
 
@@ -690,49 +756,90 @@ def main():
     working_domain = get_working_domain()
     log.info(f"🌐 当前使用域名: {working_domain}")
 
-    # 获取账号配置
-    accounts = Config.get_accounts()
-
-    if not accounts:
-        log.error("❌ 未配置任何账号！")
+    # 分片模式下只处理属于本分片的账号（按 Cookie 哈希稳定分配）
+    shard = shard_from_cli()
+    window = window_from_cli()
+    fire = fire_at_from_cli()
+
+    # 获取账号配置（惰性读取，边读边签到）；今天已确认签到（重跑）的账号不发任何请求
+    accounts = select_shard(Config.iter_accounts(), shard, identity=cookie_identity)
+    results = {}
+    checkpoint = Checkpoint('sxsy')
+    pending = pending_accounts(accounts, checkpoint, cookie_identity,
+                               lambda account: mask_cookie(account.get('cookie', '')), results)
+    first = next(pending, None)
+
+    # 出口被拦截且仍在冷却期内时直接跳过，不再耗费超时与重试；没有待签到账号时不探测
+    breaker = CircuitBreaker('sxsy')
+    if first is not None and not breaker.allow(f"https://{working_domain}/"):
+        log.error("❌ 尚香书苑在当前出口处于熔断状态，跳过本次签到")
         sys.exit(1)
 
-    log.info(f"检测到 {len(accounts)} 个账号\n")
-
     # 执行签到
-    success_count = 0
-    fail_count = 0
+    state = {'domain': working_domain}
+    state_lock = threading.Lock()
+
+    def check_in(task, session) -> None:
+        i, account_config = task
+        masked_cookie = mask_cookie(account_config.get('cookie', ''))
+        if breaker.is_open:
+            # 熔断后剩余账号只计数，不再发请求
+            results[i] = {'account': masked_cookie, 'success': False, 'message': '熔断跳过'}
+            return
 
-    for i, account_config in enumerate(accounts, 1):
         log.info(f"\n{'='*60}")
-        log.info(f"📱 账号 {i}/{len(accounts)} 开始执行")
+        log.info(f"📱 账号 {i} 开始执行")
         log.info(f"{'='*60}")
 
         try:
-            sxsy = SXSYCheckin(domain=working_domain, **account_config)
+            with state_lock:
+                domain = state['domain']
+            sxsy = SXSYCheckin(domain=domain, breaker=breaker, session=session, fire=fire, **account_config)
             result = sxsy.run()
 
             if result.get('domain_changed'):
-                working_domain = sxsy.domain
-                log.info(f"🔄 后续账号将使用新域名: {working_domain}")
+                with state_lock:
+                    state['domain'] = sxsy.domain
+                log.info(f"🔄 后续账号将使用新域名: {sxsy.domain}")
                 # 仅当切换到的新域名签到成功时，才持久化为新的默认域名（次日生效）
                 if result['success']:
-                    save_domain_cache(working_domain, source="verified")
+                    save_domain_cache(sxsy.domain, source="verified")
 
             if result['success']:
-                success_count += 1
+                checkpoint.mark_done(cookie_identity(account_config), result['message'])
                 log.info(f"✅ 账号 {i} 签到成功")
             else:
-                fail_count += 1
                 log.error(f"❌ 账号 {i} 签到失败: {result['message']}")
-
-            # 账号间延迟
-            if i < len(accounts):
-                sleep_random(5, 10)
+            results[i] = {'account': masked_cookie, 'success': result['success'], 'message': result['message']}
 
         except Exception as e:
-            fail_count += 1
             log.error(f"❌ 账号 {i} 执行异常: {e}", exc_info=True)
+            results[i] = {'account': masked_cookie, 'success': False, 'message': f"执行异常: {e}"}
+
+    if first is not None:
+        run_accounts(chain([first], pending), check_in, 'sxsy',
+                     retries=retry_strategy(), window=window, fire=fire)
+
+    working_domain = state['domain']
+    results = report_results('尚香书苑', results)
+    success_count = sum(1 for item in results if item['success'])
+    fail_count = len(results) - success_count
+    skipped = sum(1 for item in results if item['message'] == '熔断跳过')
+
+    breaker.save()
+    if skipped:
+        log.error(f"🔌 熔断器已打开，跳过了剩余 {skipped} 个账号")
+
+    if not results:
+        if shard:
+            log.info("🧩 本分片没有分到账号")
+            write_shard_result('sxsy', shard, results)
+            sys.exit(0)
+        Config.log_usage()
+        sys.exit(1)
+
+    if shard:
+        write_shard_result('sxsy', shard, results, {'domain': working_domain})
 
     # 总结
     log.info(f"\n{'='*60}")
@@ -749,4 +856,4 @@ def main():
 
 
 if __name__ == '__main__':
-    main()
+    run_entry(main)
@@ -2,18 +2,53 @@
 # -*- coding: utf-8 -*-
 """
 微信小程序自动签到脚本 - GitHub Actions版
+
+支持多账号：除 CHECKIN_TOKEN / APP_ID 外，可用 XINGCHENG_ACCOUNTS（JSON 数组）
+或 XINGCHENG_ACCOUNTS_FILE（JSONL 文件）配置多个 {"token": "...", "app_id": "..."}，
+所有账号共用一个 keep-alive 连接池并发签到，最后汇总积分与优惠券。
+
+活动/店铺代码缓存在 status/xingcheng_activity.json 中（默认 7 天有效），
+设置了 XINGCHENG_ACTIVITY_PATH 时，签到接口提示活动不存在或已结束会重新获取并在本次运行内重试。
+XINGCHENG_ACTIVITY_CODE / XINGCHENG_SHOP_CODE 优先于缓存，设置后不读写缓存、不自动获取。
 """
 
 import os
 import sys
 import requests
 import json
-from datetime import datetime
+import threading
+from datetime import datetime, timedelta
+from http.cookiejar import DefaultCookiePolicy
+from pathlib import Path
+from typing import Dict, Iterator, Optional, Tuple
 import urllib3
 
+from common.accounts import iter_accounts, iter_json_lines
+from common.firing import fire_at_from_cli
+from common.http import configure_session, prewarm
+from common.logs import setup_logging
+from common.notify import report
+from common.scheduler import Scheduler, window_from_cli
+from common.timeouts import timeout_for
+from common.profiling import run_entry
+
 # 禁用SSL警告
 urllib3.disable_warnings(urllib3.exceptions.InsecureRequestWarning)
 
+setup_logging()
+
+BASE_DIR = Path(__file__).resolve().parents[1]
+ACTIVITY_CACHE_FILE = BASE_DIR / "status" / "xingcheng_activity.json"  # 活动信息缓存
+API_BASE = "https://api.lzstack.com"
+CHECKIN_PATH = "/mall/v2/api/checkin/handler"
+# 获取活动列表的接口没有内置默认值（尚未抓包确认），只在设置了 XINGCHENG_ACTIVITY_PATH 时自动获取
+ACTIVITY_PATH_ENV = 'XINGCHENG_ACTIVITY_PATH'
+# 签到接口返回这些提示时，视为缓存的活动已经失效
+# 注意：这些提示语是按常见写法推测的，未经实际响应验证；匹配不到时只是不触发自动获取
+ACTIVITY_ERROR_MARKERS = ('活动不存在', '活动已结束', '活动未开始', '活动已下架', '活动已失效', '无此活动', '活动信息不存在')
+
+Activity = Tuple[str, str]
+
 
 class Logger:
     """自定义日志类"""
@@ -34,15 +69,150 @@ class Logger:
         print(f"❌ {datetime.now().strftime('%Y-%m-%d %H:%M:%S')} [ERROR] {msg}")
 
 
+def find_activity(data) -> Optional[Activity]:
+    """在接口返回的数据中查找第一个同时带有 code 与 shopCode 的活动"""
+    if isinstance(data, dict):
+        code, shop_code = data.get('code'), data.get('shopCode')
+        if isinstance(code, str) and isinstance(shop_code, str) and code and shop_code:
+            return code, shop_code
+        data = list(data.values())
+    if isinstance(data, list):
+        for item in data:
+            found = find_activity(item)
+            if found:
+                return found
+    return None
+
+
+def is_activity_error(message: str) -> bool:
+    return any(marker in (message or '') for marker in ACTIVITY_ERROR_MARKERS)
+
+
+class ActivityCache:
+    """活动/店铺代码缓存，多账号并发时只重新获取一次"""
+
+    def __init__(self, path: Path = ACTIVITY_CACHE_FILE):
+        self.path = Path(path)
+        self._lock = threading.Lock()
+        self.reload()
+
+    def reload(self) -> None:
+        """重新读取配置与缓存文件（常驻进程中每次运行前的状态与刚启动时一致）"""
+        try:
+            self.ttl = timedelta(hours=float(os.getenv('XINGCHENG_ACTIVITY_TTL_HOURS', '') or 168))
+        except ValueError:
+            self.ttl = timedelta(hours=168)
+        self.discovery_path = os.getenv(ACTIVITY_PATH_ENV, '').strip() or None
+        code = os.getenv('XINGCHENG_ACTIVITY_CODE', '').strip()
+        shop_code = os.getenv('XINGCHENG_SHOP_CODE', '').strip()
+        # 手动指定的活动优先于缓存，否则活动轮换后改环境变量不会生效
+        self.pinned = bool(code or shop_code)
+        self.default = (code or MiniProgramCheckin.ACTIVITY_CODE, shop_code or MiniProgramCheckin.SHOP_CODE)
+        self.activity: Optional[Activity] = None
+        self.expired = False
+        if not self.pinned:
+            self._load()
+
+    def _load(self) -> None:
+        if not self.path.exists():
+            return
+        try:
+            with self.path.open('r', encoding='utf-8') as f:
+                data = json.load(f)
+            self.activity = (data['activity_code'], data['shop_code'])
+            update_time = datetime.strptime(data['update_time'], '%Y-%m-%d %H:%M:%S')
+            self.expired = datetime.now() - update_time > self.ttl
+        except Exception as e:
+            Logger.warning(f"读取活动缓存失败: {e}")
+
+    def _save(self, activity: Activity) -> None:
+        try:
+            self.path.parent.mkdir(parents=True, exist_ok=True)
+            with self.path.open('w', encoding='utf-8') as f:
+                json.dump({
+                    'activity_code': activity[0],
+                    'shop_code': activity[1],
+                    'update_time': datetime.now().strftime('%Y-%m-%d %H:%M:%S')
+                }, f, ensure_ascii=False, indent=2)
+        except Exception as e:
+            Logger.warning(f"保存活动缓存失败: {e}")
+
+    def _discover(self, checkin: 'MiniProgramCheckin') -> Optional[Activity]:
+        if not self.discovery_path:
+            Logger.warning(f"未设置 {ACTIVITY_PATH_ENV}，无法自动获取活动信息，"
+                           f"请用 XINGCHENG_ACTIVITY_CODE / XINGCHENG_SHOP_CODE 指定新活动")
+            return None
+        url = f"{checkin.base_url}{self.discovery_path}"
+        try:
+            response = checkin.session.post(
+                url,
+                headers=checkin.headers,
+                json={"shopCode": (self.activity or self.default)[1]},
+                timeout=timeout_for(url, (5, 15)),
+                verify=False
+            )
+            result = response.json()
+        except Exception as e:
+            Logger.warning(f"获取活动信息失败: {type(e).__name__}")
+            return None
+
+        activity = find_activity(result.get('data'))
+        if not activity:
+            Logger.warning(f"活动信息中没有找到可用活动: {result.get('message', '')}")
+            return None
+        Logger.info(f"🔍 获取到活动: {activity[0]}（店铺 {activity[1]}）")
+        self._save(activity)
+        self.activity, self.expired = activity, False
+        return activity
+
+    def current(self, checkin: 'MiniProgramCheckin') -> Activity:
+        """当前使用的活动；缓存过期时重新获取，获取失败则沿用旧值"""
+        with self._lock:
+            if self.pinned:
+                return self.default
+            if self.expired and self.discovery_path:
+                Logger.info("活动缓存已过期，重新获取活动信息")
+                self._discover(checkin)
+                # 获取失败时本次运行不再重复尝试
+                self.expired = False
+            return self.activity or self.default
+
+    def confirm(self, activity: Activity) -> None:
+        """签到成功后，把尚未缓存的默认活动写入缓存"""
+        with self._lock:
+            if self.activity is None and not self.pinned:
+                self.activity = activity
+                self._save(activity)
+
+    def refresh(self, checkin: 'MiniProgramCheckin', stale: Activity) -> Optional[Activity]:
+        """签到提示活动失效时重新获取；其他账号已经刷新过则直接返回新活动"""
+        with self._lock:
+            if self.pinned:
+                Logger.warning("活动由 XINGCHENG_ACTIVITY_CODE / XINGCHENG_SHOP_CODE 指定，不自动获取，请更新环境变量")
+                return None
+            current = self.activity or self.default
+            if current != stale:
+                return current
+            return self._discover(checkin)
+
+
 class MiniProgramCheckin:
     # 🔥 硬编码配置区域 - 根据你的小程序修改这里
     ACTIVITY_CODE = "P151750060991850814"  # 活动代码 响应中的"code"
     SHOP_CODE = "SC1008011"                # 店铺代码 响应中的"shopCode"
 
-    def __init__(self, token, app_id):
-        self.base_url = "https://api.lzstack.com"
+    def __init__(self, token, app_id, session=None, label='', activity=None, fire=None):
+        self.base_url = API_BASE
+        # 定点发射：签到请求等到目标时刻再发出
+        self.fire = fire
         self.token = token
         self.app_id = app_id
+        # 多账号时传入共用的会话，复用同一个连接池
+        self.session = session or create_session()
+        self.label = f"[{label}] " if label else ''
+        self.integral = 0
+        self.coupons = []
+        self.activity = activity or activity_cache
 
         self.headers = {
             'Host': 'api.lzstack.com',
@@ -64,36 +234,53 @@ class MiniProgramCheckin:
         }
 
     def check_in(self):
-        """执行签到"""
-        url = f"{self.base_url}/mall/v2/api/checkin/handler"
+        """执行签到；活动已更换时重新获取活动信息，并在本次运行内重试一次"""
+        activity = self.activity.current(self)
+        success, message, stale = self._check_in(*activity)
+        if stale:
+            fresh = self.activity.refresh(self, activity)
+            if fresh and fresh != activity:
+                Logger.warning(f"{self.label}活动已更换，使用新活动重试: {fresh[0]}")
+                activity = fresh
+                success, message, _ = self._check_in(*activity)
+        if success:
+            self.activity.confirm(activity)
+        return success, message
+
+    def _check_in(self, activity_code, shop_code):
+        """按指定活动签到，返回 (是否成功, 消息, 活动是否已失效)"""
+        url = f"{self.base_url}{CHECKIN_PATH}"
 
-        # 🔥 使用类变量确保参数不为空
         payload = {
-            "code": self.ACTIVITY_CODE,
-            "shopCode": self.SHOP_CODE,
+            "code": activity_code,
+            "shopCode": shop_code,
             "startTime": datetime.now().strftime("%Y-%m-%d 00:00:00"),
             "endTime": datetime.now().strftime("%Y-%m-%d 23:59:59")
         }
 
         try:
-            Logger.info("=" * 60)
-            Logger.info(f"开始执行签到...")
-            Logger.info(f"当前时间: {datetime.now().strftime('%Y-%m-%d %H:%M:%S')}")
-            Logger.info("App ID: 已配置")
-            Logger.info(f"活动代码: {self.ACTIVITY_CODE}")
-            Logger.info(f"店铺代码: {self.SHOP_CODE}")
-            Logger.info(f"请求体: {json.dumps(payload, ensure_ascii=False)}")
-
-            response = requests.post(
+            Logger.info(self.label + "=" * 60)
+            Logger.info(f"{self.label}开始执行签到...")
+            Logger.info(f"{self.label}当前时间: {datetime.now().strftime('%Y-%m-%d %H:%M:%S')}")
+            Logger.info(f"{self.label}App ID: 已配置")
+            Logger.info(f"{self.label}活动代码: {activity_code}")
+            Logger.info(f"{self.label}店铺代码: {shop_code}")
+            Logger.info(f"{self.label}请求体: {json.dumps(payload, ensure_ascii=False)}")
+
+            if self.fire:
+                # 只有第一次请求定点发出，活动更换后的重试立即发送
+                self.fire.fire(self.label.strip('[] '))
+                self.fire = None
+            response = self.session.post(
                 url,
                 headers=self.headers,
                 json=payload,
-                timeout=15,
+                timeout=timeout_for(url, (5, 15)),
                 verify=False
             )
 
             result = response.json()
-            Logger.info(f"响应状态码: {response.status_code}")
+            Logger.info(f"{self.label}响应状态码: {response.status_code}")
 
             code = result.get('code')
             message = result.get('message', '')
@@ -103,82 +290,103 @@ class MiniProgramCheckin:
                 activity_name = data.get('name', '未知活动')
                 integral = data.get('giveIntegralNum', 0)
                 coupons = data.get('couponGiveList', [])
+                self.integral = integral or 0
+                self.coupons = coupons or []
 
-                Logger.success(f"签到成功！活动: {activity_name}")
-                Logger.success(f"获得积分: {integral}")
+                Logger.success(f"{self.label}签到成功！活动: {activity_name}")
+                Logger.success(f"{self.label}获得积分: {integral}")
 
                 if coupons:
-                    Logger.success(f"获得优惠券: {len(coupons)}张")
+                    Logger.success(f"{self.label}获得优惠券: {len(coupons)}张")
                     for coupon in coupons:
-                        Logger.info(f"  - {coupon.get('name', '未知优惠券')}")
+                        Logger.info(f"{self.label}  - {coupon.get('name', '未知优惠券')}")
 
-                return True, f"签到成功！积分+{integral}"
+                return True, f"签到成功！积分+{integral}", False
 
             elif '已签到' in message or '已领取' in message:
-                Logger.warning(message)
-                return True, message
+                Logger.warning(f"{self.label}{message}")
+                return True, message, False
 
             else:
-                Logger.error(f"签到失败: {message} (code: {code})")
-                return False, f"签到失败: {message}"
+                Logger.error(f"{self.label}签到失败: {message} (code: {code})")
+                return False, f"签到失败: {message}", is_activity_error(message)
 
         except requests.exceptions.RequestException as e:
-            Logger.error(f"网络请求异常: {str(e)}")
-            return False, f"网络异常: {str(e)}"
+            Logger.error(f"{self.label}网络请求异常: {str(e)}")
+            return False, f"网络异常: {str(e)}", False
         except json.JSONDecodeError as e:
-            Logger.error(f"响应解析失败: {str(e)}")
-            Logger.error(f"原始响应长度: {len(response.text)}")
-            return False, f"响应解析失败"
+            Logger.error(f"{self.label}响应解析失败: {str(e)}")
+            Logger.error(f"{self.label}原始响应长度: {len(response.text)}")
+            return False, f"响应解析失败", False
         except Exception as e:
-            Logger.error(f"未知异常: {type(e).__name__}: {str(e)}")
-            return False, f"异常: {str(e)}"
+            Logger.error(f"{self.label}未知异常: {type(e).__name__}: {str(e)}")
+            return False, f"异常: {str(e)}", False
         finally:
-            Logger.info("=" * 60)
+            Logger.info(self.label + "=" * 60)
 
 
-class Notifier:
-    """通知推送类"""
+activity_cache = ActivityCache()
 
-    @staticmethod
-    def send_server_chan(sckey, title, content):
-        """Server酱推送"""
-        if not sckey:
-            return
-        try:
-            response = requests.post(
-                f"https://sctapi.ftqq.com/{sckey}.send",
-                data={"title": title, "desp": content},
-                timeout=10
-            )
-            if response.status_code == 200:
-                Logger.success("Server酱通知发送成功")
-            else:
-                Logger.warning(f"Server酱通知发送失败，HTTP {response.status_code}")
-        except Exception as e:
-            Logger.warning(f"Server酱推送失败: {type(e).__name__}")
 
-    @staticmethod
-    def send_pushplus(token, title, content):
-        """PushPlus推送"""
-        if not token:
-            return
+def reset_state() -> None:
+    """常驻守护进程在每次运行后调用，重置模块级状态"""
+    activity_cache.reload()
+
+
+def create_session(pool_size: Optional[int] = None) -> requests.Session:
+    """签到用会话：连接池大小与并发数一致，且不保存任何 Cookie（多账号共用时避免串号）"""
+    session = configure_session(requests.Session(), platform='xingcheng', pool_maxsize=max(1, pool_size or concurrency()))
+    session.cookies.set_policy(DefaultCookiePolicy(allowed_domains=[]))
+    return session
+
+
+def concurrency() -> int:
+    """并发签到的账号数，默认 4"""
+    try:
+        return int(os.getenv('XINGCHENG_CONCURRENCY', '') or 4)
+    except ValueError:
+        return 4
+
+
+def mask_token(token: str) -> str:
+    """对Token进行脱敏处理"""
+    if len(token) <= 8:
+        return '***'
+    return f"{token[:4]}***{token[-4:]}"
+
+
+def env_accounts() -> Iterator[Dict[str, str]]:
+    """从环境变量和账号文件读取账号，未单独指定 app_id 的账号使用 APP_ID"""
+    token = os.getenv('CHECKIN_TOKEN', '').strip()
+    if token:
+        yield {'token': token}
+
+    accounts_json = os.getenv('XINGCHENG_ACCOUNTS', '').strip()
+    if accounts_json:
         try:
-            response = requests.post(
-                "http://www.pushplus.plus/send",
-                json={
-                    "token": token,
-                    "title": title,
-                    "content": content,
-                    "template": "html"
-                },
-                timeout=10
-            )
-            if response.status_code == 200:
-                Logger.success("PushPlus通知发送成功")
-            else:
-                Logger.warning(f"PushPlus通知发送失败，HTTP {response.status_code}")
-        except Exception as e:
-            Logger.warning(f"PushPlus推送失败: {type(e).__name__}")
+            multi_accounts = json.loads(accounts_json)
+        except json.JSONDecodeError:
+            Logger.warning("XINGCHENG_ACCOUNTS格式错误，已忽略")
+            multi_accounts = []
+        if isinstance(multi_accounts, list):
+            yield from multi_accounts
+        else:
+            Logger.warning("XINGCHENG_ACCOUNTS应为JSON数组，已忽略")
+
+    path = os.getenv('XINGCHENG_ACCOUNTS_FILE', '').strip()
+    if path:
+        if Path(path).exists():
+            yield from iter_json_lines(Path(path), 'XINGCHENG_ACCOUNTS_FILE')
+        else:
+            Logger.warning(f"账号文件不存在，已忽略: {path}")
+
+
+def load_accounts() -> Iterator[Dict[str, str]]:
+    default_app_id = os.getenv('APP_ID', '').strip()
+    for account in env_accounts():
+        if isinstance(account, dict) and not account.get('app_id') and default_app_id:
+            account = {**account, 'app_id': default_app_id}
+        yield account
 
 
 def main():
@@ -187,74 +395,100 @@ def main():
     print("""
     ╔═══════════════════════════════════════╗
     ║   微信小程序自动签到 - GitHub版       ║
-    ║   活动/店铺代码已硬编码               ║
+    ║   活动/店铺代码自动获取并缓存         ║
     ╚═══════════════════════════════════════╝
     """)
 
-    # ========== 从环境变量读取配置 ==========
-    TOKEN = os.getenv('CHECKIN_TOKEN')
-    APP_ID = os.getenv('APP_ID')
+    window = window_from_cli()
+    fire = fire_at_from_cli()
 
-    # 通知配置（可选）
-    SCKEY = os.getenv('SCKEY')
-    PUSHPLUS_TOKEN = os.getenv('PUSHPLUS_TOKEN')
+    # ========== 从环境变量读取配置 ==========
+    accounts = list(iter_accounts(
+        [load_accounts()],
+        identity=lambda account: str(account.get('token', '')),
+        required=('token', 'app_id'),
+        label='星城账号'
+    ))
 
     # ========== 验证必需参数 ==========
-    missing_params = []
-
-    if not TOKEN:
-        missing_params.append('CHECKIN_TOKEN')
-
-    if not APP_ID:
-        missing_params.append('APP_ID')
-
-    if missing_params:
-        Logger.error(f"❌ 缺少必需的环境变量：{', '.join(missing_params)}")
+    if not accounts:
+        Logger.error("❌ 未配置任何账号")
         Logger.error("=" * 60)
-        Logger.error("请在 GitHub Secrets 中添加以下变量：")
-        for param in missing_params:
-            Logger.error(f"  - {param}")
+        Logger.error("请在 GitHub Secrets 中添加以下变量之一：")
+        Logger.error("  - CHECKIN_TOKEN 和 APP_ID（单账号）")
+        Logger.error('  - XINGCHENG_ACCOUNTS（JSON数组，如 [{"token": "...", "app_id": "..."}]）')
         Logger.error("=" * 60)
         sys.exit(1)
 
-    Logger.info("✅ Token: 已配置")
-    Logger.info("✅ App ID: 已配置")
+    Logger.info(f"✅ 已配置 {len(accounts)} 个账号")
 
     # ========== 执行签到 ==========
-    checkin = MiniProgramCheckin(TOKEN, APP_ID)
-    success, message = checkin.check_in()
+    workers = concurrency()
+    if fire:
+        # 定点发射：所有账号同时准备，签到请求在目标时刻一起发出
+        if window:
+            Logger.warning("⚠️ 定点发射时忽略时间窗口（--window / CHECKIN_WINDOW）")
+            window = None
+        workers = fire.workers(len(accounts), workers)
+    # 所有账号共用一个会话（同一个 keep-alive 连接池），只为首个连接做一次 TLS 握手
+    session = create_session(workers)
+    results = {}
+
+    def check_in(task):
+        index, account = task
+        label = f"账号{index} {mask_token(account['token'])}" if len(accounts) > 1 else ''
+        checkin = MiniProgramCheckin(account['token'], account['app_id'], session=session, label=label, fire=fire)
+        success, message = checkin.check_in()
+        results[index] = {
+            'account': mask_token(account['token']),
+            'success': success,
+            'message': message,
+            'integral': checkin.integral,
+            'coupons': len(checkin.coupons)
+        }
+
+    try:
+        if fire:
+            # 到提前量时为每个账号预热一个连接
+            fire.wait_prepare()
+            try:
+                prewarm(session, f"{API_BASE}{CHECKIN_PATH}", connections=len(accounts), verify=False)
+            except Exception as e:
+                Logger.warning(f"⚠️ 连接预热失败: {type(e).__name__}: {e}")
+        Scheduler(window, concurrency=workers, gap=(0, 0)).run(enumerate(accounts, 1), check_in)
+    finally:
+        session.close()
+    if fire:
+        fire.report()
+
+    results = [results[index] for index in sorted(results)]
+    success_count = sum(1 for item in results if item['success'])
+    total_integral = sum(item['integral'] for item in results)
+    total_coupons = sum(item['coupons'] for item in results)
+
+    # ========== 汇总 ==========
+    Logger.info("=" * 60)
+    Logger.info("📊 执行完毕")
+    for item in results:
+        mark = '✅' if item['success'] else '❌'
+        Logger.info(f"  {mark} {item['account']}: {item['message']}")
+    Logger.info(f"  - 成功: {success_count}/{len(results)} 个账号")
+    Logger.info(f"  - 积分合计: {total_integral}")
+    Logger.info(f"  - 优惠券合计: {total_coupons} 张")
+    Logger.info("=" * 60)
 
     # ========== 发送通知 ==========
-    current_time = datetime.now().strftime('%Y-%m-%d %H:%M:%S')
-
-    if success:
-        title = "✅ 签到成功"
-        content = f"""
-### 签到成功 🎉
-
-**时间**: {current_time}
-**结果**: {message}
-**店铺**: {MiniProgramCheckin.SHOP_CODE}
-**活动**: {MiniProgramCheckin.ACTIVITY_CODE}
-        """
+    # 进程退出时汇总发送，不占用签到流程的时间
+    if len(results) == 1:
+        report('星城小程序', results[0]['success'], results[0]['message'])
     else:
-        title = "❌ 签到失败"
-        content = f"""
-### 签到失败 ⚠️
-
-**时间**: {current_time}
-**错误**: {message}
-**建议**: 请检查Token是否过期或活动代码是否正确
-        """
-
-    # 发送通知
-    Notifier.send_server_chan(SCKEY, title, content)
-    Notifier.send_pushplus(PUSHPLUS_TOKEN, title, content)
+        report('星城小程序', success_count == len(results),
+               f"成功 {success_count}/{len(results)} 个账号，积分+{total_integral}，优惠券 {total_coupons} 张")
 
     # ========== 设置退出码 ==========
-    if not success:
+    if success_count < len(results):
         sys.exit(1)
 
 
 if __name__ == "__main__":
-    main()
+    run_entry(main)
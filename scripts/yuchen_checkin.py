@@ -8,21 +8,26 @@ import requests
 import urllib3
 from datetime import datetime
 from bs4 import BeautifulSoup
-from typing import Optional, Dict, List
-from requests.adapters import HTTPAdapter
-from urllib3.util.retry import Retry
+from pathlib import Path
+from typing import Optional, Dict, Iterator
+
+from common.accounts import iter_accounts, iter_json_lines
+from common.checkpoint import Checkpoint
+from common.firing import FireAt, fire_at_from_cli
+from common.http import configure_session
+from common.logs import setup_logging
+from common.retry import BudgetedRetry
+from common.runner import pending_accounts, report_results, run_accounts
+from common.scheduler import window_from_cli
+from common.sharding import select_shard, shard_from_cli, write_shard_result
+from common.timeouts import timeout_for
+from common.profiling import run_entry
 
 # 禁用SSL警告
 urllib3.disable_warnings(urllib3.exceptions.InsecureRequestWarning)
 
 # ==================== 日志配置 ====================
-logging.basicConfig(
-    level=logging.INFO,
-    format='%(asctime)s - %(levelname)s - %(message)s',
-    handlers=[
-        logging.StreamHandler(sys.stdout)
-    ]
-)
+setup_logging()
 log = logging.getLogger(__name__)
 
 # ==================== 工具函数 ====================
@@ -40,6 +45,11 @@ def mask_username(username: str) -> str:
     return f"{username[:2]}***{username[-1]}"
 
 
+def username_identity(account: Dict[str, str]) -> str:
+    """账号标识：用户名，用于去重、分片与断点记录"""
+    return str(account.get('username', ''))
+
+
 class LoginResultHandler:
     """处理登录返回结果"""
     def __init__(self, response_json: dict):
@@ -52,46 +62,79 @@ class Config:
     """从环境变量读取配置"""
 
     @staticmethod
-    def get_accounts() -> List[Dict[str, str]]:
-        """从环境变量读取账号配置（支持多账号）"""
-        accounts = []
-
+    def _env_accounts() -> Iterator[Dict[str, str]]:
+        """方式1 + 方式2: 环境变量中的单账号与 JSON 数组"""
         # 方式1: 单账号配置
         username = os.getenv('YUCHEN_USERNAME', '').strip()
         password = os.getenv('YUCHEN_PASSWORD', '').strip()
 
         if username and password:
-            accounts.append({
+            log.info(f"✅ 从环境变量读取到 1 个账号: {mask_username(username)}")
+            yield {
                 'username': username,
                 'password': password,
                 'user_agent': os.getenv('USER_AGENT',
                     'Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36 (KHTML, like Gecko) Chrome/120.0.0.0 Safari/537.36')
-            })
-            log.info(f"✅ 从环境变量读取到 1 个账号: {mask_username(username)}")
+            }
 
         # 方式2: 多账号配置（使用JSON格式）
         accounts_json = os.getenv('YUCHEN_ACCOUNTS', '').strip()
         if accounts_json:
             try:
                 multi_accounts = json.loads(accounts_json)
-                accounts.extend(multi_accounts)
-                log.info(f"✅ 从YUCHEN_ACCOUNTS读取到 {len(multi_accounts)} 个账号")
             except json.JSONDecodeError:
                 log.warning("⚠️ YUCHEN_ACCOUNTS格式错误，已忽略")
+                return
+            if not isinstance(multi_accounts, list):
+                log.warning("⚠️ YUCHEN_ACCOUNTS应为JSON数组，已忽略")
+                return
+            log.info(f"✅ 从YUCHEN_ACCOUNTS读取到 {len(multi_accounts)} 个账号")
+            yield from multi_accounts
 
-        if not accounts:
-            log.error("❌ 未检测到任何账号配置！")
-            log.info("配置方式1: 设置 YUCHEN_USERNAME 和 YUCHEN_PASSWORD")
-            log.info("配置方式2: 设置 YUCHEN_ACCOUNTS (JSON数组)")
+    @staticmethod
+    def _file_accounts() -> Iterator[Dict[str, str]]:
+        """方式3: YUCHEN_ACCOUNTS_FILE 指向的 JSONL 文件（可 gzip 压缩），按行惰性读取"""
+        path = os.getenv('YUCHEN_ACCOUNTS_FILE', '').strip()
+        if not path:
+            return
+        if not Path(path).exists():
+            log.warning(f"⚠️ 账号文件不存在，已忽略: {path}")
+            return
+        log.info(f"✅ 从账号文件读取账号: {path}")
+        yield from iter_json_lines(Path(path), 'YUCHEN_ACCOUNTS_FILE')
 
-        return accounts
+    @staticmethod
+    def iter_accounts() -> Iterator[Dict[str, str]]:
+        """惰性产出全部账号，边读边校验，同一用户名只保留第一次出现的配置"""
+        return iter_accounts(
+            (Config._env_accounts(), Config._file_accounts()),
+            identity=username_identity,
+            required=('username', 'password'),
+            label='账号'
+        )
+
+    @staticmethod
+    def log_usage() -> None:
+        log.error("❌ 未检测到任何账号配置！")
+        log.info("配置方式1: 设置 YUCHEN_USERNAME 和 YUCHEN_PASSWORD")
+        log.info("配置方式2: 设置 YUCHEN_ACCOUNTS (JSON数组)")
+        log.info("配置方式3: 设置 YUCHEN_ACCOUNTS_FILE (JSONL 文件路径，支持 .gz)")
+
+
+def retry_strategy() -> BudgetedRetry:
+    """签到请求的重试策略"""
+    return BudgetedRetry(
+        total=3,
+        backoff_factor=1,
+        status_forcelist=[429, 500, 502, 503, 504]
+    )
 
 
 # ==================== 主业务类 ====================
 class YuChen:
     """雨晨iOS资源签到类"""
 
-    def __init__(self, **kwargs):
+    def __init__(self, session: Optional[requests.Session] = None, fire: Optional[FireAt] = None, **kwargs):
         self.url: str = "iosyc.com"
         self.username: str = kwargs.get('username', '')
         self.password: str = kwargs.get('password', '')
@@ -103,19 +146,11 @@ class YuChen:
         self.signin_message = ""
         self.credit_info = ""
 
-        # 创建session并配置
-        self.session = requests.session()
+        # 多账号时由 main 传入共用连接池上的会话（只持有本账号的 Cookie），单独使用时自建
+        self.session = session or configure_session(requests.Session(), retries=retry_strategy(), platform='yuchen')
         self.session.verify = False
-
-        # 配置重试策略
-        retry_strategy = Retry(
-            total=3,
-            backoff_factor=1,
-            status_forcelist=[429, 500, 502, 503, 504]
-        )
-        adapter = HTTPAdapter(max_retries=retry_strategy)
-        self.session.mount("https://", adapter)
-        self.session.mount("http://", adapter)
+        # 定点发射：登录后等到目标时刻再发签到请求
+        self.fire = fire
 
         log.debug(f"username={mask_username(self.username)}, password=***")
 
@@ -149,7 +184,7 @@ class YuChen:
             response = self.session.get(
                 url=url,
                 headers=self.headers(),
-                timeout=30,
+                timeout=timeout_for(url, (10, 30)),
                 verify=False,
                 allow_redirects=True
             )
@@ -191,7 +226,7 @@ class YuChen:
                 url=url,
                 data=data,
                 headers=self.headers(),
-                timeout=30,
+                timeout=timeout_for(url, (10, 30)),
                 verify=False
             )
             response.raise_for_status()
@@ -221,7 +256,7 @@ class YuChen:
                 url=url,
                 data=data,
                 headers=self.headers(),
-                timeout=30,
+                timeout=timeout_for(url, (10, 30)),
                 verify=False
             )
             response.raise_for_status()
@@ -252,7 +287,7 @@ class YuChen:
             response = self.session.get(
                 url=url,
                 headers=self.headers(),
-                timeout=30,
+                timeout=timeout_for(url, (10, 30)),
                 verify=False
             )
             response.raise_for_status()
@@ -285,7 +320,10 @@ class YuChen:
             return result
 
         if self.yu_chen_login():
-            sleep_random(2, 5)
+            if self.fire:
+                self.fire.fire(mask_username(self.username))
+            else:
+                sleep_random(2, 5)
             self.yu_chen_check()
             sleep_random(1, 3)
             self.yu_chen_info()
@@ -306,46 +344,61 @@ def main():
     log.info(f"⏰ 运行时间: {datetime.now().strftime('%Y-%m-%d %H:%M:%S')}")
     log.info("=" * 60)
 
-    # 获取账号配置
-    accounts = Config.get_accounts()
+    # 分片模式下只处理属于本分片的账号（按用户名哈希稳定分配）
+    shard = shard_from_cli()
+    window = window_from_cli()
+    fire = fire_at_from_cli()
 
-    if not accounts:
-        log.error("❌ 未配置任何账号！")
-        sys.exit(1)
-
-    log.info(f"检测到 {len(accounts)} 个账号\n")
+    # 获取账号配置（惰性读取，边读边签到）
+    accounts = select_shard(Config.iter_accounts(), shard, identity=username_identity)
 
     # 执行签到
-    success_count = 0
-    fail_count = 0
+    results = {}
+    checkpoint = Checkpoint('yuchen')
 
-    for i, account_config in enumerate(accounts, 1):
+    def check_in(task, session) -> None:
+        i, account_config = task
         log.info(f"\n{'='*60}")
-        log.info(f"📱 账号 {i}/{len(accounts)} 开始执行")
+        log.info(f"📱 账号 {i} 开始执行")
         log.info(f"{'='*60}")
 
         try:
-            yuchen = YuChen(**account_config)
+            yuchen = YuChen(session=session, fire=fire, **account_config)
             result = yuchen.run()
 
             # 脱敏处理，避免日志和状态文件中出现完整用户名
             masked_username = mask_username(result.get('username', 'unknown'))
 
             if result['success']:
-                success_count += 1
+                checkpoint.mark_done(username_identity(account_config), result['message'])
                 log.info(f"✅ 账号 {i} ({masked_username}) 签到成功")
             else:
-                fail_count += 1
                 log.error(f"❌ 账号 {i} ({masked_username}) 签到失败: {result['message']}")
-
-            # 账号间延迟
-            if i < len(accounts):
-                sleep_random(5, 10)
+            results[i] = {'account': masked_username, 'success': result['success'], 'message': result['message']}
 
         except Exception as e:
-            fail_count += 1
             masked_username = mask_username(account_config.get('username', 'unknown'))
             log.error(f"❌ 账号 {i} ({masked_username}) 执行异常: {e}", exc_info=True)
+            results[i] = {'account': masked_username, 'success': False, 'message': f"执行异常: {e}"}
+
+    pending = pending_accounts(accounts, checkpoint, username_identity,
+                               lambda account: mask_username(username_identity(account)), results)
+    run_accounts(pending, check_in, 'yuchen', retries=retry_strategy(), window=window, fire=fire)
+
+    results = report_results('雨晨iOS资源', results)
+    success_count = sum(1 for item in results if item['success'])
+    fail_count = len(results) - success_count
+
+    if not results:
+        if shard:
+            log.info("🧩 本分片没有分到账号")
+            write_shard_result('yuchen', shard, results)
+            sys.exit(0)
+        Config.log_usage()
+        sys.exit(1)
+
+    if shard:
+        write_shard_result('yuchen', shard, results)
 
     # 总结
     log.info(f"\n{'='*60}")
@@ -361,4 +414,4 @@ def main():
 
 
 if __name__ == '__main__':
-    main()
+    run_entry(main)
@@ -0,0 +1,101 @@
+# -*- coding: utf-8 -*-
+"""
+离线回归测试的公共夹具
+
+    replay        回放 tests/cassettes 下的磁带（格式与 CHECKIN_CASSETTE_MODE=record 录制的一致，已脱敏）
+    stand_in_proxy 本机的替身 HTTP 代理，记录收到的请求行并直接应答，不访问网络
+"""
+
+import sys
+import time
+import socket
+import threading
+from pathlib import Path
+from socketserver import StreamRequestHandler, ThreadingTCPServer
+from typing import List
+
+import pytest
+
+ROOT = Path(__file__).resolve().parents[1]
+CASSETTE_DIR = Path(__file__).resolve().parent / 'cassettes'
+
+# 各脚本以 `from common.xxx import ...` 导入共用组件
+sys.path.insert(0, str(ROOT / 'scripts'))
+
+from common import timeouts  # noqa: E402
+from common.cassette import Cassette, CassetteAdapter  # noqa: E402
+
+
+@pytest.fixture(autouse=True)
+def no_latency_samples(monkeypatch):
+    """回放的响应不计入 status/latency.json"""
+    monkeypatch.setattr(timeouts.policy, 'enabled', False)
+
+
+@pytest.fixture
+def replay():
+    """replay(name, session) 把 session 的 http/https 挂到指定磁带上，返回磁带"""
+    def mount(name, session=None):
+        cassette = Cassette(CASSETTE_DIR / f'{name}.json', 'replay')
+        if session is not None:
+            adapter = CassetteAdapter(cassette)
+            session.mount('https://', adapter)
+            session.mount('http://', adapter)
+        return cassette
+    return mount
+
+
+class StandInProxy:
+    """替身代理：普通请求应答 200（正文为代理名），CONNECT 应答 502。"""
+
+    def __init__(self, name: str = 'proxy', delay: float = 0.0):
+        self.name = name
+        self.delay = delay
+        self.requests: List[str] = []
+        proxy = self
+
+        class Handler(StreamRequestHandler):
+            def handle(self):
+                line = self.rfile.readline().decode('latin-1').strip()
+                if not line:
+                    # 只检查能否连上代理的健康检查，不发请求
+                    return
+                while self.rfile.readline() not in (b'\r\n', b'\n', b''):
+                    pass
+                proxy.requests.append(line)
+                time.sleep(proxy.delay)
+                if line.startswith('CONNECT'):
+                    self.wfile.write(b'HTTP/1.1 502 Bad Gateway\r\nContent-Length: 0\r\n\r\n')
+                    return
+                body = proxy.name.encode()
+                self.wfile.write(b'HTTP/1.1 200 OK\r\nConnection: close\r\nContent-Length: '
+                                 + str(len(body)).encode() + b'\r\n\r\n' + body)
+
+        ThreadingTCPServer.daemon_threads = True
+        self.server = ThreadingTCPServer(('127.0.0.1', 0), Handler)
+        self.url = f"http://127.0.0.1:{self.server.server_address[1]}"
+        threading.Thread(target=self.server.serve_forever, daemon=True).start()
+
+    def close(self) -> None:
+        self.server.shutdown()
+        self.server.server_close()
+
+
+def dead_proxy_url() -> str:
+    """一个没有监听的本机端口"""
+    with socket.socket() as sock:
+        sock.bind(('127.0.0.1', 0))
+        return f"http://127.0.0.1:{sock.getsockname()[1]}"
+
+
+@pytest.fixture
+def stand_in_proxy():
+    """stand_in_proxy(name, delay) 启动一个替身代理，测试结束时关闭"""
+    proxies = []
+
+    def start(name: str = 'proxy', delay: float = 0.0) -> StandInProxy:
+        proxies.append(StandInProxy(name, delay))
+        return proxies[-1]
+    yield start
+    for proxy in proxies:
+        proxy.close()
@@ -0,0 +1,29 @@
+# -*- coding: utf-8 -*-
+import pytest
+import requests
+
+import huaxia_signin as huaxia
+
+# 与磁带中同一接口依次录制的响应一一对应
+EXPECTED = [
+    True,   # status=1 登录成功
+    True,   # 签到成功，获得 10 积分
+    True,   # 今日已签到
+    False,  # 签到失败：请先登录
+    True,   # code=0
+]
+
+
+@pytest.fixture
+def responses(replay):
+    session = requests.Session()
+    replay('huaxia', session)
+    return [session.post(huaxia.Config.LOGIN_URL, data={'action': 'user_login'}) for _ in EXPECTED]
+
+
+def test_is_response_success(responses):
+    assert [huaxia.is_response_success(response.json(), response.text) for response in responses] == EXPECTED
+
+
+def test_is_response_success_rejects_non_dict():
+    assert huaxia.is_response_success(['成功']) is False
@@ -0,0 +1,123 @@
+# -*- coding: utf-8 -*-
+import json
+
+import pytest
+import requests
+
+import lkong_punch as lkong
+
+BODY = lkong.DEFAULT_REQUEST_BODY
+DIGEST = lkong.PersistedQueries.query_hash(BODY['query'])
+PUNCH = {'data': {'punch': {'isPunch': True, 'punchday': 3}}}
+
+
+def respond(payload, status=200):
+    response = requests.Response()
+    response.status_code = status
+    response._content = json.dumps(payload).encode()
+    return response
+
+
+class FakeSession:
+    """按顺序返回预设响应，记录每次发送的请求体"""
+
+    def __init__(self, *responses):
+        self.responses = list(responses)
+        self.bodies = []
+
+    def post(self, url, json=None, **kwargs):
+        self.bodies.append(json)
+        return self.responses.pop(0)
+
+
+def kind(body):
+    """full+hash / hash / full"""
+    if 'query' not in body:
+        return 'hash'
+    return 'full+hash' if 'persistedQuery' in body.get('extensions', {}) else 'full'
+
+
+@pytest.fixture
+def apq(tmp_path, monkeypatch):
+    monkeypatch.delenv('LKONG_PERSISTED_QUERY', raising=False)
+    return lkong.PersistedQueries(tmp_path / 'apq.json')
+
+
+def test_full_query_only_registers(apq):
+    session = FakeSession(respond(PUNCH))
+    assert apq.post(session, BODY).json() == PUNCH
+    assert [kind(body) for body in session.bodies] == ['full+hash']
+    assert DIGEST in apq.registered and DIGEST not in apq.accepted
+
+
+def test_full_query_not_supported_resends_plain(apq):
+    session = FakeSession(respond({'errors': [{'message': 'PersistedQueryNotSupported'}]}), respond(PUNCH))
+    assert apq.post(session, BODY).json() == PUNCH
+    assert [kind(body) for body in session.bodies] == ['full+hash', 'full']
+    assert apq.supported is False
+
+
+def test_hash_only_success_accepts(apq):
+    apq.registered.add(DIGEST)
+    session = FakeSession(respond(PUNCH))
+    assert apq.post(session, BODY).json() == PUNCH
+    assert [kind(body) for body in session.bodies] == ['hash']
+    assert DIGEST in apq.accepted
+
+
+def test_hash_only_business_error_is_not_resent(apq):
+    apq.accepted.add(DIGEST)
+    already = {'errors': [{'message': '今天已经签到过了'}], 'data': None}
+    session = FakeSession(respond(already))
+    assert apq.post(session, BODY).json() == already
+    assert [kind(body) for body in session.bodies] == ['hash']
+
+
+@pytest.mark.parametrize('response', [
+    respond({'errors': [{'message': 'Must provide query string.'}]}),
+    respond({'errors': [{'message': 'Bad Request'}]}, status=400),
+])
+def test_hash_ignored_by_server_resends_full_query(apq, response):
+    apq.registered.add(DIGEST)
+    session = FakeSession(response, respond(PUNCH))
+    assert apq.post(session, BODY).json() == PUNCH
+    assert [kind(body) for body in session.bodies] == ['hash', 'full']
+    assert apq.supported is False
+    assert DIGEST not in apq.registered | apq.accepted
+
+
+def test_accepted_hash_rejected_resends_and_reregisters(apq):
+    apq.accepted.add(DIGEST)
+    session = FakeSession(respond({'errors': [{'message': 'Must provide query string.'}]}), respond(PUNCH))
+    assert apq.post(session, BODY).json() == PUNCH
+    assert [kind(body) for body in session.bodies] == ['hash', 'full+hash']
+    assert apq.supported is True
+    assert DIGEST in apq.registered and DIGEST not in apq.accepted
+
+
+def test_hash_not_found_resends_full_query(apq):
+    apq.accepted.add(DIGEST)
+    session = FakeSession(respond({'errors': [{'message': 'PersistedQueryNotFound'}]}), respond(PUNCH))
+    assert apq.post(session, BODY).json() == PUNCH
+    assert [kind(body) for body in session.bodies] == ['hash', 'full+hash']
+
+
+def test_hash_not_supported_resends_plain(apq):
+    apq.registered.add(DIGEST)
+    session = FakeSession(respond({'errors': [{'extensions': {'code': 'PERSISTED_QUERY_NOT_SUPPORTED'}}]}),
+                          respond(PUNCH))
+    assert apq.post(session, BODY).json() == PUNCH
+    assert [kind(body) for body in session.bodies] == ['hash', 'full']
+    assert apq.supported is False
+
+
+def test_old_cache_format_needs_reconfirmation(tmp_path, monkeypatch):
+    monkeypatch.delenv('LKONG_PERSISTED_QUERY', raising=False)
+    path = tmp_path / 'apq.json'
+    path.write_text(json.dumps({'supported': True, 'accepted': [DIGEST]}), encoding='utf-8')
+    apq = lkong.PersistedQueries(path)
+    assert apq.registered == {DIGEST} and not apq.accepted
+
+    apq.post(FakeSession(respond(PUNCH)), BODY)
+    apq.save()
+    assert json.loads(path.read_text(encoding='utf-8'))['accepted'] == [DIGEST]
@@ -0,0 +1,49 @@
+# -*- coding: utf-8 -*-
+import os
+import sys
+import json
+import subprocess
+
+from conftest import ROOT
+
+SCRIPT = '''
+import sys
+from common.notify import report
+from common.profiling import run_entry
+
+
+def main():
+    report('测试平台', False, '签到失败')
+    sys.exit(1)
+
+
+run_entry(main)
+'''
+
+
+def test_script_sends_notification_before_exit(tmp_path, stand_in_proxy):
+    proxy = stand_in_proxy()
+    outbox = tmp_path / 'outbox.json'
+    script = tmp_path / 'demo_checkin.py'
+    script.write_text(SCRIPT, encoding='utf-8')
+
+    env = {key: value for key, value in os.environ.items()
+           if key.upper() not in ('NO_PROXY', 'PUSHPLUS_TOKEN', 'CHECKIN_METRICS_DIR')}
+    env.update({
+        'PYTHONPATH': str(ROOT / 'scripts'),
+        'SCKEY': 'SCT-test',
+        'HTTPS_PROXY': proxy.url,
+        'CHECKIN_NOTIFY_OUTBOX': str(outbox),
+        'CHECKIN_ADAPTIVE_TIMEOUT': '0',
+        'CHECKIN_RETRY_BUDGET': '0',
+    })
+    result = subprocess.run([sys.executable, str(script)], env=env, cwd=tmp_path,
+                            capture_output=True, text=True, timeout=60)
+
+    assert result.returncode == 1
+    assert 'cannot schedule new futures' not in result.stderr
+    # 推送请求确实发出（经替身代理），失败后写入发件箱
+    assert any(line.startswith('CONNECT sctapi.ftqq.com:443') for line in proxy.requests)
+    messages = json.loads(outbox.read_text(encoding='utf-8'))['messages']
+    assert [message['channel'] for message in messages] == ['serverchan']
+    assert messages[0]['attempts'] == 1
@@ -0,0 +1,24 @@
+# -*- coding: utf-8 -*-
+import pstats
+
+from common import profiling
+from common.scheduler import Scheduler
+
+
+def parse_in_worker(item):
+    return sum(range(10000)) + item
+
+
+def test_profile_includes_scheduler_workers(tmp_path, monkeypatch):
+    monkeypatch.setattr(profiling, 'PROFILE_DIR', tmp_path)
+
+    def main():
+        return Scheduler(concurrency=2, gap=(0, 0)).run(range(3), parse_in_worker)
+
+    assert profiling._profiled(main, 'demo') == [49995000, 49995001, 49995002]
+
+    run_dir, = tmp_path.iterdir()
+    stats = pstats.Stats(str(run_dir / 'cpu.prof')).stats
+    calls = {func[2]: counts[1] for func, counts in stats.items()}
+    assert calls['parse_in_worker'] == 3
+    assert 'parse_in_worker' in (run_dir / 'cpu_top.txt').read_text(encoding='utf-8')
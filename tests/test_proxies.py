@@ -0,0 +1,67 @@
+# -*- coding: utf-8 -*-
+import pytest
+import requests
+
+from common import proxies
+from common.breaker import CircuitBreaker, OPEN
+from common.http import configure_session
+from conftest import dead_proxy_url
+
+
+@pytest.fixture(autouse=True)
+def fresh_pools(monkeypatch):
+    """每个用例重新读取代理配置，只在启动时检查一次"""
+    monkeypatch.setattr(proxies, '_pools', {})
+    monkeypatch.setenv('CHECKIN_PROXY_CHECK_INTERVAL', '0')
+    for name in ('CHECKIN_PROXIES', 'CHECKIN_PROXY_CHECK_URL', 'CHECKIN_EGRESS', 'TESTPLAT_PROXIES'):
+        monkeypatch.delenv(name, raising=False)
+    yield
+    for pool in proxies._pools.values():
+        if pool:
+            pool.stop()
+
+
+def test_request_fails_over_from_dead_proxy(monkeypatch, stand_in_proxy):
+    live = stand_in_proxy('live')
+    dead = dead_proxy_url()
+    monkeypatch.setenv('TESTPLAT_PROXIES', f"{dead},{live.url}")
+
+    session = configure_session(requests.Session(), platform='testplat')
+    response = session.get('http://checkin.test/', timeout=5)
+
+    assert response.text == 'live'
+    assert live.requests == ['GET http://checkin.test/ HTTP/1.1']
+    pool = proxies.proxy_pool_for('testplat')
+    assert [proxy.url for proxy in pool.candidates()] == [live.url, dead]
+
+
+def test_health_check_prefers_faster_proxy(monkeypatch, stand_in_proxy):
+    slow, fast = stand_in_proxy('slow', delay=0.3), stand_in_proxy('fast')
+    monkeypatch.setenv('TESTPLAT_PROXIES', f"{slow.url},{fast.url}")
+    monkeypatch.setenv('CHECKIN_PROXY_CHECK_URL', 'http://check.test/')
+
+    pool = proxies.proxy_pool_for('testplat')
+
+    assert slow.requests == fast.requests == ['HEAD http://check.test/ HTTP/1.1']
+    assert pool.candidates()[0].url == fast.url
+
+
+def test_breaker_key_separates_proxy_egress(monkeypatch, stand_in_proxy, tmp_path):
+    direct = CircuitBreaker('testplat', path=tmp_path / 'breaker.json')
+    monkeypatch.setenv('TESTPLAT_PROXIES', stand_in_proxy().url)
+    proxied = CircuitBreaker('testplat', path=tmp_path / 'breaker.json')
+
+    assert proxied.egress == proxies.proxy_egress('testplat')
+    assert proxied.key != direct.key
+    assert '127.0.0.1' not in proxied.key
+
+
+def test_breaker_probe_goes_through_proxy(monkeypatch, stand_in_proxy, tmp_path):
+    proxy = stand_in_proxy('probe-ok')
+    monkeypatch.setenv('TESTPLAT_PROXIES', proxy.url)
+    breaker = CircuitBreaker('testplat', path=tmp_path / 'breaker.json')
+    breaker.entry = {'state': OPEN, 'failures': 3, 'opened_at': '2000-01-01 00:00:00'}
+
+    assert breaker.allow('http://blocked.test/') is True
+    assert proxy.requests == ['GET http://blocked.test/ HTTP/1.1']
+    assert breaker.state == 'closed'
@@ -0,0 +1,28 @@
+# -*- coding: utf-8 -*-
+import time
+
+from common.firing import FireAt
+from common.runner import run_accounts
+
+# 准备（登录、抓取表单）耗时，超过 CHECKIN_CONCURRENCY=1 时依次执行的账号会晚于目标
+PREPARE_SECONDS = 0.3
+
+
+def test_fire_mode_fires_all_accounts_together(monkeypatch):
+    monkeypatch.delenv('CHECKIN_CONCURRENCY', raising=False)
+    fire = FireAt(time.time() + 1.0, lead=1.0)
+    fired = {}
+
+    def check_in(task, session):
+        index, _ = task
+        time.sleep(PREPARE_SECONDS)
+        fired[index] = fire.fire(str(index))
+
+    tasks = iter([(index, {}) for index in range(1, 5)])
+    # 同时传入的时间窗口被忽略，不会把账号铺开到一小时里
+    window = (time.time(), time.time() + 3600)
+    run_accounts(tasks, check_in, 'testplat', window=window, fire=fire)
+
+    assert sorted(fired) == [1, 2, 3, 4]
+    assert max(fired.values()) - min(fired.values()) < 0.05
+    assert max(fired.values()) < 0.05
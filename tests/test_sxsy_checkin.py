@@ -0,0 +1,52 @@
+# -*- coding: utf-8 -*-
+import pytest
+import requests
+
+import sxsy_checkin as sxsy
+
+# 签到接口返回 XML，脚本按原样用 html.parser 解析
+pytestmark = pytest.mark.filterwarnings('ignore::bs4.XMLParsedAsHTMLWarning')
+
+
+def fetch(replay, url):
+    session = requests.Session()
+    replay('sxsy', session)
+    return session.get(url).text
+
+
+def test_extract_domain_from_release_page_takes_largest_number(replay):
+    html = fetch(replay, sxsy.RELEASE_PAGE_URL)
+    assert sxsy.extract_domain_from_html(html, sxsy.RELEASE_PAGE_URL) == 'sxsy89.com'
+
+
+def test_extract_domain_from_release_page_without_domain(replay):
+    html = fetch(replay, 'https://sxsy.org/links')
+    # 没有会话也没有本地保存页时不会去识别图片
+    assert sxsy.extract_domain_from_html(html, 'https://sxsy.org/links') is None
+
+
+def make_checkin(replay, domain):
+    checkin = sxsy.SXSYCheckin(domain=domain, cookie='')
+    replay('sxsy', checkin.session)
+    return checkin
+
+
+def test_do_checkin_xml_success(replay):
+    checkin = make_checkin(replay, 'sxsy321.com')
+    checkin.do_checkin()
+    assert checkin.signin_success is True
+    assert checkin.signin_message == '今日签到 获得 5 枚香币'
+
+
+def test_do_checkin_xml_failure(replay):
+    checkin = make_checkin(replay, 'sxsy322.com')
+    checkin.do_checkin()
+    assert checkin.signin_success is False
+    assert checkin.signin_message == '请先登录后再进行操作'
+
+
+def test_do_checkin_request_missing_from_cassette(replay):
+    checkin = make_checkin(replay, 'sxsy323.com')
+    checkin.do_checkin()
+    assert checkin.signin_success is False
+    assert checkin.signin_message == '签到请求失败: ConnectionError'
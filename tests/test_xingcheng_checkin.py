@@ -0,0 +1,39 @@
+# -*- coding: utf-8 -*-
+import json
+
+import pytest
+
+import xingcheng_checkin as xingcheng
+
+CACHED = ('P-cached', 'SC-cached')
+
+
+@pytest.fixture
+def cache_file(tmp_path, monkeypatch):
+    for name in ('XINGCHENG_ACTIVITY_CODE', 'XINGCHENG_SHOP_CODE', xingcheng.ACTIVITY_PATH_ENV):
+        monkeypatch.delenv(name, raising=False)
+    path = tmp_path / 'activity.json'
+    path.write_text(json.dumps({'activity_code': CACHED[0], 'shop_code': CACHED[1],
+                                'update_time': '2099-01-01 00:00:00'}), encoding='utf-8')
+    return path
+
+
+def test_cache_overrides_builtin_default(cache_file):
+    assert xingcheng.ActivityCache(cache_file).current(None) == CACHED
+
+
+def test_env_activity_overrides_cache(cache_file, monkeypatch):
+    monkeypatch.setenv('XINGCHENG_ACTIVITY_CODE', 'P-new')
+    monkeypatch.setenv('XINGCHENG_SHOP_CODE', 'SC-new')
+    cache = xingcheng.ActivityCache(cache_file)
+
+    assert cache.current(None) == ('P-new', 'SC-new')
+    # 手动指定时不写缓存，也不自动获取
+    cache.confirm(('P-new', 'SC-new'))
+    assert json.loads(cache_file.read_text(encoding='utf-8'))['activity_code'] == CACHED[0]
+    assert cache.refresh(None, ('P-new', 'SC-new')) is None
+
+
+def test_env_shop_code_alone_keeps_builtin_activity(cache_file, monkeypatch):
+    monkeypatch.setenv('XINGCHENG_SHOP_CODE', 'SC-new')
+    assert xingcheng.ActivityCache(cache_file).current(None) == (xingcheng.MiniProgramCheckin.ACTIVITY_CODE, 'SC-new')
@@ -0,0 +1,17 @@
+# -*- coding: utf-8 -*-
+import yuchen_checkin as yuchen
+
+
+def test_yu_chen_info_reads_credit_tips(replay):
+    client = yuchen.YuChen()
+    replay('yuchen', client.session)
+    client.yu_chen_info()
+    assert client.credit_info == '当前积分：128 积分，今日已获得 5 积分'
+
+
+def test_yu_chen_info_missing_page_keeps_credit_empty(replay):
+    client = yuchen.YuChen()
+    client.url = 'www.iosyc.com'
+    replay('yuchen', client.session)
+    client.yu_chen_info()
+    assert client.credit_info == ''